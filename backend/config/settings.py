@@ -2,6 +2,7 @@
 Django settings for config project.
 """
 
+import tempfile
 from pathlib import Path
 from decouple import config
 
@@ -24,14 +25,16 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'orders',
 ]
 
 MIDDLEWARE = [
+    'orders.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'orders.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,6 +76,87 @@ DATABASES = {
     }
 }
 
+# Caché
+# file (por defecto, compartida entre procesos del mismo contenedor),
+# locmem (solo desarrollo, un proceso) o redis (producción, usa REDIS_URL)
+CACHE_BACKEND = config('CACHE_BACKEND', default='file')
+# Límite de entradas para file/locmem (en Redis lo limita maxmemory)
+CACHE_MAX_ENTRIES = config('CACHE_MAX_ENTRIES', default=10000, cast=int)
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL', default='redis://localhost:6379/0'),
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pedidos',
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_LOCATION', default=str(Path(tempfile.gettempdir()) / 'pedidos_cache')),
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+
+# Seguimiento de pedidos: caché de las respuestas públicas
+TRACKING_CACHE_ALIAS = 'default'
+TRACKING_CACHE_TIMEOUT = config('TRACKING_CACHE_TIMEOUT', default=300, cast=int)
+# Los números inexistentes se recuerdan menos tiempo
+TRACKING_NEGATIVE_CACHE_TIMEOUT = config('TRACKING_NEGATIVE_CACHE_TIMEOUT', default=60, cast=int)
+# Segundos durante los que una invalidación impide volver a cachear el pedido
+TRACKING_INVALIDATION_GRACE = config('TRACKING_INVALIDATION_GRACE', default=10, cast=int)
+# Cache-Control de las respuestas de seguimiento (proxy y navegador)
+TRACKING_HTTP_MAX_AGE = config('TRACKING_HTTP_MAX_AGE', default=30, cast=int)
+# Máximo de pedidos por petición en el seguimiento en lote
+TRACKING_BATCH_MAX_SIZE = config('TRACKING_BATCH_MAX_SIZE', default=200, cast=int)
+# Sirve track y search con las vistas asíncronas (requiere ASGI: uvicorn bajo gunicorn)
+ASYNC_TRACKING = config('ASYNC_TRACKING', default=False, cast=bool)
+
+# Seguimiento en directo (GET /api/orders/track/{order_number}/stream/)
+# 'postgres': avisos entre procesos con LISTEN/NOTIFY; 'memory': solo en el proceso
+LIVE_TRACKING_BACKEND = config('LIVE_TRACKING_BACKEND', default='postgres')
+# Publica los cambios para los streams; sin ASGI no hay streams abiertos que los reciban
+LIVE_TRACKING = config('LIVE_TRACKING', default=ASYNC_TRACKING, cast=bool)
+# Duración máxima de cada conexión; el navegador reconecta tras LIVE_TRACKING_RETRY segundos
+LIVE_TRACKING_STREAM_TIMEOUT = config('LIVE_TRACKING_STREAM_TIMEOUT', default=300, cast=int)
+LIVE_TRACKING_HEARTBEAT = config('LIVE_TRACKING_HEARTBEAT', default=15, cast=int)
+LIVE_TRACKING_RETRY = config('LIVE_TRACKING_RETRY', default=5, cast=int)
+
+# Ingesta de eventos de los transportistas (POST /api/events/)
+CARRIER_EVENTS_TOKEN = config('CARRIER_EVENTS_TOKEN', default='')
+CARRIER_EVENTS_MAX_BATCH_SIZE = config('CARRIER_EVENTS_MAX_BATCH_SIZE', default=5000, cast=int)
+
+# Cola de trabajos en segundo plano (orders/jobs.py y manage.py run_jobs)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=5, cast=int)
+# Reintentos: 10s, 20s, 40s... hasta JOB_RETRY_BACKOFF_MAX
+JOB_RETRY_BACKOFF = config('JOB_RETRY_BACKOFF', default=10, cast=int)
+JOB_RETRY_BACKOFF_MAX = config('JOB_RETRY_BACKOFF_MAX', default=3600, cast=int)
+# Un trabajo sin latido del worker durante este tiempo se da por perdido y vuelve a la cola
+JOB_LOCK_TIMEOUT = config('JOB_LOCK_TIMEOUT', default=600, cast=int)
+# Cada cuántos segundos renueva el worker el bloqueo de sus trabajos (muy por debajo de JOB_LOCK_TIMEOUT)
+JOB_HEARTBEAT_INTERVAL = config('JOB_HEARTBEAT_INTERVAL', default=60, cast=int)
+
+# Métricas de Prometheus (GET /metrics): se exige el token como Bearer; sin
+# token solo se sirven con DEBUG (en producción se rechazan todas)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Archivado de pedidos cerrados (orders/archive.py y manage.py archive_orders)
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=365, cast=int)
+ARCHIVE_BATCH_SIZE = config('ARCHIVE_BATCH_SIZE', default=500, cast=int)
+
+# Horas sin eventos a partir de las que un pedido abierto se marca con retraso
+# (orders/delays.py y manage.py sweep_delays)
+DELAY_STALE_HOURS = config('DELAY_STALE_HOURS', default=48, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -111,9 +195,20 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    'DEFAULT_THROTTLE_RATES': {
+        # Token bucket por cliente para los endpoints públicos de seguimiento
+        'tracking': config('TRACKING_THROTTLE_RATE', default='60/min'),
+        'tracking_batch': config('TRACKING_BATCH_THROTTLE_RATE', default='30/min'),
+    },
 }
 
+# Tamaño máximo de página que pueden pedir los clientes (?page_size=)
+MAX_PAGE_SIZE = config('MAX_PAGE_SIZE', default=100, cast=int)
+
+# Por encima de este número de filas (estimadas) el admin no hace COUNT(*) exacto
+ADMIN_EXACT_COUNT_LIMIT = config('ADMIN_EXACT_COUNT_LIMIT', default=10000, cast=int)
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = config(
     'CORS_ALLOWED_ORIGINS',
@@ -3,8 +3,10 @@ URL configuration for config project.
 """
 from django.contrib import admin
 from django.urls import path, include
+from orders.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('orders.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
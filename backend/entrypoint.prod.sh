@@ -18,6 +18,12 @@ python manage.py collectstatic --noinput
 # Crear superusuario si no existe (SOLO PRIMERA VEZ - luego comenta esto)
 # echo "from django.contrib.auth import get_user_model; User = get_user_model(); User.objects.filter(username='admin').exists() or User.objects.create_superuser('admin', 'admin@mitzori.com', 'CAMBIAR_ESTA_CONTRASEÑA')" | python manage.py shell
 
+# Métricas de Prometheus compartidas entre workers: se empieza de cero
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Iniciando Gunicorn..."
 # Iniciar Gunicorn
 exec "$@"
@@ -1,19 +1,87 @@
+from django import forms
 from django.contrib import admin
+from django.db.models import Q
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Order, OrderHistory
+from .exports import export_response
+from .history import compact_history_entry, expand_history, matching_templates
+from .models import ArchivedOrder, ArchivedOrderHistory, Job, Order, OrderHistory
+from .pagination import EstimatedCountPaginator
+from .search import PostgresSearchMixin
+from .tracking import invalidate_tracking
+
+
+class OrderHistoryForm(forms.ModelForm):
+    """
+    Edita los eventos con su texto completo.
+
+    Los eventos con plantilla muestran la ubicación y la descripción de la
+    plantilla; al guardar se vuelve a compactar, así que si se cambia el
+    texto el evento deja de usar la plantilla y guarda el texto escrito.
+    """
+
+    class Meta:
+        model = OrderHistory
+        fields = ('status', 'location', 'description')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.template_id is not None:
+            location, description = expand_history(
+                self.instance.template_id, self.instance.location, self.instance.description
+            )
+            self.initial['location'] = location
+            self.initial['description'] = description
+
+    def save(self, commit=True):
+        history = super().save(commit=False)
+        entry = compact_history_entry({
+            'status': history.status,
+            'location': history.location,
+            'description': history.description,
+        })
+        history.template_id = entry['template_id']
+        history.location = entry['location']
+        history.description = entry['description']
+        if commit:
+            history.save()
+            self._save_m2m()
+        return history
 
 
 class OrderHistoryInline(admin.TabularInline):
     """Inline para mostrar el historial dentro del pedido"""
     model = OrderHistory
+    form = OrderHistoryForm
     extra = 1
-    fields = ('status', 'location', 'description', 'timestamp')
+    # Con plantilla, la descripción (y la ubicación fija) salen de la plantilla
+    fields = ('status', 'template', 'location', 'description', 'timestamp')
+    readonly_fields = ('template',)
+
+
+class PendingDeliveryFilter(admin.SimpleListFilter):
+    """Pedidos aún por entregar (usa el índice parcial orders_open_created_idx)"""
+    title = 'entrega'
+    parameter_name = 'entrega'
+    
+    def lookups(self, request, model_admin):
+        return (('pendiente', 'Pendientes de entrega'),)
+    
+    def queryset(self, request, queryset):
+        if self.value() == 'pendiente':
+            return queryset.exclude(status__in=Order.CLOSED_STATUSES)
+        return queryset
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(PostgresSearchMixin, admin.ModelAdmin):
     """Admin personalizado para gestionar pedidos"""
     
+    search_vector_field = 'search_vector'
+    # Recuentos estimados: con millones de pedidos un COUNT(*) tarda segundos
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
     list_display = (
         'order_number',
         'customer_name',
@@ -26,6 +94,8 @@ class OrderAdmin(admin.ModelAdmin):
     
     list_filter = (
         'status',
+        PendingDeliveryFilter,
+        'is_delayed',
         'created_at',
         'delivery_city'
     )
@@ -57,10 +127,13 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ('created_at', 'updated_at')
+    # is_delayed lo calcula manage.py sweep_delays (orders/delays.py): a mano se sobrescribiría
+    readonly_fields = ('created_at', 'updated_at', 'is_delayed')
     
     inlines = [OrderHistoryInline]
     
+    actions = ['export_csv', 'export_ndjson']
+    
     def status_badge(self, obj):
         """Muestra el estado con un badge de color"""
         colors = {
@@ -104,27 +177,42 @@ class OrderAdmin(admin.ModelAdmin):
         if change and not is_new:
             old_obj = Order.objects.get(pk=obj.pk)
             old_status = old_obj.status
+            # Si cambia el número de pedido, el seguimiento antiguo deja de ser válido
+            if old_obj.order_number != obj.order_number:
+                invalidate_tracking([old_obj.order_number])
         
         super().save_model(request, obj, form, change)
         
         # Crear entrada en el historial si el estado cambió
         if is_new or (old_status and old_status != obj.status):
-            OrderHistory.objects.create(
-                order=obj,
-                status=obj.status,
-                location=obj.current_location or '',
-                description=f'Estado actualizado a {obj.get_status_display()}'
-            )
+            OrderHistory.objects.create(order=obj, **compact_history_entry({
+                'status': obj.status,
+                'location': obj.current_location or '',
+                'description': f'Estado actualizado a {obj.get_status_display()}',
+            }))
+    
+    @admin.action(description='Exportar pedidos seleccionados con su historial (CSV)')
+    def export_csv(self, request, queryset):
+        """Descarga en streaming: vale también para "seleccionar todos" con millones de pedidos"""
+        return export_response(request, queryset, 'csv')
+    
+    @admin.action(description='Exportar pedidos seleccionados con su historial (NDJSON)')
+    def export_ndjson(self, request, queryset):
+        """Un pedido por línea con su historial anidado"""
+        return export_response(request, queryset, 'ndjson')
 
 
 @admin.register(OrderHistory)
-class OrderHistoryAdmin(admin.ModelAdmin):
+class OrderHistoryAdmin(PostgresSearchMixin, admin.ModelAdmin):
     """Admin para el historial de pedidos"""
     
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
     list_display = (
         'order',
         'status',
-        'location',
+        'event_location',
         'timestamp'
     )
     
@@ -139,9 +227,113 @@ class OrderHistoryAdmin(admin.ModelAdmin):
         'description'
     )
     
-    readonly_fields = ('timestamp',)
+    # Campos explícitos: el formulario compartido con el inline no incluye el pedido
+    fields = ('order', 'status', 'template', 'location', 'description', 'timestamp')
+    
+    readonly_fields = ('template', 'timestamp')
+    
+    # Con millones de pedidos un desplegable no es viable
+    raw_id_fields = ('order',)
+    
+    form = OrderHistoryForm
     
     date_hierarchy = 'timestamp'
+    
+    def get_term_matches(self, request, term):
+        """Los eventos con plantilla se encuentran también por el texto de la plantilla"""
+        return super().get_term_matches(request, term) | Q(template__in=matching_templates(term))
+    
+    @admin.display(description='Ubicación')
+    def event_location(self, obj):
+        """Ubicación del evento, también la fija de su plantilla"""
+        return expand_history(obj.template_id, obj.location, obj.description)[0]
+
+
+class ArchivedOrderHistoryInline(admin.TabularInline):
+    """Historial de un pedido archivado (solo lectura)"""
+    model = ArchivedOrderHistory
+    fields = ('status', 'event_location', 'event_description', 'timestamp')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+    
+    @admin.display(description='Ubicación')
+    def event_location(self, obj):
+        return expand_history(obj.template_id, obj.location, obj.description)[0]
+    
+    @admin.display(description='Descripción')
+    def event_description(self, obj):
+        return expand_history(obj.template_id, obj.location, obj.description)[1]
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """Consulta de pedidos archivados (se crean con archive_orders, no se editan)"""
+    
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    list_display = (
+        'order_number',
+        'customer_name',
+        'status',
+        'delivery_city',
+        'created_at',
+        'archived_at'
+    )
+    
+    list_filter = (
+        'status',
+    )
+    
+    # Solo por número exacto: el archivo no tiene índices de búsqueda
+    search_fields = (
+        '=order_number',
+    )
+    
+    exclude = ('tracking_snapshot',)
+    
+    inlines = [ArchivedOrderHistoryInline]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin para revisar la cola de trabajos en segundo plano"""
+    
+    list_display = (
+        'name',
+        'status',
+        'attempts',
+        'run_at',
+        'locked_by',
+        'created_at'
+    )
+    
+    list_filter = (
+        'status',
+        'name'
+    )
+    
+    readonly_fields = ('attempts', 'locked_at', 'locked_by', 'last_error', 'created_at')
+    
+    actions = ['retry_jobs']
+    
+    @admin.action(description='Reintentar los trabajos seleccionados')
+    def retry_jobs(self, request, queryset):
+        """Vuelve a encolar trabajos fallidos con los intentos a cero"""
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.PENDING, attempts=0, run_at=timezone.now(), last_error=''
+        )
+        self.message_user(request, f'{updated} trabajos encolados de nuevo')
 
 
 # Personalizar el admin site
@@ -0,0 +1,149 @@
+"""
+Archivado de pedidos cerrados (solo PostgreSQL).
+
+Los pedidos entregados o cancelados hace más de ``ARCHIVE_AFTER_DAYS`` días
+se mueven, con todo su historial, a ``ArchivedOrder`` y
+``ArchivedOrderHistory``. Así ``Order`` y ``OrderHistory`` (y sus índices)
+solo crecen con los pedidos recientes.
+
+Cada lote se mueve en su propia transacción corta: se bloquean solo los
+pedidos del lote con ``FOR UPDATE SKIP LOCKED`` (los que se estén editando en
+ese momento se dejan para la siguiente pasada) y se copian con
+``DELETE ... RETURNING`` dentro de un ``INSERT ... SELECT``, sin pasar las
+filas por Python.
+
+Los pedidos archivados conservan su id, su ``updated_at`` y su snapshot de
+seguimiento, así que el seguimiento público sigue respondiendo igual (y con
+el mismo ``ETag``) leyendo del archivo cuando no están en ``Order`` (ver
+``tracking.py``).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderHistory, Order, OrderHistory
+from .tracking import refresh_tracking
+
+
+def archive_cutoff(days=None):
+    """Fecha a partir de la cual un pedido cerrado todavía no se archiva"""
+    return timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS if days is None else days)
+
+
+def archivable_orders(cutoff):
+    """
+    Pedidos cerrados antes de ``cutoff``.
+
+    La fecha de cierre es ``delivered_at`` y, si no la hay (cancelados o
+    entregados importados sin ella), la del último evento del historial. No
+    vale ``updated_at``: cada regeneración del snapshot la actualiza y el
+    pedido no llegaría nunca a la antigüedad pedida. Sin historial se usa
+    ``created_at``. El filtro por ``created_at`` no cambia el resultado
+    (nadie cierra un pedido antes de crearlo) pero permite usar el índice
+    ``(status, created_at)``.
+    """
+    last_event = (
+        OrderHistory.objects.filter(order=OuterRef('pk'))
+        .order_by('-timestamp')
+        .values('timestamp')[:1]
+    )
+    return (
+        Order.objects.filter(status__in=Order.CLOSED_STATUSES, created_at__lt=cutoff)
+        .alias(closed_at=Coalesce('delivered_at', Subquery(last_event), 'created_at'))
+        .filter(closed_at__lt=cutoff)
+        # Un número ya archivado (pedido recreado después) no se puede mover
+        .exclude(Exists(ArchivedOrder.objects.filter(order_number=OuterRef('order_number'))))
+    )
+
+
+def shared_columns(model, archive_model):
+    """Columnas (entrecomilladas) que el modelo y su archivo tienen en común"""
+    quote = connection.ops.quote_name
+    archive_columns = {field.column for field in archive_model._meta.concrete_fields}
+    return ', '.join(
+        quote(field.column)
+        for field in model._meta.concrete_fields
+        if field.column in archive_columns
+    )
+
+
+class OrderArchiver:
+    """
+    Mueve al archivo los pedidos cerrados antes de ``cutoff`` por lotes.
+
+    Recorre los candidatos por ``(created_at, id)`` sin volver atrás: cada
+    lote empieza donde terminó el anterior.
+    """
+
+    def __init__(self, cutoff, batch_size=None):
+        self.cutoff = cutoff
+        self.batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+        self.orders_archived = 0
+        self.history_archived = 0
+        self.position = None
+
+    def run(self, max_batches=None, progress=None):
+        """Archiva hasta agotar los candidatos (o ``max_batches`` lotes)"""
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            if not self.archive_batch():
+                break
+            batches += 1
+            if progress is not None:
+                progress(self.orders_archived)
+
+    def candidates(self):
+        queryset = archivable_orders(self.cutoff)
+        if self.position is not None:
+            created_at, pk = self.position
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+        return queryset.order_by('created_at', 'pk')
+
+    def archive_batch(self):
+        """Archiva un lote en una transacción. Devuelve ``False`` si no quedaban candidatos."""
+        with transaction.atomic():
+            rows = list(
+                self.candidates()
+                .select_for_update(skip_locked=True, of=('self',))
+                .values_list('pk', 'created_at', 'tracking_snapshot')[:self.batch_size]
+            )
+            if not rows:
+                return False
+            ids = [pk for pk, _, _ in rows]
+            self.position = (rows[-1][1], rows[-1][0])
+
+            # El seguimiento de los archivados se responde con el snapshot
+            refresh_tracking([pk for pk, _, snapshot in rows if snapshot is None])
+            self.history_archived += move_rows(OrderHistory, ArchivedOrderHistory, 'order_id', ids)
+            self.orders_archived += move_rows(
+                Order, ArchivedOrder, 'id', ids, extra={'archived_at': timezone.now()}
+            )
+        return True
+
+
+def move_rows(model, archive_model, column, ids, extra=None):
+    """
+    Mueve las filas con ``column`` en ``ids`` a la tabla de archivo.
+
+    ``extra`` son columnas propias del archivo con el mismo valor en todas
+    las filas (p. ej. ``archived_at``).
+    """
+    quote = connection.ops.quote_name
+    columns = shared_columns(model, archive_model)
+    extra = extra or {}
+    extra_columns = ''.join(f', {quote(name)}' for name in extra)
+    extra_values = ', %s' * len(extra)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH moved AS ("
+            f" DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} = ANY(%s)"
+            f" RETURNING {columns}"
+            f") INSERT INTO {quote(archive_model._meta.db_table)} ({columns}{extra_columns}) "
+            f"SELECT {columns}{extra_values} FROM moved",
+            [list(ids), *extra.values()],
+        )
+        return cursor.rowcount
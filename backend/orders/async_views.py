@@ -0,0 +1,196 @@
+"""
+Versiones asíncronas de los endpoints públicos de seguimiento.
+
+Con ``ASYNC_TRACKING`` activado (despliegue ASGI, ver
+``docker-compose.asgi.yml``) sustituyen a ``OrderViewSet.track`` y
+``OrderViewSet.search`` con las mismas URLs y respuestas: mientras una
+petición espera a la caché o a PostgreSQL el worker atiende otras, así que
+un contenedor pequeño aguanta los picos tras enviar las notificaciones.
+
+``track_stream`` (seguimiento en directo con server-sent events) está
+siempre activa y solo tiene sentido bajo ASGI; con WSGI envía el estado
+actual y cierra, y el navegador vuelve a conectar pasados
+``LIVE_TRACKING_RETRY`` segundos.
+
+DRF 3.14 no admite vistas asíncronas, por eso son vistas de Django que
+reutilizan su ``JSONRenderer`` y los mensajes de error de DRF.
+"""
+import asyncio
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+
+from .live import get_broadcaster
+from .throttling import TrackingThrottle
+from .tracking import add_tracking_headers, aget_tracking_entry
+
+
+renderer = JSONRenderer()
+
+
+def json_response(data, status=200):
+    """Respuesta JSON con los mismos bytes que la ``Response`` de DRF"""
+    return HttpResponse(renderer.render(data), status=status, content_type='application/json')
+
+
+async def throttle_response(request):
+    """Respuesta 429 si el cliente ha agotado sus tokens; ``None`` si puede seguir"""
+    throttle = TrackingThrottle()
+    if await sync_to_async(throttle.allow_request)(request, None):
+        return None
+    wait = throttle.wait()
+    response = json_response({'detail': exceptions.Throttled(wait).detail}, status=429)
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+async def track(request, order_number):
+    """
+    Async version of OrderViewSet.track.
+    GET /api/orders/track/{order_number}/
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET'])
+    if throttled := await throttle_response(request):
+        return throttled
+
+    conditional = (
+        'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+    )
+    entry = await aget_tracking_entry(order_number, validators_only=conditional)
+    if entry is None:
+        return json_response({'detail': exceptions.NotFound.default_detail}, status=404)
+
+    response = get_conditional_response(
+        request, etag=quote_etag(entry.etag), last_modified=entry.last_modified
+    )
+    if response is None:
+        if entry.payload is None:
+            entry = await aget_tracking_entry(order_number)
+            if entry is None:
+                return json_response({'detail': exceptions.NotFound.default_detail}, status=404)
+        response = json_response(entry.payload)
+    return add_tracking_headers(response, entry)
+
+
+async def search(request):
+    """
+    Async version of OrderViewSet.search.
+    POST /api/orders/search/
+    Body: {"order_number": "ABC123"}
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if throttled := await throttle_response(request):
+        return throttled
+
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError as error:
+            return json_response({'detail': f'JSON parse error - {error}'}, status=400)
+    else:
+        data = request.POST
+    order_number = data.get('order_number', '') if hasattr(data, 'get') else ''
+    order_number = order_number.strip() if isinstance(order_number, str) else ''
+
+    if not order_number:
+        return json_response({'error': 'Order number is required'}, status=400)
+
+    entry = await aget_tracking_entry(order_number)
+    if entry is None:
+        return json_response(
+            {'error': 'Order not found. Please verify your order number.'},
+            status=404
+        )
+    return json_response(entry.payload)
+
+
+async def track_stream(request, order_number):
+    """
+    Live tracking updates as server-sent events.
+    GET /api/orders/track/{order_number}/stream/
+
+    Sends the tracking payload on connect and again every time it changes
+    (event ``tracking``, id = ETag). ``Last-Event-ID`` skips the first
+    event when the client already has the current version.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if throttled := await throttle_response(request):
+        return throttled
+
+    entry = await aget_tracking_entry(order_number)
+    if entry is None:
+        return json_response({'detail': exceptions.NotFound.default_detail}, status=404)
+
+    last_event_id = request.headers.get('Last-Event-ID')
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(
+            tracking_events(order_number, last_event_id), content_type='text/event-stream'
+        )
+    else:
+        response = HttpResponse(
+            retry_field() + (sse_event(entry) if entry.etag != last_event_id else ''),
+            content_type='text/event-stream',
+        )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def tracking_events(order_number, last_event_id=None):
+    """
+    Eventos del stream de un pedido.
+
+    Se suscribe antes de leer el seguimiento para no perder cambios entre
+    la lectura y la suscripción. Sin cambios envía un comentario cada
+    ``LIVE_TRACKING_HEARTBEAT`` segundos para que los proxies no cierren la
+    conexión, y termina a los ``LIVE_TRACKING_STREAM_TIMEOUT`` segundos (el
+    navegador reconecta solo).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.LIVE_TRACKING_STREAM_TIMEOUT
+    broadcaster = get_broadcaster()
+    subscription = broadcaster.subscribe(order_number)
+    try:
+        yield retry_field()
+        changed = True
+        while True:
+            if changed:
+                entry = await aget_tracking_entry(order_number)
+                if entry is None:
+                    break
+                if entry.etag != last_event_id:
+                    yield sse_event(entry)
+                    last_event_id = entry.etag
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            changed = await subscription.wait(min(settings.LIVE_TRACKING_HEARTBEAT, remaining))
+            if not changed:
+                yield ': ping\n\n'
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+def retry_field():
+    return f'retry: {settings.LIVE_TRACKING_RETRY * 1000}\n\n'
+
+
+def sse_event(entry):
+    data = renderer.render(entry.payload).decode()
+    return f'event: tracking\nid: {entry.etag}\ndata: {data}\n\n'
+
+
+# csrf_exempt() de Django 4.2 no admite vistas asíncronas: se marca a mano
+search.csrf_exempt = True
@@ -0,0 +1,148 @@
+"""
+Detección automática de pedidos con retraso (``Order.is_delayed``).
+
+Un pedido va con retraso si sigue abierto y ya pasó su entrega estimada o
+lleva más de ``DELAY_STALE_HOURS`` horas sin ningún evento en el historial.
+``DelaySweeper`` recalcula la marca con un único ``UPDATE`` por conjuntos que
+pone y quita ``is_delayed`` solo donde cambia.
+
+Para no revisar todos los pedidos en cada pasada se guarda un punto de
+control (``Checkpoint``) con el momento de la última. Solo pueden haber
+cambiado desde entonces:
+
+- los pedidos modificados (``updated_at``),
+- los que han superado su entrega estimada,
+- los que han cumplido el plazo sin eventos (su último evento, o su
+  creación si no tienen historial, cae en la ventana desplazada
+  ``DELAY_STALE_HOURS``).
+
+Cada condición usa su índice (``orders_updated_at_idx``,
+``orders_open_estimated_idx``, ``orders_history_ts_idx`` y
+``orders_open_created_idx``, ver la migración 0011).
+
+La primera pasada (o con ``full``) revisa todos los pedidos abiertos o
+marcados. Los pedidos cerrados sin marca nunca cambian, así que no se miran.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Checkpoint, Order, OrderHistory
+from .tracking import refresh_tracking
+
+
+CHECKPOINT_KEY = 'sweep_delays'
+
+# Margen sobre el punto de control para las transacciones que confirman tarde
+HIGH_WATER_MARK_OVERLAP = timedelta(minutes=5)
+
+SWEEP_SQL = """
+WITH candidates AS (
+    {candidates}
+),
+computed AS (
+    SELECT o.id,
+        COALESCE(
+            o.status NOT IN %(closed)s AND (
+                o.estimated_delivery < %(now)s
+                OR COALESCE(
+                    (SELECT max(h.timestamp) FROM {history} h WHERE h.order_id = o.id),
+                    o.created_at
+                ) < %(stale_before)s
+            ),
+            false
+        ) AS delayed
+    FROM {orders} o
+    WHERE o.id IN (SELECT id FROM candidates)
+      AND (o.status NOT IN %(closed)s OR o.is_delayed)
+)
+UPDATE {orders} o
+SET is_delayed = computed.delayed
+FROM computed
+WHERE o.id = computed.id AND o.is_delayed <> computed.delayed
+RETURNING o.id, o.is_delayed
+"""
+
+ALL_CANDIDATES = """
+    SELECT id FROM {orders} WHERE status NOT IN %(closed)s
+    UNION
+    SELECT id FROM {orders} WHERE is_delayed
+"""
+
+CHANGED_CANDIDATES = """
+    SELECT id FROM {orders} WHERE updated_at > %(since)s
+    UNION
+    SELECT id FROM {orders}
+    WHERE status NOT IN %(closed)s
+      AND estimated_delivery > %(since)s AND estimated_delivery <= %(now)s
+    UNION
+    SELECT order_id FROM {history}
+    WHERE timestamp > %(stale_since)s AND timestamp <= %(stale_before)s
+    UNION
+    SELECT id FROM {orders} o
+    WHERE status NOT IN %(closed)s
+      AND created_at > %(stale_since)s AND created_at <= %(stale_before)s
+      AND NOT EXISTS (SELECT 1 FROM {history} h WHERE h.order_id = o.id)
+"""
+
+
+class DelaySweeper:
+    """Recalcula ``is_delayed`` de los pedidos que pueden haber cambiado"""
+
+    def __init__(self, stale_hours=None, full=False):
+        self.stale_after = timedelta(
+            hours=settings.DELAY_STALE_HOURS if stale_hours is None else stale_hours
+        )
+        self.full = full
+        self.flagged = 0
+        self.unflagged = 0
+        self.since = None
+
+    def last_sweep(self):
+        checkpoint = Checkpoint.objects.filter(key=CHECKPOINT_KEY).first()
+        if checkpoint is None or 'high_water_mark' not in checkpoint.data:
+            return None
+        return parse_datetime(checkpoint.data['high_water_mark'])
+
+    def run(self):
+        """Hace una pasada y devuelve los ids de los pedidos que han cambiado"""
+        quote = connection.ops.quote_name
+        now = timezone.now()
+        last = None if self.full else self.last_sweep()
+        self.since = last
+
+        params = {
+            'closed': tuple(Order.CLOSED_STATUSES),
+            'now': now,
+            'stale_before': now - self.stale_after,
+        }
+        if last is None:
+            candidates = ALL_CANDIDATES
+        else:
+            since = last - HIGH_WATER_MARK_OVERLAP
+            candidates = CHANGED_CANDIDATES
+            params.update(since=since, stale_since=since - self.stale_after)
+
+        tables = {
+            'orders': quote(Order._meta.db_table),
+            'history': quote(OrderHistory._meta.db_table),
+        }
+        sql = SWEEP_SQL.format(candidates=candidates.format(**tables), **tables)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                changed = cursor.fetchall()
+            Checkpoint.objects.update_or_create(
+                key=CHECKPOINT_KEY,
+                defaults={'data': {'high_water_mark': now.isoformat()}},
+            )
+
+        self.flagged = sum(1 for _, delayed in changed if delayed)
+        self.unflagged = len(changed) - self.flagged
+        # is_delayed forma parte del seguimiento público
+        ids = [pk for pk, _ in changed]
+        refresh_tracking(ids)
+        return ids
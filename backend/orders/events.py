@@ -0,0 +1,159 @@
+"""
+Ingesta de eventos de estado de los transportistas.
+
+Los eventos llegan en lotes (número de pedido, estado, ubicación y fecha) y
+se aplican por conjuntos: una consulta para bloquear los pedidos, otra para
+la fecha del último evento de cada uno, un ``bulk_create`` del historial y un
+``bulk_update`` de los pedidos con su evento más reciente.
+
+Reenviar un lote es seguro: los eventos anteriores al último evento
+registrado del pedido (desordenados) y los que repiten fecha y estado de uno
+ya registrado (duplicados) se descartan sin tocar nada. Un evento con la
+misma fecha que el último pero otro estado sí se aplica.
+
+Con ``defer_refresh`` los snapshots de seguimiento no se regeneran en la
+petición: se vacían (las lecturas los recalculan si hace falta) y se encola
+un trabajo ``refresh_tracking`` para los workers.
+"""
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .history import compact_history_entry
+from .jobs import enqueue
+from .models import Order, OrderHistory
+from .tracking import invalidate_tracking, refresh_tracking
+
+
+STATUS_LABELS = dict(Order.STATUS_CHOICES)
+
+
+class StatusEventApplier:
+    """
+    Aplica lotes de eventos de estado.
+
+    Cada evento es un diccionario con ``order_number``, ``status``,
+    ``timestamp`` y, opcionalmente, ``location`` y ``description``.
+    """
+
+    UPDATE_FIELDS = ['status', 'current_location', 'delivered_at', 'updated_at']
+    UPDATE_BATCH_SIZE = 100
+
+    def __init__(self, defer_refresh=False):
+        self.defer_refresh = defer_refresh
+        self.received = 0
+        self.applied = 0
+        self.duplicates = 0
+        self.stale = 0
+        self.unknown = set()
+
+    def apply(self, events):
+        """Aplica un lote en una transacción y regenera el seguimiento de los pedidos"""
+        self.received += len(events)
+        by_order = {}
+        for event in events:
+            by_order.setdefault(event['order_number'], []).append(event)
+
+        with transaction.atomic():
+            # Bloqueo en orden de id: dos lotes con los mismos pedidos no se cruzan
+            orders = {
+                order.order_number: order
+                for order in Order.objects.select_for_update()
+                .filter(order_number__in=list(by_order))
+                .only('id', 'order_number', 'status', 'current_location', 'delivered_at')
+                .order_by('pk')
+            }
+            unknown = [number for number in by_order if number not in orders]
+            self.unknown.update(unknown)
+            for number in unknown:
+                del by_order[number]
+            if not by_order:
+                return
+
+            latest = dict(
+                OrderHistory.objects.filter(order_id__in=[order.pk for order in orders.values()])
+                .values('order_id')
+                .annotate(latest=Max('timestamp'))
+                .values_list('order_id', 'latest')
+            )
+            # Estados ya registrados con la fecha del último evento de cada pedido
+            registered = {}
+            for order_id, timestamp, status in OrderHistory.objects.filter(
+                order_id__in=list(latest), timestamp__in=set(latest.values())
+            ).values_list('order_id', 'timestamp', 'status'):
+                if timestamp == latest[order_id]:
+                    registered.setdefault(order_id, set()).add((timestamp, status))
+
+            history = []
+            changed = []
+            now = timezone.now()
+            for number, order_events in by_order.items():
+                order = orders[number]
+                accepted = self.accepted_events(
+                    order_events, latest.get(order.pk), registered.get(order.pk, ())
+                )
+                if not accepted:
+                    continue
+                history.extend(self.build_history_entry(order, event) for event in accepted)
+
+                last = accepted[-1]
+                order.status = last['status']
+                # Ubicación del evento más reciente que la trae (aunque no sea el último)
+                locations = [event['location'] for event in accepted if event.get('location')]
+                if locations:
+                    order.current_location = locations[-1]
+                if last['status'] == 'DELIVERED':
+                    order.delivered_at = last['timestamp']
+                order.updated_at = now
+                changed.append(order)
+
+            fields = self.UPDATE_FIELDS
+            if self.defer_refresh:
+                for order in changed:
+                    order.tracking_snapshot = None
+                fields = fields + ['tracking_snapshot']
+
+            OrderHistory.objects.bulk_create(history)
+            Order.objects.bulk_update(changed, fields, batch_size=self.UPDATE_BATCH_SIZE)
+            self.applied += len(history)
+
+            if self.defer_refresh and changed:
+                invalidate_tracking([order.order_number for order in changed])
+                enqueue('refresh_tracking', {'order_ids': [order.pk for order in changed]})
+
+        if not self.defer_refresh:
+            refresh_tracking([order.pk for order in changed])
+
+    def accepted_events(self, events, latest, registered=()):
+        """
+        Eventos de un pedido a aplicar, del más antiguo al más reciente.
+
+        ``latest`` es la fecha del último evento registrado y ``registered``
+        los pares (fecha, estado) ya registrados con esa fecha. Se cuentan
+        como duplicados los que repiten fecha y estado (de un evento ya
+        registrado o de otro del lote) y como desordenados los anteriores a
+        ``latest``.
+        """
+        accepted = []
+        seen = set(registered)
+        for event in sorted(events, key=lambda event: event['timestamp']):
+            key = (event['timestamp'], event['status'])
+            if key in seen:
+                self.duplicates += 1
+            elif latest is not None and event['timestamp'] < latest:
+                self.stale += 1
+            else:
+                accepted.append(event)
+            seen.add(key)
+        return accepted
+
+    def build_history_entry(self, order, event):
+        return OrderHistory(order=order, **compact_history_entry({
+            'status': event['status'],
+            'location': event.get('location') or '',
+            'description': (
+                event.get('description')
+                or f'Estado actualizado a {STATUS_LABELS[event["status"]]}'
+            ),
+            'timestamp': event['timestamp'],
+        }))
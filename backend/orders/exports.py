@@ -0,0 +1,151 @@
+"""
+Exportación de pedidos con su historial en CSV o NDJSON.
+
+Pensada para volcados completos (millones de pedidos) con memoria constante:
+
+- Los pedidos se leen con ``values_list().iterator(chunk_size=...)``, que en
+  PostgreSQL usa un cursor del lado del servidor.
+- Por cada bloque de ``chunk_size`` pedidos se hace una sola consulta del
+  historial de todos ellos.
+- Cada bloque se convierte en un único texto, así que la respuesta HTTP
+  (``StreamingHttpResponse``) o el fichero se escriben a trozos grandes.
+
+En CSV se genera una fila por entrada del historial (con los datos del
+pedido repetidos) y una fila sin historial para los pedidos que no tienen;
+en NDJSON una línea por pedido con su historial en ``history``. El
+historial va en orden cronológico.
+"""
+import csv
+import io
+import json
+from itertools import groupby, islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from .history import expand_history
+from .models import OrderHistory
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+ORDER_FIELDS = [
+    'order_number', 'status', 'customer_name', 'customer_email', 'customer_phone',
+    'delivery_address', 'delivery_city', 'delivery_postal_code', 'current_location',
+    'is_delayed', 'created_at', 'updated_at', 'estimated_delivery', 'delivered_at', 'notes',
+]
+HISTORY_FIELDS = ['status', 'location', 'description', 'timestamp']
+CSV_HEADER = ORDER_FIELDS + [f'history_{field}' for field in HISTORY_FIELDS]
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def filter_orders(queryset, status=None, since=None, until=None):
+    """Filtra por estado y por rango de ``created_at`` (``until`` excluido)"""
+    if status:
+        queryset = queryset.filter(status__in=status if isinstance(status, (list, tuple)) else [status])
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    if until:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset
+
+
+def iter_order_chunks(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Recorre los pedidos en bloques de ``(pedido, historial)``.
+
+    ``pedido`` es una tupla con ``ORDER_FIELDS`` e ``historial`` una lista
+    de tuplas con ``HISTORY_FIELDS``.
+    """
+    rows = (
+        queryset.order_by('pk')
+        .values_list('pk', *ORDER_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    while chunk := list(islice(rows, chunk_size)):
+        history = (
+            OrderHistory.objects.filter(order_id__in=[row[0] for row in chunk])
+            .order_by('order_id', 'timestamp', 'id')
+            .values_list('order_id', 'status', 'template_id', 'location', 'description', 'timestamp')
+        )
+        by_order = {
+            order_id: [
+                (status, *expand_history(template_id, location, description), timestamp)
+                for _, status, template_id, location, description, timestamp in entries
+            ]
+            for order_id, entries in groupby(history, key=lambda entry: entry[0])
+        }
+        yield [(row[1:], by_order.get(row[0], [])) for row in chunk]
+
+
+def format_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def iter_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Texto CSV por bloques: la cabecera y después un trozo por bloque de pedidos"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    empty_history = [None] * len(HISTORY_FIELDS)
+    for chunk in iter_order_chunks(queryset, chunk_size):
+        for order, history in chunk:
+            order = [format_value(value) for value in order]
+            if not history:
+                writer.writerow(order + empty_history)
+            for entry in history:
+                writer.writerow(order + [format_value(value) for value in entry])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Texto NDJSON por bloques: una línea por pedido"""
+    for chunk in iter_order_chunks(queryset, chunk_size):
+        lines = []
+        for order, history in chunk:
+            data = dict(zip(ORDER_FIELDS, map(format_value, order)))
+            data['history'] = [
+                dict(zip(HISTORY_FIELDS, map(format_value, entry))) for entry in history
+            ]
+            lines.append(json.dumps(data, ensure_ascii=False))
+        yield '\n'.join(lines) + '\n'
+
+
+EXPORTERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+}
+
+
+async def _iterate_in_thread(iterator):
+    """
+    Consume un iterador síncrono desde ASGI bloque a bloque.
+
+    ``StreamingHttpResponse`` de Django 4.2 convierte los iteradores
+    síncronos en una lista antes de enviarlos bajo ASGI: sin esto la
+    exportación entera acabaría en memoria.
+    """
+    sentinel = object()
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(iterator, sentinel)) is not sentinel:
+        yield chunk
+
+
+def export_response(request, queryset, export_format, filename='pedidos'):
+    """``StreamingHttpResponse`` con la exportación como fichero adjunto"""
+    content_type, extension = FORMATS[export_format]
+    content = EXPORTERS[export_format](queryset)
+    if isinstance(request, ASGIRequest):
+        content = _iterate_in_thread(content)
+    response = StreamingHttpResponse(content, content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
@@ -0,0 +1,114 @@
+"""
+Plantillas de los eventos repetitivos del historial.
+
+Casi todo el historial son los mismos textos: los seis eventos que genera
+``import_orders`` para cada pedido y los "Estado actualizado a ..." del admin
+y de los transportistas. En lugar de guardar la descripción y la ubicación
+en cada fila, el evento apunta a una ``HistoryTemplate`` y solo guarda lo que
+cambia de un pedido a otro: la fecha y, si la plantilla no tiene ubicación
+fija (``location`` nulo), la ubicación del evento.
+
+- ``compact_history_entry`` convierte un evento completo en las columnas que
+  se guardan (lo usan todas las escrituras).
+- ``expand_history`` hace lo contrario al leer: los serializers, los
+  snapshots de seguimiento y las exportaciones devuelven exactamente los
+  mismos textos que antes.
+
+Las plantillas se leen una vez por proceso y no cambian nunca (solo se
+añaden), así que expandir no cuesta consultas.
+"""
+from .models import HistoryTemplate, Order
+
+
+# (estado, ubicación fija o None, descripción). Las de la migración 0010 se
+# crean al migrar; si se añaden más, se crean al cargarlas por primera vez.
+HISTORY_TEMPLATES = [
+    # Historial generado por import_orders
+    ('PENDING', 'Order placed', 'Your order has been received and is being processed.'),
+    ('PROCESSING', 'Warehouse', 'Your order is being prepared for shipment.'),
+    ('SHIPPED', 'Origin facility', 'Your package has been shipped.'),
+    ('IN_TRANSIT', 'In transit', 'Your package is on its way.'),
+    ('OUT_FOR_DELIVERY', None, 'Out for delivery in your area.'),
+    ('DELIVERED', None, 'Package delivered successfully.'),
+    # Cambios de estado del admin y eventos de transportistas sin descripción
+    *[(status, None, f'Estado actualizado a {label}') for status, label in Order.STATUS_CHOICES],
+]
+
+_templates = {}
+_templates_by_text = {}
+
+
+def load_templates():
+    """Lee las plantillas de la base de datos (y crea las que falten)"""
+    global _templates, _templates_by_text
+    templates = list(HistoryTemplate.objects.all())
+    known = {(template.status, template.description) for template in templates}
+    missing = [
+        HistoryTemplate(status=status, location=location, description=description)
+        for status, location, description in HISTORY_TEMPLATES
+        if (status, description) not in known
+    ]
+    if missing:
+        HistoryTemplate.objects.bulk_create(missing, ignore_conflicts=True)
+        templates = list(HistoryTemplate.objects.all())
+    _templates = {template.pk: template for template in templates}
+    _templates_by_text = {
+        (template.status, template.description): template for template in templates
+    }
+
+
+def get_template(template_id):
+    if template_id not in _templates:
+        load_templates()
+    return _templates[template_id]
+
+
+def find_template(status, description):
+    if not _templates_by_text:
+        load_templates()
+    return _templates_by_text.get((status, description))
+
+
+def matching_templates(text):
+    """
+    Ids de las plantillas cuyo texto contiene ``text`` (sin distinguir mayúsculas).
+
+    Los eventos con plantilla guardan la descripción (y la ubicación fija) a
+    NULL: las búsquedas tienen que buscar también en las plantillas.
+    """
+    if not _templates:
+        load_templates()
+    text = text.casefold()
+    return [
+        template.pk
+        for template in _templates.values()
+        if text in template.description.casefold()
+        or (template.location is not None and text in template.location.casefold())
+    ]
+
+
+def compact_history_entry(entry):
+    """
+    Columnas que se guardan para un evento ``{status, location, description, timestamp}``.
+
+    Si el evento encaja con una plantilla, la descripción (y la ubicación si
+    es la fija de la plantilla) se sustituyen por la referencia.
+    """
+    template = find_template(entry['status'], entry['description'])
+    if template is None or (template.location is not None and template.location != entry['location']):
+        return {**entry, 'template_id': None}
+    return {
+        **entry,
+        'template_id': template.pk,
+        'location': entry['location'] if template.location is None else None,
+        'description': None,
+    }
+
+
+def expand_history(template_id, location, description):
+    """``(ubicación, descripción)`` de un evento tal y como se creó"""
+    if template_id is None:
+        return location, description
+    template = get_template(template_id)
+    return (location if template.location is None else template.location), template.description
+
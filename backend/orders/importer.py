@@ -0,0 +1,691 @@
+"""
+Utilidades para importar pedidos desde los CSV exportados de Shopify.
+
+El comando ``import_orders`` usa estas funciones tanto en el modo clásico
+(un pedido cada vez) como en los modos por lotes (``--bulk`` con
+``bulk_create``, ``--copy`` con ``COPY FROM STDIN`` y ``--delta``). El CSV
+se lee en streaming, así que la memoria no depende del tamaño de la
+exportación.
+"""
+import csv
+import gzip
+import hashlib
+import io
+import multiprocessing
+import os
+import queue
+import traceback
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import groupby, islice
+
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .history import compact_history_entry, expand_history
+from .models import ArchivedOrder, Checkpoint, Order, OrderHistory
+from .tracking import refresh_tracking
+
+
+SHOPIFY_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S %z'
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Columnas del CSV que influyen en los datos importados
+HASHED_COLUMNS = (
+    'Email', 'Created at', 'Fulfilled at',
+    'Shipping Name', 'Shipping Phone', 'Shipping Address1', 'Shipping Address2',
+    'Shipping City', 'Shipping Zip', 'Shipping Province', 'Shipping Country',
+    'Billing Name', 'Billing Phone', 'Billing Address1', 'Billing Address2',
+    'Billing City', 'Billing Zip', 'Billing Province', 'Billing Country',
+)
+
+
+def open_csv(path):
+    """Abre el CSV en modo texto, descomprimiéndolo si viene en gzip"""
+    with open(path, 'rb') as file:
+        is_gzip = file.read(2) == GZIP_MAGIC
+    if is_gzip:
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def iter_order_rows(file, skip=0):
+    """
+    Recorre el CSV en streaming y devuelve la primera fila de cada pedido.
+
+    Shopify exporta una fila por cada línea del pedido y todas comparten el
+    mismo ``Name``, así que basta con agrupar las filas consecutivas: nunca se
+    carga el fichero completo en memoria. Los primeros ``skip`` pedidos se
+    saltan (para retomar una importación).
+    """
+    reader = csv.DictReader(file)
+    for index, (_, rows) in enumerate(groupby(reader, key=lambda row: row['Name'])):
+        if index >= skip:
+            yield next(rows)
+
+
+def iter_orders(file, skip=0):
+    """Como ``iter_order_rows`` pero devuelve los pedidos ya parseados"""
+    for row in iter_order_rows(file, skip=skip):
+        yield parse_order_row(row)
+
+
+def batched(iterable, size):
+    """Agrupa un iterable en listas de ``size`` elementos"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def parse_shopify_datetime(value):
+    """Convierte una fecha de Shopify; si no es válida devuelve la fecha actual"""
+    try:
+        return datetime.strptime(value, SHOPIFY_DATETIME_FORMAT)
+    except (TypeError, ValueError):
+        return timezone.now()
+
+
+def row_content_hash(row):
+    """Hash de las columnas del CSV que se importan (detecta pedidos modificados)"""
+    content = '\x1f'.join(row.get(column) or '' for column in HASHED_COLUMNS)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def parse_order_row(row):
+    """Extrae los datos del pedido a partir de una fila del CSV de Shopify"""
+    # Extraer datos relevantes
+    shipping_name = row['Shipping Name'] or row['Billing Name']
+    shipping_email = row['Email']
+    shipping_phone = row['Shipping Phone'] or row['Billing Phone']
+
+    # Construir dirección completa
+    shipping_address = row['Shipping Address1'] or row['Billing Address1']
+    shipping_address2 = row['Shipping Address2'] or row['Billing Address2']
+    if shipping_address2:
+        shipping_address += f", {shipping_address2}"
+
+    shipping_city = row['Shipping City'] or row['Billing City']
+    shipping_zip = row['Shipping Zip'] or row['Billing Zip']
+    shipping_province = row['Shipping Province'] or row['Billing Province']
+    shipping_country = row['Shipping Country'] or row['Billing Country']
+
+    # Dirección completa
+    full_address = f"{shipping_address}, {shipping_city}"
+    if shipping_province:
+        full_address += f", {shipping_province}"
+    full_address += f", {shipping_country}"
+
+    # Fecha de entrega (fulfilled at)
+    fulfilled_at_str = row['Fulfilled at']
+    delivered_at = parse_shopify_datetime(fulfilled_at_str) if fulfilled_at_str else None
+
+    return {
+        'order_id': row['Id'],
+        'order_number': row['Name'].replace('#', ''),  # Quitar el #
+        'customer_name': shipping_name,
+        'customer_email': shipping_email,
+        'customer_phone': shipping_phone,
+        'delivery_address': shipping_address,
+        'delivery_city': shipping_city,
+        'delivery_postal_code': shipping_zip,
+        'full_address': full_address,
+        'created_at': parse_shopify_datetime(row['Created at']),
+        'delivered_at': delivered_at,
+        'content_hash': row_content_hash(row),
+    }
+
+
+def build_order(order_data):
+    """Construye (sin guardar) el pedido importado como entregado"""
+    return Order(
+        order_number=order_data['order_number'],
+        customer_name=order_data['customer_name'],
+        customer_email=order_data['customer_email'],
+        customer_phone=order_data['customer_phone'] or '',
+        delivery_address=order_data['delivery_address'],
+        delivery_city=order_data['delivery_city'],
+        delivery_postal_code=order_data['delivery_postal_code'] or '',
+        status='DELIVERED',
+        current_location=f"Delivered to {order_data['delivery_city']}",
+        delivered_at=order_data['delivered_at'],
+        estimated_delivery=order_data['delivered_at'],
+        created_at=order_data['created_at'],
+        content_hash=order_data['content_hash'],
+    )
+
+
+def build_history_entries(order_data):
+    """Historial completo que se genera para cada pedido importado"""
+    delivered_or_created = order_data['delivered_at'] or order_data['created_at']
+    return [
+        {
+            'status': 'PENDING',
+            'location': 'Order placed',
+            'description': 'Your order has been received and is being processed.',
+            'timestamp': order_data['created_at'],
+        },
+        {
+            'status': 'PROCESSING',
+            'location': 'Warehouse',
+            'description': 'Your order is being prepared for shipment.',
+            'timestamp': order_data['created_at'],
+        },
+        {
+            'status': 'SHIPPED',
+            'location': 'Origin facility',
+            'description': 'Your package has been shipped.',
+            'timestamp': order_data['created_at'],
+        },
+        {
+            'status': 'IN_TRANSIT',
+            'location': 'In transit',
+            'description': 'Your package is on its way.',
+            'timestamp': order_data['created_at'],
+        },
+        {
+            'status': 'OUT_FOR_DELIVERY',
+            'location': order_data['delivery_city'],
+            'description': 'Out for delivery in your area.',
+            'timestamp': delivered_or_created,
+        },
+        {
+            'status': 'DELIVERED',
+            'location': order_data['full_address'],
+            'description': 'Package delivered successfully.',
+            'timestamp': delivered_or_created,
+        },
+    ]
+
+
+@contextmanager
+def keep_created_at():
+    """
+    Permite fijar ``created_at`` al insertar.
+
+    ``auto_now_add`` sobrescribe el valor en cada INSERT (también en
+    ``bulk_create``), así que se desactiva mientras dura la importación.
+    """
+    field = Order._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class BulkOrderWriter:
+    """
+    Escribe pedidos y su historial con ``bulk_create``.
+
+    Cada lote se guarda en su propia transacción: si falla, solo se pierde
+    ese lote y los anteriores quedan confirmados.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.created = 0
+        self.skipped = 0
+        self.history_created = 0
+
+    def existing_order_numbers(self, order_numbers):
+        """Números de pedido del lote que ya existen, también los archivados"""
+        return set(
+            Order.objects.filter(order_number__in=order_numbers)
+            .values_list('order_number', flat=True)
+            .union(
+                ArchivedOrder.objects.filter(order_number__in=order_numbers)
+                .values_list('order_number', flat=True)
+            )
+        )
+
+    def exclude_existing(self, orders):
+        """Descarta los pedidos que ya existen o que se repiten dentro del lote"""
+        existing = self.existing_order_numbers([data['order_number'] for data in orders])
+
+        new_orders = []
+        for data in orders:
+            if data['order_number'] not in existing:
+                existing.add(data['order_number'])
+                new_orders.append(data)
+        self.skipped += len(orders) - len(new_orders)
+        return new_orders
+
+    def write(self, orders):
+        """
+        Guarda un lote de pedidos (diccionarios de ``parse_order_row``).
+
+        Los pedidos cuyo número ya exista (o que se repitan dentro del lote)
+        se omiten. Devuelve los ids de los pedidos creados.
+        """
+        return self.create(self.exclude_existing(orders))
+
+    def create(self, new_orders):
+        """Inserta pedidos nuevos con su historial en una transacción"""
+        if not new_orders:
+            return []
+
+        with transaction.atomic(), keep_created_at():
+            created = Order.objects.bulk_create(
+                [build_order(data) for data in new_orders],
+                batch_size=self.batch_size,
+            )
+            history = [
+                OrderHistory(order=order, **compact_history_entry(entry))
+                for order, data in zip(created, new_orders)
+                for entry in build_history_entries(data)
+            ]
+            OrderHistory.objects.bulk_create(history, batch_size=self.batch_size)
+            # bulk_create no lanza señales: snapshot y caché se actualizan aquí
+            refresh_tracking([order.pk for order in created])
+
+        self.created += len(created)
+        self.history_created += len(history)
+        return [order.pk for order in created]
+
+
+class DeltaOrderWriter(BulkOrderWriter):
+    """
+    Importación incremental: crea los pedidos nuevos, omite los que no han
+    cambiado y actualiza con ``bulk_update`` los que sí (según su hash).
+    """
+
+    # Campos que se reescriben cuando cambia el contenido del CSV
+    UPDATE_FIELDS = [
+        'customer_name',
+        'customer_email',
+        'customer_phone',
+        'delivery_address',
+        'delivery_city',
+        'delivery_postal_code',
+        'current_location',
+        'created_at',
+        'updated_at',
+        'estimated_delivery',
+        'delivered_at',
+        'content_hash',
+    ]
+
+    # bulk_update genera un CASE por campo: con lotes pequeños es mucho más rápido
+    UPDATE_BATCH_SIZE = 100
+
+    def __init__(self, batch_size=1000):
+        super().__init__(batch_size=batch_size)
+        self.updated = 0
+
+    def write(self, orders):
+        """Guarda un lote de pedidos. Devuelve los ids de los creados y actualizados."""
+        unique_orders = {}
+        for data in orders:
+            unique_orders.setdefault(data['order_number'], data)
+        self.skipped += len(orders) - len(unique_orders)
+
+        existing = {
+            order_number: (pk, content_hash)
+            for pk, order_number, content_hash in Order.objects.filter(
+                order_number__in=list(unique_orders)
+            ).values_list('pk', 'order_number', 'content_hash')
+        }
+
+        # Los archivados están cerrados: no se reimportan ni se actualizan
+        archived = set(
+            ArchivedOrder.objects.filter(order_number__in=list(unique_orders))
+            .values_list('order_number', flat=True)
+        ) if len(existing) < len(unique_orders) else set()
+
+        new_orders = []
+        changed = {}
+        for order_number, data in unique_orders.items():
+            if order_number in archived:
+                self.skipped += 1
+            elif order_number not in existing:
+                new_orders.append(data)
+            elif existing[order_number][1] != data['content_hash']:
+                changed[existing[order_number][0]] = data
+            else:
+                self.skipped += 1
+
+        with transaction.atomic():
+            ids = self.create(new_orders)
+            if changed:
+                self._update(changed)
+                ids.extend(changed)
+        return ids
+
+    def _update(self, changed):
+        """Actualiza los pedidos modificados y su historial generado"""
+        now = timezone.now()
+        orders = []
+        for pk, data in changed.items():
+            order = build_order(data)
+            order.pk = pk
+            order.updated_at = now
+            orders.append(order)
+        Order.objects.bulk_update(orders, self.UPDATE_FIELDS, batch_size=self.UPDATE_BATCH_SIZE)
+
+        # Solo se tocan las entradas que generó la importación (mismo estado y texto)
+        expected = {
+            (pk, entry['status'], entry['description']): entry
+            for pk, data in changed.items()
+            for entry in build_history_entries(data)
+        }
+        history = []
+        for entry in OrderHistory.objects.filter(order_id__in=list(changed)).only(
+            'id', 'order_id', 'status', 'template_id', 'description', 'location', 'timestamp'
+        ):
+            location, description = expand_history(entry.template_id, entry.location, entry.description)
+            new = expected.get((entry.order_id, entry.status, description))
+            if new and (location, entry.timestamp) != (new['location'], new['timestamp']):
+                compact = compact_history_entry(new)
+                entry.template_id = compact['template_id']
+                entry.location = compact['location']
+                entry.description = compact['description']
+                entry.timestamp = new['timestamp']
+                history.append(entry)
+        OrderHistory.objects.bulk_update(
+            history,
+            ['template', 'location', 'description', 'timestamp'],
+            batch_size=self.UPDATE_BATCH_SIZE,
+        )
+        refresh_tracking(list(changed))
+
+        self.updated += len(orders)
+
+
+class ImportCheckpoint:
+    """
+    Guarda cuántos pedidos del CSV se han procesado ya.
+
+    El punto de control se asocia a la ruta del fichero y deja de ser válido
+    si el fichero cambia (tamaño o fecha de modificación).
+    """
+
+    def __init__(self, path):
+        stat = os.stat(path)
+        self.key = f'import_orders:{os.path.abspath(path)}'
+        self.fingerprint = f'{stat.st_size}:{int(stat.st_mtime)}'
+
+    def load(self):
+        """Número de pedidos ya procesados (0 si no hay punto de control válido)"""
+        checkpoint = Checkpoint.objects.filter(key=self.key).first()
+        if checkpoint is None or checkpoint.data.get('fingerprint') != self.fingerprint:
+            return 0
+        return checkpoint.data.get('orders_done', 0)
+
+    def save(self, orders_done):
+        Checkpoint.objects.update_or_create(
+            key=self.key,
+            defaults={'data': {'fingerprint': self.fingerprint, 'orders_done': orders_done}},
+        )
+
+    def clear(self):
+        Checkpoint.objects.filter(key=self.key).delete()
+
+
+COPY_NULL = '\\N'
+
+
+def _copy_value(value):
+    """Formatea un valor para ``COPY ... (FORMAT csv)``"""
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Carga filas con ``COPY ... FROM STDIN`` (``columns`` ya entrecomilladas)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(value) for value in row])
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+        buffer,
+    )
+
+
+class CopyOrderWriter(BulkOrderWriter):
+    """
+    Escribe pedidos y su historial con ``COPY FROM STDIN`` (solo PostgreSQL).
+
+    Cada lote se copia a tablas temporales de staging y desde ahí se insertan
+    con un único ``INSERT ... SELECT`` los pedidos cuyo ``order_number`` no
+    exista todavía (ni en el archivo), junto con su historial.
+    """
+
+    ORDER_STAGE = 'import_orders_stage'
+    HISTORY_STAGE = 'import_history_stage'
+    NEW_ORDERS = 'import_orders_new'
+
+    def __init__(self, batch_size=10000):
+        super().__init__(batch_size=batch_size)
+        self.order_fields = [
+            field for field in Order._meta.concrete_fields if not field.primary_key
+        ]
+        self.history_fields = [
+            OrderHistory._meta.get_field(name)
+            for name in ('status', 'template', 'location', 'description', 'timestamp')
+        ]
+
+    def _columns(self, fields):
+        quote = connection.ops.quote_name
+        return ', '.join(quote(field.column) for field in fields)
+
+    def _order_rows(self, orders, now):
+        for data in orders:
+            order = build_order(data)
+            order.updated_at = now
+            yield [getattr(order, field.attname) for field in self.order_fields]
+
+    def _history_rows(self, orders):
+        for data in orders:
+            for position, entry in enumerate(build_history_entries(data)):
+                entry = compact_history_entry(entry)
+                yield [data['order_number'], position] + [
+                    entry[field.attname] for field in self.history_fields
+                ]
+
+    def write(self, orders):
+        """Guarda un lote de pedidos con COPY. Devuelve los ids de los creados."""
+        quote = connection.ops.quote_name
+        order_table = quote(Order._meta.db_table)
+        history_table = quote(OrderHistory._meta.db_table)
+        archive_table = quote(ArchivedOrder._meta.db_table)
+        order_columns = self._columns(self.order_fields)
+        history_columns = self._columns(self.history_fields)
+        stage_history_columns = ', '.join(
+            f'h.{quote(field.column)}' for field in self.history_fields
+        )
+        order_number = quote(Order._meta.get_field('order_number').column)
+        order_fk = quote(OrderHistory._meta.get_field('order').column)
+
+        # Si un pedido se repite dentro del lote se queda el primero
+        unique_orders = {}
+        for data in orders:
+            unique_orders.setdefault(data['order_number'], data)
+        unique_orders = list(unique_orders.values())
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Tablas de staging con los mismos tipos que las reales
+            cursor.execute(
+                f"CREATE TEMP TABLE {self.ORDER_STAGE} ON COMMIT DROP AS "
+                f"SELECT {order_columns} FROM {order_table} WITH NO DATA"
+            )
+            cursor.execute(
+                f"CREATE TEMP TABLE {self.HISTORY_STAGE} ON COMMIT DROP AS "
+                f"SELECT o.{order_number}, 0 AS position, {stage_history_columns} "
+                f"FROM {history_table} h JOIN {order_table} o ON false WITH NO DATA"
+            )
+            cursor.execute(
+                f"CREATE TEMP TABLE {self.NEW_ORDERS} ON COMMIT DROP AS "
+                f"SELECT id, {order_number} FROM {order_table} WITH NO DATA"
+            )
+
+            copy_rows(cursor, self.ORDER_STAGE, order_columns,
+                      self._order_rows(unique_orders, timezone.now()))
+            copy_rows(cursor, self.HISTORY_STAGE,
+                      f"{order_number}, position, {history_columns}",
+                      self._history_rows(unique_orders))
+
+            # Solo se insertan los pedidos cuyo número no existe todavía (ni archivado)
+            cursor.execute(
+                f"WITH inserted AS ("
+                f" INSERT INTO {order_table} ({order_columns})"
+                f" SELECT {order_columns} FROM {self.ORDER_STAGE} s"
+                f" WHERE NOT EXISTS ("
+                f"  SELECT 1 FROM {order_table} o WHERE o.{order_number} = s.{order_number}"
+                f" ) AND NOT EXISTS ("
+                f"  SELECT 1 FROM {archive_table} a WHERE a.{order_number} = s.{order_number}"
+                f" )"
+                f" ON CONFLICT ({order_number}) DO NOTHING"
+                f" RETURNING id, {order_number}"
+                f") INSERT INTO {self.NEW_ORDERS} SELECT id, {order_number} FROM inserted"
+            )
+            created = cursor.rowcount
+
+            cursor.execute(
+                f"INSERT INTO {history_table} ({order_fk}, {history_columns}) "
+                f"SELECT n.id, {stage_history_columns} "
+                f"FROM {self.HISTORY_STAGE} h JOIN {self.NEW_ORDERS} n USING ({order_number}) "
+                f"ORDER BY n.id, h.position"
+            )
+            history_created = cursor.rowcount
+
+            cursor.execute(f"SELECT id FROM {self.NEW_ORDERS}")
+            created_ids = [row[0] for row in cursor.fetchall()]
+            refresh_tracking(created_ids)
+
+        self.created += created
+        self.skipped += len(orders) - created
+        self.history_created += history_created
+        return created_ids
+
+
+WRITERS = {
+    'bulk': BulkOrderWriter,
+    'copy': CopyOrderWriter,
+    'delta': DeltaOrderWriter,
+}
+
+
+def _import_worker(mode, batch_size, batches, results):
+    """
+    Proceso hijo: parsea y escribe los lotes de su shard.
+
+    Cada proceso abre su propia conexión a la base de datos.
+    """
+    writer = WRITERS[mode](batch_size=batch_size)
+    try:
+        while (rows := batches.get()) is not None:
+            writer.write([parse_order_row(row) for row in rows])
+        results.put({
+            'created': writer.created,
+            'updated': getattr(writer, 'updated', 0),
+            'skipped': writer.skipped,
+        })
+    except Exception:
+        results.put({'error': traceback.format_exc()})
+    finally:
+        connections.close_all()
+
+
+class ParallelImporter:
+    """
+    Reparte los pedidos entre varios procesos según su ``order_number``.
+
+    El proceso padre solo lee y agrupa el CSV; el parseo y la escritura se
+    hacen en los hijos. Un mismo número de pedido siempre va al mismo proceso,
+    así que dos procesos nunca compiten por el mismo pedido.
+    """
+
+    QUEUE_SIZE = 4
+
+    def __init__(self, mode, workers, batch_size=1000):
+        self.mode = mode
+        self.workers = workers
+        self.batch_size = batch_size
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+
+    def shard(self, row):
+        return zlib.crc32(row['Name'].encode('utf-8')) % self.workers
+
+    def run(self, rows, progress=None):
+        """Importa las filas (``iter_order_rows``) y agrega los contadores"""
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        queues = [context.Queue(maxsize=self.QUEUE_SIZE) for _ in range(self.workers)]
+
+        # Los hijos no deben heredar la conexión abierta del padre
+        connections.close_all()
+        processes = [
+            context.Process(
+                target=_import_worker,
+                args=(self.mode, self.batch_size, batches, results),
+                daemon=True,
+            )
+            for batches in queues
+        ]
+        for process in processes:
+            process.start()
+
+        try:
+            pending = [[] for _ in range(self.workers)]
+            dispatched = 0
+            for row in rows:
+                shard = self.shard(row)
+                pending[shard].append(row)
+                if len(pending[shard]) >= self.batch_size:
+                    self._put(queues[shard], processes[shard], pending[shard])
+                    dispatched += len(pending[shard])
+                    pending[shard] = []
+                    if progress:
+                        progress(dispatched)
+
+            for shard, batch in enumerate(pending):
+                if batch:
+                    self._put(queues[shard], processes[shard], batch)
+                self._put(queues[shard], processes[shard], None)
+
+            errors = []
+            for _ in processes:
+                result = self._get_result(results, processes)
+                if 'error' in result:
+                    errors.append(result['error'])
+                    continue
+                self.created += result['created']
+                self.updated += result['updated']
+                self.skipped += result['skipped']
+            if errors:
+                raise RuntimeError('\n'.join(errors))
+        finally:
+            for process in processes:
+                process.join(timeout=1)
+                if process.is_alive():
+                    process.terminate()
+
+    def _get_result(self, results, processes):
+        """Espera el resultado de un hijo sin bloquearse si alguno ha muerto"""
+        while True:
+            try:
+                return results.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    raise RuntimeError('Algún proceso ha terminado sin devolver resultados')
+
+    def _put(self, batches, process, item):
+        """Encola un lote esperando si el proceso va retrasado"""
+        while True:
+            try:
+                batches.put(item, timeout=1)
+                return
+            except queue.Full:
+                if not process.is_alive():
+                    raise RuntimeError(f'El proceso {process.pid} ha terminado inesperadamente')
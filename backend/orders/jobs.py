@@ -0,0 +1,162 @@
+"""
+Cola de trabajos en segundo plano sobre PostgreSQL.
+
+Las vistas encolan el trabajo lento con ``enqueue`` (dentro de su propia
+transacción, así el trabajo solo existe si la petición se confirma) y los
+workers (``manage.py run_jobs``) lo ejecutan. Cada worker reclama lotes con
+``SELECT ... FOR UPDATE SKIP LOCKED``: varios workers vacían la cola en
+paralelo sin bloquearse entre sí ni ejecutar dos veces el mismo trabajo.
+
+Los trabajos que fallan se reintentan con espera exponencial hasta
+``max_attempts``; después quedan como ``FAILED`` para revisarlos en el admin.
+Los que terminan bien se borran.
+
+Mientras un worker vive renueva ``locked_at`` de sus trabajos cada
+``JOB_HEARTBEAT_INTERVAL`` segundos (``heartbeat``), así que un trabajo largo
+no se da por perdido. Si el worker muere, pasados ``JOB_LOCK_TIMEOUT``
+segundos sin latido el trabajo cuenta como un intento fallido: se reintenta
+con la misma espera o, si ya agotó ``max_attempts`` (p. ej. porque tumba al
+worker cada vez), queda como ``FAILED``.
+"""
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .tracking import refresh_tracking
+
+
+JOB_HANDLERS = {}
+
+
+def register_job(name):
+    """Registra la función que ejecuta los trabajos ``name`` (recibe el payload como kwargs)"""
+    def decorator(handler):
+        JOB_HANDLERS[name] = handler
+        return handler
+    return decorator
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=None):
+    """Encola un trabajo; se ejecutará cuando se confirme la transacción en curso"""
+    if name not in JOB_HANDLERS:
+        raise ValueError(f'Trabajo desconocido: {name}')
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def claim_jobs(worker, limit):
+    """Reclama hasta ``limit`` trabajos pendientes para el worker indicado"""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.PENDING, run_at__lte=now)
+            .order_by('run_at', 'id')[:limit]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.RUNNING,
+                locked_at=now,
+                locked_by=worker,
+                attempts=F('attempts') + 1,
+            )
+    for job in jobs:
+        job.status = Job.RUNNING
+        job.locked_at = now
+        job.locked_by = worker
+        job.attempts += 1
+    return jobs
+
+
+def release_jobs(jobs):
+    """Devuelve a la cola trabajos reclamados que no se llegaron a ejecutar"""
+    return Job.objects.filter(pk__in=[job.pk for job in jobs], status=Job.RUNNING).update(
+        status=Job.PENDING, locked_at=None, locked_by='', attempts=F('attempts') - 1
+    )
+
+
+def heartbeat(worker):
+    """Renueva el bloqueo de los trabajos reclamados por los hilos del worker (``locked_by`` empieza por ``worker``)"""
+    return Job.objects.filter(status=Job.RUNNING, locked_by__startswith=worker).update(
+        locked_at=timezone.now()
+    )
+
+
+def requeue_stale_jobs():
+    """
+    Recupera los trabajos de workers que murieron a mitad de ejecución.
+
+    Cada uno cuenta como un intento fallido: vuelve a la cola con espera o
+    queda como ``FAILED`` si ya no le quedan intentos. Devuelve cuántos
+    trabajos se han recuperado.
+    """
+    now = timezone.now()
+    expired = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    with transaction.atomic():
+        stale = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.RUNNING, locked_at__lt=expired)
+            .only('id', 'attempts', 'max_attempts', 'locked_by')
+        )
+        for job in stale:
+            error = f'El worker {job.locked_by} dejó de responder durante la ejecución'
+            if job.attempts >= job.max_attempts:
+                Job.objects.filter(pk=job.pk).update(
+                    status=Job.FAILED, locked_at=None, last_error=error
+                )
+            else:
+                Job.objects.filter(pk=job.pk).update(
+                    status=Job.PENDING,
+                    locked_at=None,
+                    locked_by='',
+                    run_at=now + timedelta(seconds=retry_delay(job.attempts)),
+                    last_error=error,
+                )
+    return len(stale)
+
+
+def retry_delay(attempts):
+    """Espera antes del siguiente intento: exponencial y con tope"""
+    return min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+
+
+def run_job(job):
+    """Ejecuta un trabajo reclamado; devuelve ``True`` si terminó bien"""
+    try:
+        handler = JOB_HANDLERS.get(job.name)
+        if handler is None:
+            raise LookupError(f'Trabajo desconocido: {job.name}')
+        handler(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, locked_at=None, last_error=error
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.PENDING,
+                locked_at=None,
+                locked_by='',
+                run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+                last_error=error,
+            )
+        return False
+
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+@register_job('refresh_tracking')
+def refresh_tracking_job(order_ids):
+    """Regenera los snapshots de seguimiento de los pedidos"""
+    refresh_tracking(order_ids)
@@ -0,0 +1,208 @@
+"""
+Avisos de cambios en el seguimiento para los streams en directo (SSE).
+
+Cada vez que se invalida el seguimiento de unos pedidos (``invalidate_tracking``,
+por donde pasan todas las escrituras) se publican sus números de pedido. Las
+conexiones abiertas en ``/api/orders/track/{order_number}/stream/`` se
+suscriben a su pedido y, al recibir el aviso, vuelven a leer el seguimiento y
+lo envían si su ``ETag`` ha cambiado.
+
+Con ``LIVE_TRACKING_BACKEND = 'postgres'`` los avisos viajan por un único
+canal ``LISTEN``/``NOTIFY``: cada proceso abre una sola conexión que escucha
+y reparte los avisos entre sus suscriptores, así que da igual en qué worker
+se hizo la escritura. Con ``'memory'`` solo llegan a los suscriptores del
+mismo proceso (desarrollo y pruebas sin PostgreSQL).
+
+Solo se publica con ``LIVE_TRACKING`` activado (por defecto, en modo ASGI):
+con WSGI el stream responde una vez y cierra, así que nadie escucha y cada
+importación o pasada masiva haría un ``NOTIFY`` inútil.
+"""
+import asyncio
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'tracking_updates'
+
+# NOTIFY admite payloads de hasta 8000 bytes: los números se agrupan por debajo
+NOTIFY_PAYLOAD_SIZE = 7500
+
+
+class Subscription:
+    """Suscripción de un stream a los cambios de un pedido"""
+
+    def __init__(self, order_number):
+        self.order_number = order_number
+        self.loop = asyncio.get_running_loop()
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        """Marca la suscripción como pendiente; se puede llamar desde cualquier hilo"""
+        try:
+            self.loop.call_soon_threadsafe(self.changed.set)
+        except RuntimeError:
+            # El bucle del stream ya se cerró
+            pass
+
+    async def wait(self, timeout):
+        """Espera un aviso; devuelve ``False`` si pasa ``timeout`` sin ninguno"""
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.changed.clear()
+        return True
+
+
+class Broadcaster:
+    """Reparte los avisos entre las suscripciones del proceso"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+
+    def subscribe(self, order_number):
+        subscription = Subscription(order_number)
+        with self.lock:
+            self.subscriptions.setdefault(order_number, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.order_number)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.order_number]
+
+    def publish(self, order_numbers):
+        """Avisa de que el seguimiento de los pedidos ha cambiado"""
+        self.deliver(order_numbers)
+
+    def deliver(self, order_numbers):
+        with self.lock:
+            subscriptions = [
+                subscription
+                for order_number in set(order_numbers)
+                for subscription in self.subscriptions.get(order_number, ())
+            ]
+        for subscription in subscriptions:
+            subscription.notify()
+
+    def deliver_all(self):
+        with self.lock:
+            subscriptions = [
+                subscription
+                for subscriptions in self.subscriptions.values()
+                for subscription in subscriptions
+            ]
+        for subscription in subscriptions:
+            subscription.notify()
+
+
+class PostgresBroadcaster(Broadcaster):
+    """
+    Broadcaster entre procesos sobre ``LISTEN``/``NOTIFY``.
+
+    La escucha se hace en un hilo con su propia conexión, que se abre con
+    la primera suscripción del proceso y se reconecta si se cae. Al
+    reconectar se avisa a todas las suscripciones, porque los avisos
+    enviados mientras tanto se han perdido.
+    """
+    POLL_TIMEOUT = 5
+    RECONNECT_DELAY = 5
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+
+    def subscribe(self, order_number):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(
+                    target=self.listen, name='tracking-listener', daemon=True
+                )
+                self.listener.start()
+        return super().subscribe(order_number)
+
+    def publish(self, order_numbers):
+        with connection.cursor() as cursor:
+            for payload in notify_payloads(order_numbers):
+                cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+
+    def listen(self):
+        while True:
+            conn = None
+            try:
+                wrapper = connections.create_connection(DEFAULT_DB_ALIAS)
+                conn = wrapper.get_new_connection(wrapper.get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CHANNEL}')
+                self.deliver_all()
+
+                while True:
+                    if select.select([conn], [], [], self.POLL_TIMEOUT) == ([], [], []):
+                        continue
+                    conn.poll()
+                    order_numbers = []
+                    while conn.notifies:
+                        order_numbers.extend(conn.notifies.pop(0).payload.split('\n'))
+                    self.deliver(order_numbers)
+            except Exception:
+                logger.exception('Conexión LISTEN del seguimiento en directo perdida')
+                time.sleep(self.RECONNECT_DELAY)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+def notify_payloads(order_numbers):
+    """Agrupa los números de pedido en payloads de ``NOTIFY`` separados por saltos de línea"""
+    payload = []
+    size = 0
+    for order_number in dict.fromkeys(order_numbers):
+        length = len(order_number.encode()) + 1
+        if payload and size + length > NOTIFY_PAYLOAD_SIZE:
+            yield '\n'.join(payload)
+            payload, size = [], 0
+        payload.append(order_number)
+        size += length
+    if payload:
+        yield '\n'.join(payload)
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    """Broadcaster del proceso según ``LIVE_TRACKING_BACKEND``"""
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            if settings.LIVE_TRACKING_BACKEND == 'postgres':
+                _broadcaster = PostgresBroadcaster()
+            else:
+                _broadcaster = Broadcaster()
+        return _broadcaster
+
+
+def publish_tracking_update(order_numbers):
+    """Publica el cambio de seguimiento de los pedidos; los errores no afectan a la escritura"""
+    if not settings.LIVE_TRACKING:
+        return
+    order_numbers = [order_number for order_number in order_numbers if order_number]
+    if not order_numbers:
+        return
+    try:
+        get_broadcaster().publish(order_numbers)
+    except Exception:
+        logger.exception('No se pudieron publicar los cambios de seguimiento')
@@ -0,0 +1,76 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from orders.archive import OrderArchiver, archivable_orders, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve al archivo los pedidos entregados o cancelados hace más de N días, '
+        'con su historial, en lotes pequeños'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help=f'Antigüedad mínima desde la entrega o cancelación (por defecto {settings.ARCHIVE_AFTER_DAYS})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ARCHIVE_BATCH_SIZE,
+            help=f'Pedidos por transacción (por defecto {settings.ARCHIVE_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Número máximo de lotes en esta ejecución (por defecto hasta terminar)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Segundos de espera entre lotes para no competir con el tráfico (por defecto 0)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo cuenta los pedidos que se archivarían'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('archive_orders necesita PostgreSQL')
+        if options['days'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--days y --batch-size deben ser al menos 1')
+
+        cutoff = archive_cutoff(options['days'])
+        if options['dry_run']:
+            count = archivable_orders(cutoff).count()
+            self.stdout.write(self.style.SUCCESS(
+                f'🔎 {count} pedidos cerrados antes del {cutoff:%Y-%m-%d} se archivarían'
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'🗄️  Archivando pedidos cerrados antes del {cutoff:%Y-%m-%d}...'
+        ))
+        archiver = OrderArchiver(cutoff, batch_size=options['batch_size'])
+
+        def progress(archived):
+            self.stdout.write(f'   … {archived} pedidos archivados')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        started = time.monotonic()
+        archiver.run(max_batches=options['max_batches'], progress=progress)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f'\n🎉 Archivado completado!'))
+        self.stdout.write(self.style.SUCCESS(f'   📦 Pedidos archivados: {archiver.orders_archived}'))
+        self.stdout.write(self.style.SUCCESS(f'   📜 Entradas de historial archivadas: {archiver.history_archived}'))
+        self.stdout.write(self.style.SUCCESS(f'   ⏱️  Tiempo: {elapsed:.1f}s'))
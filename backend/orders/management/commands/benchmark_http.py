@@ -0,0 +1,326 @@
+import http.client
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from prometheus_client.parser import text_string_to_metric_families
+from orders.models import Order
+
+
+# Rutas (view_name) de cada endpoint en las métricas de /metrics
+ENDPOINT_ROUTES = {
+    'track': ['order-track', 'order-track-async'],
+    'search': ['order-search', 'order-search-async'],
+    'list': ['order-list'],
+    'admin': ['admin:orders_order_changelist'],
+}
+ADMIN_QUERIES = ['', '?status__exact=IN_TRANSIT', '?is_delayed__exact=1', '?q={order_number}']
+
+
+class Command(BaseCommand):
+    help = (
+        'Lanza peticiones concurrentes contra un servidor en marcha (gunicorn WSGI o '
+        'ASGI) y mide latencia, rendimiento y consultas por petición de cada endpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000',
+            help='URL base del servidor (por defecto http://127.0.0.1:8000)'
+        )
+        parser.add_argument(
+            '--endpoint',
+            choices=list(ENDPOINT_ROUTES),
+            action='append',
+            help='Endpoint a medir; se puede repetir para mezclarlos '
+                 '(por defecto track, search, list y admin a la vez)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Conexiones simultáneas (por defecto 50)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=5000,
+            help='Número total de peticiones (por defecto 5000)'
+        )
+        parser.add_argument(
+            '--orders',
+            type=int,
+            default=500,
+            help='Pedidos distintos a consultar, elegidos al azar (por defecto 500)'
+        )
+        parser.add_argument(
+            '--missing-ratio',
+            type=float,
+            default=0.0,
+            help='Proporción de números de pedido inexistentes (por defecto 0)'
+        )
+        parser.add_argument(
+            '--admin-user',
+            help='Usuario con el que se abre la sesión del admin (por defecto el primer superusuario)'
+        )
+        parser.add_argument(
+            '--json',
+            dest='json_path',
+            help='Guarda los resultados en este fichero JSON para comparar ejecuciones'
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency y --requests deben ser al menos 1')
+
+        order_numbers = list(
+            Order.objects.order_by('?').values_list('order_number', flat=True)[:options['orders']]
+        )
+        if not order_numbers:
+            raise CommandError('No hay pedidos en la base de datos')
+
+        url = urlsplit(options['url'])
+        self.host, self.port = url.hostname, url.port or 80
+        self.prefix = url.path.rstrip('/')
+        self.endpoints = options['endpoint'] or list(ENDPOINT_ROUTES)
+        self.order_numbers = order_numbers
+        self.missing_ratio = options['missing_ratio']
+        self.session = self.admin_session(options['admin_user']) if 'admin' in self.endpoints else None
+
+        self.remaining = options['requests']
+        self.lock = threading.Lock()
+        self.latencies = {endpoint: [] for endpoint in self.endpoints}
+        self.statuses = {endpoint: Counter() for endpoint in self.endpoints}
+        self.errors = Counter()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'🏁 {options["requests"]} peticiones a {", ".join(self.endpoints)} con '
+            f'{options["concurrency"]} conexiones contra {options["url"]}'
+        ))
+        metrics_before = self.scrape_query_metrics()
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self.client) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        metrics_after = self.scrape_query_metrics()
+
+        if self.session is not None:
+            self.session.delete()
+
+        results = self.results(elapsed, metrics_before, metrics_after)
+        self.report(results)
+        if options['json_path']:
+            run = {
+                'commit': self.git_commit(),
+                'date': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'url': options['url'],
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'missing_ratio': self.missing_ratio,
+                **results,
+            }
+            with open(options['json_path'], 'w') as file:
+                json.dump(run, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'💾 Resultados guardados en {options["json_path"]}'))
+
+    def admin_session(self, username):
+        """Abre una sesión del admin directamente en la base de datos (sin contraseña)"""
+        users = get_user_model().objects.filter(is_active=True, is_staff=True)
+        user = users.filter(username=username).first() if username else users.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError('No hay ningún usuario del admin con el que medir el changelist')
+        session = SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session
+
+    def next_request(self):
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+    def build_request(self, endpoint):
+        if random.random() < self.missing_ratio:
+            order_number = f'missing-{random.randint(0, 10 ** 9)}'
+        else:
+            order_number = random.choice(self.order_numbers)
+
+        if endpoint == 'track':
+            return 'GET', f'{self.prefix}/api/orders/track/{order_number}/', None, {}
+        if endpoint == 'search':
+            body = json.dumps({'order_number': order_number})
+            return 'POST', f'{self.prefix}/api/orders/search/', body, {'Content-Type': 'application/json'}
+        if endpoint == 'list':
+            return 'GET', f'{self.prefix}/api/orders/?page_size=20', None, {}
+        query = random.choice(ADMIN_QUERIES).format(order_number=order_number)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.session.session_key}'
+        return 'GET', f'{self.prefix}/admin/orders/order/{query}', None, {'Cookie': cookie}
+
+    def client(self):
+        """Un cliente con conexión keep-alive que lanza peticiones hasta agotar el total"""
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        latencies = {endpoint: [] for endpoint in self.endpoints}
+        statuses = {endpoint: Counter() for endpoint in self.endpoints}
+        errors = Counter()
+        while self.next_request():
+            endpoint = random.choice(self.endpoints)
+            method, path, body, headers = self.build_request(endpoint)
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as error:
+                errors[type(error).__name__] += 1
+                connection.close()
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                continue
+            latencies[endpoint].append(time.perf_counter() - started)
+            statuses[endpoint][response.status] += 1
+        connection.close()
+
+        with self.lock:
+            for endpoint in self.endpoints:
+                self.latencies[endpoint].extend(latencies[endpoint])
+                self.statuses[endpoint].update(statuses[endpoint])
+            self.errors.update(errors)
+
+    def scrape_query_metrics(self):
+        """
+        Consultas SQL acumuladas por ruta según ``/metrics``: ``{route: (consultas, peticiones)}``.
+
+        Devuelve ``None`` si el servidor no expone las métricas.
+        """
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {'Authorization': f'Bearer {settings.METRICS_TOKEN}'} if settings.METRICS_TOKEN else {}
+        try:
+            connection.request('GET', f'{self.prefix}/metrics', headers=headers)
+            response = connection.getresponse()
+            body = response.read().decode()
+        except (OSError, http.client.HTTPException):
+            return None
+        finally:
+            connection.close()
+        if response.status != 200:
+            return None
+
+        totals = {}
+        for family in text_string_to_metric_families(body):
+            if family.name != 'django_request_db_queries':
+                continue
+            for sample in family.samples:
+                route = sample.labels.get('route')
+                queries, requests = totals.get(route, (0, 0))
+                if sample.name.endswith('_sum'):
+                    totals[route] = (queries + sample.value, requests)
+                elif sample.name.endswith('_count'):
+                    totals[route] = (queries, requests + sample.value)
+        return totals
+
+    def results(self, elapsed, metrics_before, metrics_after):
+        def summary(latencies, statuses, queries):
+            latencies = sorted(latencies)
+            if not latencies:
+                return {'requests': 0}
+
+            def percentile(value):
+                return round(latencies[min(len(latencies) - 1, int(len(latencies) * value))] * 1000, 2)
+
+            return {
+                'requests': len(latencies),
+                'throughput': round(len(latencies) / elapsed, 1),
+                'p50_ms': percentile(0.50),
+                'p95_ms': percentile(0.95),
+                'p99_ms': percentile(0.99),
+                'max_ms': round(latencies[-1] * 1000, 2),
+                'queries_per_request': queries,
+                'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            }
+
+        def queries_per_request(routes):
+            if metrics_before is None or metrics_after is None:
+                return None
+            queries = requests = 0
+            for route in routes:
+                after_queries, after_requests = metrics_after.get(route, (0, 0))
+                before_queries, before_requests = metrics_before.get(route, (0, 0))
+                queries += after_queries - before_queries
+                requests += after_requests - before_requests
+            return round(queries / requests, 2) if requests else None
+
+        endpoints = {
+            endpoint: summary(
+                self.latencies[endpoint],
+                self.statuses[endpoint],
+                queries_per_request(ENDPOINT_ROUTES[endpoint]),
+            )
+            for endpoint in self.endpoints
+        }
+        total_statuses = Counter()
+        for statuses in self.statuses.values():
+            total_statuses.update(statuses)
+        total = summary(
+            [latency for latencies in self.latencies.values() for latency in latencies],
+            total_statuses,
+            queries_per_request([route for endpoint in self.endpoints for route in ENDPOINT_ROUTES[endpoint]]),
+        )
+        return {
+            'duration_s': round(elapsed, 2),
+            'endpoints': endpoints,
+            'total': total,
+            'connection_errors': dict(self.errors),
+        }
+
+    def report(self, results):
+        if not results['total']['requests']:
+            raise CommandError(f'Ninguna petición completada: {results["connection_errors"]}')
+
+        self.stdout.write(f'   Completadas: {results["total"]["requests"]} en {results["duration_s"]:.2f}s\n')
+        self.stdout.write(
+            f'   {"Endpoint":<8} {"pet/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+            f'{"consultas":>10}  códigos'
+        )
+        for name, summary in [*results['endpoints'].items(), ('total', results['total'])]:
+            if not summary['requests']:
+                continue
+            queries = summary['queries_per_request']
+            line = (
+                f'   {name:<8} {summary["throughput"]:>8,.0f} {summary["p50_ms"]:>8.1f} '
+                f'{summary["p95_ms"]:>8.1f} {summary["p99_ms"]:>8.1f} '
+                f'{"-" if queries is None else f"{queries:.1f}":>10}  {summary["statuses"]}'
+            )
+            self.stdout.write(self.style.SUCCESS(line) if name == 'total' else line)
+        if results['endpoints'] and all(
+            summary.get('queries_per_request') is None for summary in results['endpoints'].values()
+        ):
+            self.stdout.write(self.style.WARNING('   ⚠️  Sin consultas por petición: el servidor no expone /metrics'))
+        if results['connection_errors']:
+            self.stdout.write(self.style.WARNING(f'   ⚠️  Errores de conexión: {results["connection_errors"]}'))
+
+    def git_commit(self):
+        """Commit del código medido, para comparar ejecuciones (``None`` fuera de git)"""
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
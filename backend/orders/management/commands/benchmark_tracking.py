@@ -0,0 +1,74 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from orders.models import Order
+from orders.serializers import tracking_payloads
+from orders.tracking import build_tracking_payload, tracking_queryset
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el serializer de DRF con la serialización rápida del seguimiento '
+        'y comprueba que el JSON generado es idéntico'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--orders',
+            type=int,
+            default=500,
+            help='Número de pedidos a serializar en cada pasada (por defecto 500)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Número de pasadas; se usa la más rápida (por defecto 5)'
+        )
+
+    def handle(self, *args, **options):
+        order_ids = list(Order.objects.order_by('pk').values_list('pk', flat=True)[:options['orders']])
+        if not order_ids:
+            raise CommandError('No hay pedidos en la base de datos')
+        
+        renderer = JSONRenderer()
+        orders = list(tracking_queryset().filter(pk__in=order_ids))
+        fast = tracking_payloads(Order.objects.filter(pk__in=order_ids))
+        
+        # Ambos caminos deben producir exactamente los mismos bytes
+        mismatches = [
+            order.order_number for order in orders
+            if renderer.render(build_tracking_payload(order)) != renderer.render(fast[order.pk])
+        ]
+        if mismatches:
+            raise CommandError(f'La salida no coincide para los pedidos: {", ".join(mismatches[:10])}')
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'🔬 {len(order_ids)} pedidos, {options["repeat"]} pasadas (JSON idéntico ✅)\n'
+        ))
+        
+        results = [
+            ('DRF (solo serialización)', lambda: [build_tracking_payload(order) for order in orders]),
+            ('DRF (consultas + serialización)', lambda: [
+                build_tracking_payload(order) for order in tracking_queryset().filter(pk__in=order_ids)
+            ]),
+            ('Rápida (consultas + serialización)', lambda: tracking_payloads(Order.objects.filter(pk__in=order_ids))),
+        ]
+        
+        timings = {}
+        for name, run in results:
+            timings[name] = self.best_of(run, options['repeat'])
+            rate = len(order_ids) / timings[name]
+            self.stdout.write(f'   {name:<36} {timings[name] * 1000:8.1f} ms  ({rate:,.0f} pedidos/s)')
+        
+        speedup = timings['DRF (consultas + serialización)'] / timings['Rápida (consultas + serialización)']
+        self.stdout.write(self.style.SUCCESS(f'\n🚀 La serialización rápida es {speedup:.1f}x más rápida'))
+
+    def best_of(self, run, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
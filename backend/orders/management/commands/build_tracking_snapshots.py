@@ -0,0 +1,59 @@
+import time
+from django.core.management.base import BaseCommand
+from orders.jobs import enqueue
+from orders.models import Order
+from orders.tracking import refresh_tracking
+
+
+class Command(BaseCommand):
+    help = 'Calcula el snapshot de seguimiento de los pedidos existentes por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Número de pedidos por lote (por defecto 500)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recalcula todos los pedidos, no solo los que no tienen snapshot'
+        )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='Encolar un trabajo por lote para los workers (run_jobs) en lugar de calcularlos aquí'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Order.objects.order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(tracking_snapshot__isnull=True)
+        
+        self.stdout.write(self.style.SUCCESS('🧮 Calculando snapshots de seguimiento...'))
+        started = time.monotonic()
+        
+        # Paginación por pk: cada lote es una consulta por índice, sin OFFSET
+        built_count = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            if options['enqueue']:
+                enqueue('refresh_tracking', {'order_ids': batch})
+                built_count += len(batch)
+            else:
+                built_count += len(refresh_tracking(batch, batch_size=batch_size))
+            last_pk = batch[-1]
+            self.stdout.write(f'   … {built_count} pedidos')
+        
+        elapsed = time.monotonic() - started
+        if options['enqueue']:
+            self.stdout.write(self.style.SUCCESS(f'\n🎉 Encolados {built_count} pedidos en {elapsed:.1f}s'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'\n🎉 Snapshots calculados: {built_count} en {elapsed:.1f}s'))
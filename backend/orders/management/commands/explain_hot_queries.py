@@ -0,0 +1,130 @@
+import json
+from datetime import timedelta
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from orders.models import Order, OrderHistory
+from orders.pagination import OrderCursorPagination, OrderHistoryCursorPagination
+from orders.views import OrderViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta EXPLAIN sobre las consultas habituales de la API y del admin '
+        'y falla si alguna recorre una tabla entera (Seq Scan)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force-index',
+            action='store_true',
+            help=(
+                'Desactivar los Seq Scan para comprobar solo que existe un índice utilizable '
+                '(útil con tablas pequeñas, donde PostgreSQL los prefiere). Por defecto se usa '
+                'el planificador tal cual, para ver el plan que se elegiría con los datos reales'
+            )
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Mostrar el plan completo de cada consulta'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Este comando necesita PostgreSQL')
+
+        order = Order.objects.order_by('-created_at', '-id')[100:101].first() or Order.objects.first()
+        if order is None:
+            raise CommandError('No hay pedidos en la base de datos')
+
+        failures = []
+        with transaction.atomic():
+            if options['force_index']:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in self.hot_queries(order):
+                plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+                nodes = list(self.walk(plan))
+                seq_scans = [node['Relation Name'] for node in nodes if node['Node Type'] == 'Seq Scan']
+                indexes = sorted({node['Index Name'] for node in nodes if 'Index Name' in node})
+
+                if seq_scans:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f'❌ {name}: Seq Scan en {", ".join(seq_scans)}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'✅ {name}: {", ".join(indexes)}'))
+                if options['verbose_plans'] or seq_scans:
+                    self.stdout.write(f'   {queryset.explain()}'.replace('\n', '\n   '))
+
+        if failures:
+            raise CommandError(f'{len(failures)} consultas sin índice: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('\n🎉 Todas las consultas usan índices'))
+
+    def walk(self, plan):
+        yield plan
+        for child in plan.get('Plans', []):
+            yield from self.walk(child)
+
+    def hot_queries(self, order):
+        """Consultas de views.py y admin.py, tal y como se lanzan"""
+        by_number = Order.objects.filter(order_number=order.order_number)
+        yield 'track: snapshot', by_number.values_list('pk', 'updated_at', 'tracking_snapshot')[:1]
+        yield 'track: validadores (304)', by_number.values_list('pk', 'updated_at')[:1]
+
+        page_size = OrderCursorPagination.page_size
+        orders = OrderViewSet(action='list').get_queryset().order_by(*OrderCursorPagination.ordering)
+        yield 'listado: primera página', orders[:page_size + 1]
+        paginator = OrderCursorPagination()
+        position = paginator._get_position_from_instance(order, paginator.ordering)
+        yield 'listado: página con cursor', orders.filter(
+            paginator._position_filter(Order, position, before=True)
+        )[:page_size + 1]
+
+        page_ids = list(orders.values_list('pk', flat=True)[:page_size])
+        yield 'listado: historial precargado', (
+            OrderHistory.objects.filter(order_id__in=page_ids).order_by('-timestamp', '-id')
+        )
+        yield 'historial: página', (
+            OrderHistory.objects.filter(order=order)
+            .order_by(*OrderHistoryCursorPagination.ordering)[:page_size + 1]
+        )
+
+        # Mismos valores que los enlaces de DateFieldListFilter
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        last_week = {
+            'created_at__gte': str(today - timedelta(days=7)),
+            'created_at__lt': str(today + timedelta(days=1)),
+        }
+        for name, params in [
+            ('admin pedidos: sin filtros', {}),
+            ('admin pedidos: estado', {'status__exact': 'IN_TRANSIT'}),
+            ('admin pedidos: pendientes de entrega', {'entrega': 'pendiente'}),
+            ('admin pedidos: con retraso', {'is_delayed__exact': '1'}),
+            ('admin pedidos: ciudad', {'delivery_city': order.delivery_city or ''}),
+            ('admin pedidos: últimos 7 días', last_week),
+            ('admin pedidos: búsqueda', {'q': order.customer_name or order.order_number}),
+        ]:
+            yield name, self.changelist_queryset(Order, params)
+
+        for name, params in [
+            ('admin historial: sin filtros', {}),
+            ('admin historial: últimos 7 días', {
+                'timestamp__gte': last_week['created_at__gte'],
+                'timestamp__lt': last_week['created_at__lt'],
+            }),
+            ('admin historial: búsqueda', {'q': order.order_number}),
+        ]:
+            yield name, self.changelist_queryset(OrderHistory, params)
+
+    def changelist_queryset(self, model, params):
+        """Primera página del listado del admin con los filtros indicados"""
+        model_admin = admin.site._registry[model]
+        request = RequestFactory().get('/admin/', params)
+        request.user = AnonymousUser()
+        changelist = model_admin.get_changelist_instance(request)
+        return changelist.queryset[:model_admin.list_per_page]
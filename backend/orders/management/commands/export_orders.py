@@ -0,0 +1,101 @@
+import gzip
+import sys
+import time
+from datetime import datetime, time as datetime_time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from orders.exports import EXPORT_CHUNK_SIZE, EXPORTERS, filter_orders
+from orders.models import Order
+
+
+def parse_moment(value):
+    """Admite fechas (``2024-01-31``) y fechas con hora en ISO 8601"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.combine(day, datetime_time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = 'Exporta pedidos con su historial en CSV o NDJSON (en streaming, con memoria constante)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=list(EXPORTERS),
+            default='csv',
+            help='Formato de salida (por defecto csv)'
+        )
+        parser.add_argument(
+            '--output',
+            help='Fichero de salida; con extensión .gz se comprime (por defecto la salida estándar)'
+        )
+        parser.add_argument(
+            '--status',
+            choices=[status for status, _ in Order.STATUS_CHOICES],
+            action='append',
+            help='Exporta solo pedidos en este estado; se puede repetir'
+        )
+        parser.add_argument(
+            '--since',
+            help='Pedidos creados desde esta fecha (incluida), p. ej. 2024-01-01'
+        )
+        parser.add_argument(
+            '--until',
+            help='Pedidos creados antes de esta fecha (excluida), p. ej. 2024-02-01'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help=f'Pedidos leídos por bloque (por defecto {EXPORT_CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size debe ser al menos 1')
+        try:
+            since = parse_moment(options['since']) if options['since'] else None
+            until = parse_moment(options['until']) if options['until'] else None
+        except ValueError as error:
+            raise CommandError(f'Fecha no válida: {error}')
+
+        queryset = filter_orders(Order.objects.all(), options['status'], since, until)
+        chunks = EXPORTERS[options['format']](queryset, chunk_size=options['chunk_size'])
+
+        output_path = options['output']
+        if output_path is None:
+            output = sys.stdout
+            # Con la exportación en stdout el resumen va a stderr
+            log = self.stderr
+        elif output_path.endswith('.gz'):
+            output = gzip.open(output_path, 'wt', encoding='utf-8', newline='')
+            log = self.stdout
+        else:
+            output = open(output_path, 'w', encoding='utf-8', newline='')
+            log = self.stdout
+
+        started = time.monotonic()
+        written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+            else:
+                output.flush()
+        elapsed = time.monotonic() - started
+
+        log.write(self.style.SUCCESS(
+            f'📤 Exportación {options["format"].upper()} completada en {elapsed:.1f}s '
+            f'({written / 1024 / 1024:.1f} MB)'
+            + (f' en {output_path}' if output_path else '')
+        ))
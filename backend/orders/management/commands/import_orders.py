@@ -1,167 +1,185 @@
-import csv
-from datetime import datetime
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from orders.models import Order, OrderHistory
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from orders.importer import (
+    BulkOrderWriter,
+    CopyOrderWriter,
+    DeltaOrderWriter,
+    ImportCheckpoint,
+    ParallelImporter,
+    batched,
+    build_history_entries,
+    build_order,
+    iter_order_rows,
+    iter_orders,
+    open_csv,
+)
+from orders.history import compact_history_entry
+from orders.metrics import record_import
+from orders.models import ArchivedOrder, Order, OrderHistory
 
 
 class Command(BaseCommand):
     help = 'Importa pedidos desde un CSV de Shopify'
 
     def add_arguments(self, parser):
-        parser.add_argument('csv_file', type=str, help='Ruta al archivo CSV')
+        parser.add_argument('csv_file', type=str, help='Ruta al archivo CSV (admite .csv.gz)')
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Escribe los pedidos por lotes con bulk_create (mucho más rápido)'
+        )
+        mode.add_argument(
+            '--copy',
+            action='store_true',
+            help='Escribe los pedidos con COPY FROM STDIN (solo PostgreSQL, para cargas masivas)'
+        )
+        mode.add_argument(
+            '--delta',
+            action='store_true',
+            help='Importación incremental: actualiza los pedidos que han cambiado y omite el resto'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Número de pedidos por lote en los modos --bulk, --copy y --delta (por defecto 1000)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Número de procesos que importan en paralelo (modos por lotes, por defecto 1)'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Retoma una importación por lotes interrumpida desde su último punto de control'
+        )
 
     def handle(self, *args, **options):
         csv_file = options['csv_file']
         
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('El modo --copy solo está disponible con PostgreSQL')
+        
+        if options['copy']:
+            writer = CopyOrderWriter(batch_size=options['batch_size'])
+        elif options['delta']:
+            writer = DeltaOrderWriter(batch_size=options['batch_size'])
+        elif options['bulk']:
+            writer = BulkOrderWriter(batch_size=options['batch_size'])
+        else:
+            writer = None
+        
+        if options['resume'] and writer is None:
+            raise CommandError('--resume solo está disponible en los modos --bulk, --copy y --delta')
+        
+        if options['workers'] < 1:
+            raise CommandError('--workers debe ser al menos 1')
+        
+        if options['workers'] > 1:
+            if writer is None:
+                raise CommandError('--workers solo está disponible en los modos --bulk, --copy y --delta')
+            if options['resume']:
+                raise CommandError('--resume no se puede combinar con --workers')
+            mode = next(name for name in ('copy', 'delta', 'bulk') if options[name])
+            writer = ParallelImporter(mode, options['workers'], batch_size=options['batch_size'])
+        
         self.stdout.write(self.style.SUCCESS(f'📦 Importando pedidos desde {csv_file}...'))
+        started = time.monotonic()
         
-        # Diccionario para agrupar pedidos por número
-        orders_dict = {}
+        checkpoint = ImportCheckpoint(csv_file)
+        resumed_from = checkpoint.load() if options['resume'] else 0
+        if resumed_from:
+            self.stdout.write(f'   ↩️  Retomando tras {resumed_from} pedidos ya procesados')
         
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            
-            for row in reader:
-                order_id = row['Id']
-                order_number = row['Name']  # #1002, #1003, etc.
-                
-                # Saltar si ya procesamos este pedido
-                if order_number in orders_dict:
-                    continue
-                
-                # Extraer datos relevantes
-                shipping_name = row['Shipping Name'] or row['Billing Name']
-                shipping_email = row['Email']
-                shipping_phone = row['Shipping Phone'] or row['Billing Phone']
-                
-                # Construir dirección completa
-                shipping_address = row['Shipping Address1'] or row['Billing Address1']
-                shipping_address2 = row['Shipping Address2'] or row['Billing Address2']
-                if shipping_address2:
-                    shipping_address += f", {shipping_address2}"
-                
-                shipping_city = row['Shipping City'] or row['Billing City']
-                shipping_zip = row['Shipping Zip'] or row['Billing Zip']
-                shipping_province = row['Shipping Province'] or row['Billing Province']
-                shipping_country = row['Shipping Country'] or row['Billing Country']
-                
-                # Dirección completa
-                full_address = f"{shipping_address}, {shipping_city}"
-                if shipping_province:
-                    full_address += f", {shipping_province}"
-                full_address += f", {shipping_country}"
-                
-                # Parsear fecha de creación
-                created_at_str = row['Created at']
-                try:
-                    created_at = datetime.strptime(created_at_str, '%Y-%m-%d %H:%M:%S %z')
-                except:
-                    created_at = timezone.now()
-                
-                # Parsear fecha de entrega (fulfilled at)
-                fulfilled_at_str = row['Fulfilled at']
-                delivered_at = None
-                if fulfilled_at_str:
-                    try:
-                        delivered_at = datetime.strptime(fulfilled_at_str, '%Y-%m-%d %H:%M:%S %z')
-                    except:
-                        delivered_at = timezone.now()
-                
-                # Guardar en diccionario
-                orders_dict[order_number] = {
-                    'order_id': order_id,
-                    'order_number': order_number.replace('#', ''),  # Quitar el #
-                    'customer_name': shipping_name,
-                    'customer_email': shipping_email,
-                    'customer_phone': shipping_phone,
-                    'delivery_address': shipping_address,
-                    'delivery_city': shipping_city,
-                    'delivery_postal_code': shipping_zip,
-                    'full_address': full_address,
-                    'created_at': created_at,
-                    'delivered_at': delivered_at,
-                }
+        # Los pedidos se leen en streaming y se escriben según se van leyendo
+        with open_csv(csv_file) as file:
+            orders = iter_orders(file, skip=resumed_from)
+            if isinstance(writer, ParallelImporter):
+                self.import_parallel(iter_order_rows(file), writer)
+                created_count, skipped_count = writer.created, writer.skipped
+            elif writer is not None:
+                self.import_batches(orders, writer, checkpoint, resumed_from)
+                created_count, skipped_count = writer.created, writer.skipped
+            else:
+                created_count, skipped_count = self.import_one_by_one(orders)
+        
+        updated_count = getattr(writer, 'updated', 0)
+        processed_count = created_count + updated_count + skipped_count
+        elapsed = time.monotonic() - started
+        rate = processed_count / elapsed if elapsed else 0
+        record_import(created_count, updated_count, skipped_count, elapsed)
+        
+        self.stdout.write(self.style.SUCCESS(f'\n🎉 Importación completada!'))
+        self.stdout.write(self.style.SUCCESS(f'   📦 Pedidos creados: {created_count}'))
+        if options['delta']:
+            self.stdout.write(self.style.SUCCESS(f'   🔄 Pedidos actualizados: {updated_count}'))
+        self.stdout.write(self.style.SUCCESS(f'   ⏭️  Pedidos omitidos: {skipped_count}'))
+        self.stdout.write(self.style.SUCCESS(f'   📊 Total procesados: {processed_count}'))
+        self.stdout.write(self.style.SUCCESS(f'   ⏱️  Tiempo: {elapsed:.1f}s ({rate:.0f} pedidos/s)'))
+
+    def import_batches(self, orders, writer, checkpoint, orders_done=0):
+        """
+        Importa los pedidos por lotes con el writer indicado.
+        
+        Tras cada lote se guarda un punto de control en la misma transacción,
+        así una importación interrumpida se puede retomar con --resume.
+        """
+        for batch in batched(orders, writer.batch_size):
+            with transaction.atomic():
+                writer.write(batch)
+                orders_done += len(batch)
+                checkpoint.save(orders_done)
+            self.stdout.write(f'   … {orders_done} pedidos procesados')
         
-        # Crear pedidos en la base de datos
+        checkpoint.clear()
+
+    def import_parallel(self, rows, importer):
+        """Importa los pedidos repartiéndolos entre varios procesos"""
+        self.stdout.write(f'   🚀 Usando {importer.workers} procesos')
+        try:
+            importer.run(
+                rows,
+                progress=lambda dispatched: self.stdout.write(f'   … {dispatched} pedidos enviados'),
+            )
+        except RuntimeError as error:
+            raise CommandError(f'La importación en paralelo ha fallado:\n{error}')
+
+    def import_one_by_one(self, orders):
+        """Importa los pedidos de uno en uno (modo clásico)"""
         created_count = 0
         skipped_count = 0
         
-        for order_number, order_data in orders_dict.items():
-            # Verificar si ya existe
-            if Order.objects.filter(order_number=order_data['order_number']).exists():
+        for order_data in orders:
+            order_number = order_data['order_number']
+            
+            # Verificar si ya existe (también entre los archivados)
+            if (
+                Order.objects.filter(order_number=order_number).exists()
+                or ArchivedOrder.objects.filter(order_number=order_number).exists()
+            ):
                 self.stdout.write(self.style.WARNING(f'⚠️  Pedido {order_number} ya existe, omitiendo...'))
                 skipped_count += 1
                 continue
             
             # Crear pedido
-            order = Order.objects.create(
-                order_number=order_data['order_number'],
-                customer_name=order_data['customer_name'],
-                customer_email=order_data['customer_email'],
-                customer_phone=order_data['customer_phone'] or '',
-                delivery_address=order_data['delivery_address'],
-                delivery_city=order_data['delivery_city'],
-                delivery_postal_code=order_data['delivery_postal_code'] or '',
-                status='DELIVERED',
-                current_location=f"Delivered to {order_data['delivery_city']}",
-                delivered_at=order_data['delivered_at'],
-                estimated_delivery=order_data['delivered_at'],
-            )
+            order = build_order(order_data)
+            order.save()
             
             # Actualizar fecha de creación manualmente
             Order.objects.filter(pk=order.pk).update(created_at=order_data['created_at'])
             
             # Crear historial completo del pedido
-            history_entries = [
-                {
-                    'status': 'PENDING',
-                    'location': 'Order placed',
-                    'description': 'Your order has been received and is being processed.',
-                    'timestamp': order_data['created_at'],
-                },
-                {
-                    'status': 'PROCESSING',
-                    'location': 'Warehouse',
-                    'description': 'Your order is being prepared for shipment.',
-                    'timestamp': order_data['created_at'],
-                },
-                {
-                    'status': 'SHIPPED',
-                    'location': 'Origin facility',
-                    'description': 'Your package has been shipped.',
-                    'timestamp': order_data['created_at'],
-                },
-                {
-                    'status': 'IN_TRANSIT',
-                    'location': 'In transit',
-                    'description': 'Your package is on its way.',
-                    'timestamp': order_data['created_at'],
-                },
-                {
-                    'status': 'OUT_FOR_DELIVERY',
-                    'location': order_data['delivery_city'],
-                    'description': 'Out for delivery in your area.',
-                    'timestamp': order_data['delivered_at'] if order_data['delivered_at'] else order_data['created_at'],
-                },
-                {
-                    'status': 'DELIVERED',
-                    'location': order_data['full_address'],
-                    'description': 'Package delivered successfully.',
-                    'timestamp': order_data['delivered_at'] if order_data['delivered_at'] else order_data['created_at'],
-                },
-            ]
-            
-            for entry in history_entries:
+            for entry in build_history_entries(order_data):
                 OrderHistory.objects.create(
                     order=order,
-                    **entry
+                    **compact_history_entry(entry)
                 )
             
             created_count += 1
             self.stdout.write(self.style.SUCCESS(f'✅ Pedido {order_number} importado correctamente'))
         
-        self.stdout.write(self.style.SUCCESS(f'\n🎉 Importación completada!'))
-        self.stdout.write(self.style.SUCCESS(f'   📦 Pedidos creados: {created_count}'))
-        self.stdout.write(self.style.SUCCESS(f'   ⏭️  Pedidos omitidos: {skipped_count}'))
-        self.stdout.write(self.style.SUCCESS(f'   📊 Total procesados: {len(orders_dict)}'))
+        return created_count, skipped_count
@@ -0,0 +1,126 @@
+import os
+import signal
+import socket
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from orders.jobs import claim_jobs, heartbeat, release_jobs, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Worker de la cola de trabajos: ejecuta los trabajos pendientes en segundo plano'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Número de hilos que ejecutan trabajos en paralelo (por defecto 1)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Trabajos que reclama cada hilo de una vez (por defecto 10)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Segundos de espera cuando la cola está vacía (por defecto 1)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Vaciar la cola y terminar en lugar de seguir esperando trabajos'
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--concurrency y --batch-size deben ser al menos 1')
+        
+        self.options = options
+        self.stopping = threading.Event()
+        self.finished = threading.Event()
+        self.lock = threading.Lock()
+        self.done = 0
+        self.failed = 0
+        
+        # SIGTERM (docker stop) y Ctrl+C: se terminan los trabajos en curso y se sale
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.stopping.set())
+        
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'♻️  {requeued} trabajos de workers caídos recuperados'))
+        
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(self.style.SUCCESS(
+            f'👷 Worker {worker} con {options["concurrency"]} hilos '
+            f'(lotes de {options["batch_size"]})'
+        ))
+        started = time.monotonic()
+        
+        threads = [
+            threading.Thread(target=self.work, args=(f'{worker}:{number}',), daemon=True)
+            for number in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        beat = threading.Thread(target=self.beat, args=(f'{worker}:',), daemon=True)
+        beat.start()
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=0.5)
+        self.finished.set()
+        beat.join()
+        
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'\n🎉 Worker detenido: {self.done} trabajos completados, '
+            f'{self.failed} fallidos en {elapsed:.1f}s'
+        ))
+
+    def work(self, worker):
+        """Bucle de un hilo: reclamar un lote, ejecutarlo y repetir"""
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                jobs = claim_jobs(worker, self.options['batch_size'])
+                if not jobs:
+                    if self.options['once']:
+                        break
+                    requeue_stale_jobs()
+                    self.stopping.wait(self.options['poll_interval'])
+                    continue
+                
+                for index, job in enumerate(jobs):
+                    if self.stopping.is_set():
+                        # Al parar, el resto del lote vuelve a la cola para otro worker
+                        release_jobs(jobs[index:])
+                        break
+                    ok = run_job(job)
+                    with self.lock:
+                        if ok:
+                            self.done += 1
+                        else:
+                            self.failed += 1
+                    if not ok:
+                        self.stderr.write(f'   ❌ {job} (intento {job.attempts}/{job.max_attempts})')
+        finally:
+            connection.close()
+    
+    def beat(self, worker):
+        """Renueva el bloqueo de los trabajos de este worker mientras los hilos sigan vivos"""
+        try:
+            while not self.finished.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                close_old_connections()
+                try:
+                    heartbeat(worker)
+                except Exception as error:
+                    # Sin base de datos los trabajos fallarán igualmente: se reintenta en el siguiente latido
+                    self.stderr.write(f'   ⚠️  Latido fallido: {error}')
+        finally:
+            connection.close()
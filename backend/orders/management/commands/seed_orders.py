@@ -0,0 +1,82 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from orders.seeding import OrderSeeder
+
+
+class Command(BaseCommand):
+    help = 'Genera pedidos sintéticos con su historial para pruebas de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Número de pedidos a generar')
+        parser.add_argument(
+            '--prefix',
+            default='SEED',
+            help='Prefijo de los números de pedido (por defecto SEED)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help='Antigüedad máxima de los pedidos en días (por defecto 90)'
+        )
+        parser.add_argument(
+            '--cancel-ratio',
+            type=float,
+            default=0.03,
+            help='Proporción de pedidos cancelados (por defecto 0.03)'
+        )
+        parser.add_argument(
+            '--delay-ratio',
+            type=float,
+            default=0.06,
+            help='Proporción de pedidos entregados tarde (por defecto 0.06)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Pedidos por transacción (por defecto 5000)'
+        )
+        parser.add_argument(
+            '--no-snapshots',
+            action='store_true',
+            help='No calcular los snapshots de seguimiento (se calculan en la primera lectura '
+                 'o con build_tracking_snapshots)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Semilla aleatoria para generar siempre los mismos datos'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('seed_orders necesita PostgreSQL (usa COPY)')
+        if options['count'] < 1:
+            raise CommandError('El número de pedidos debe ser al menos 1')
+
+        seeder = OrderSeeder(
+            prefix=options['prefix'],
+            days=options['days'],
+            cancel_ratio=options['cancel_ratio'],
+            delay_ratio=options['delay_ratio'],
+            batch_size=options['batch_size'],
+            snapshots=not options['no_snapshots'],
+            seed=options['seed'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'🌱 Generando {options["count"]} pedidos sintéticos...'))
+        started = time.monotonic()
+        seeder.seed(
+            options['count'],
+            progress=lambda created: self.stdout.write(f'   … {created} pedidos creados'),
+        )
+        elapsed = time.monotonic() - started
+        rate = seeder.created / elapsed if elapsed else 0
+
+        self.stdout.write(self.style.SUCCESS(f'\n🎉 Datos generados!'))
+        self.stdout.write(self.style.SUCCESS(f'   📦 Pedidos: {seeder.created}'))
+        self.stdout.write(self.style.SUCCESS(f'   📜 Entradas de historial: {seeder.history_created}'))
+        self.stdout.write(self.style.SUCCESS(f'   ⏱️  Tiempo: {elapsed:.1f}s ({rate:.0f} pedidos/s)'))
@@ -0,0 +1,48 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from orders.delays import DelaySweeper
+
+
+class Command(BaseCommand):
+    help = (
+        'Marca y desmarca los pedidos con retraso según su entrega estimada, su estado '
+        'y el último evento del historial (pensado para ejecutarse periódicamente)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-hours',
+            type=int,
+            default=settings.DELAY_STALE_HOURS,
+            help=(
+                'Horas sin eventos a partir de las que un pedido abierto va con retraso '
+                f'(por defecto {settings.DELAY_STALE_HOURS})'
+            )
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Revisa todos los pedidos abiertos o marcados, no solo los cambiados desde la última pasada'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('sweep_delays necesita PostgreSQL')
+        if options['stale_hours'] < 1:
+            raise CommandError('--stale-hours debe ser al menos 1')
+
+        sweeper = DelaySweeper(stale_hours=options['stale_hours'], full=options['full'])
+        started = time.monotonic()
+        sweeper.run()
+        elapsed = time.monotonic() - started
+
+        scope = (
+            f'cambios desde {sweeper.since:%Y-%m-%d %H:%M:%S}' if sweeper.since
+            else 'todos los pedidos abiertos o marcados'
+        )
+        self.stdout.write(self.style.SUCCESS(f'🚚 Revisión de retrasos completada ({scope})'))
+        self.stdout.write(self.style.SUCCESS(f'   ⚠️  Marcados con retraso: {sweeper.flagged}'))
+        self.stdout.write(self.style.SUCCESS(f'   ✅ Desmarcados: {sweeper.unflagged}'))
+        self.stdout.write(self.style.SUCCESS(f'   ⏱️  Tiempo: {elapsed:.1f}s'))
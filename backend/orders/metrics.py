@@ -0,0 +1,126 @@
+"""
+Métricas de la aplicación en formato Prometheus (``GET /metrics``).
+
+- Latencia de cada petición por ruta (``view_name``), método y código.
+- Consultas SQL por petición y tiempo total en la base de datos por ruta.
+- Aciertos y fallos de la caché de seguimiento.
+- Pedidos importados con ``import_orders`` y duración de las importaciones.
+
+Con varios workers de gunicorn cada proceso guarda sus valores en
+``PROMETHEUS_MULTIPROC_DIR`` y ``/metrics`` los suma todos (el directorio se
+vacía al arrancar el contenedor, ver ``entrypoint.prod.sh``). Sin esa
+variable solo se ven las métricas del proceso que atiende la petición.
+
+Las consultas se cuentan con un ``execute_wrapper`` que se instala en cada
+conexión nueva (``signals.py``) y acumula en el contexto de la petición en
+curso; las métricas se escriben una sola vez al terminar la petición.
+"""
+import os
+import time
+from contextvars import ContextVar
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+REQUEST_LATENCY = Histogram(
+    'django_request_duration_seconds',
+    'Duración de las peticiones hasta la respuesta',
+    ['route', 'method', 'status'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_QUERIES = Histogram(
+    'django_request_db_queries',
+    'Consultas SQL por petición',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_QUERY_TIME = Counter(
+    'django_request_db_query_seconds',
+    'Tiempo total en consultas SQL',
+    ['route'],
+)
+TRACKING_CACHE = Counter(
+    'tracking_cache_requests',
+    'Lecturas de la caché de seguimiento',
+    ['result'],
+)
+TRACKING_CACHE_HITS = TRACKING_CACHE.labels('hit')
+TRACKING_CACHE_MISSES = TRACKING_CACHE.labels('miss')
+IMPORTED_ORDERS = Counter(
+    'import_orders_orders',
+    'Pedidos procesados por import_orders',
+    ['result'],
+)
+IMPORT_DURATION = Histogram(
+    'import_orders_duration_seconds',
+    'Duración de las ejecuciones de import_orders',
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+
+
+class QueryStats:
+    __slots__ = ('queries', 'seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Estadísticas de la petición en curso (también en los hilos de sync_to_async)
+current_query_stats = ContextVar('current_query_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """``execute_wrapper`` que suma las consultas a la petición en curso"""
+    stats = current_query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.seconds += time.perf_counter() - started
+
+
+def record_request(request, response, started, stats):
+    """Registra la latencia y las consultas de una petición terminada"""
+    match = request.resolver_match
+    route = match.view_name if match is not None else 'unmatched'
+    REQUEST_LATENCY.labels(route, request.method, response.status_code).observe(
+        time.perf_counter() - started
+    )
+    REQUEST_QUERIES.labels(route).observe(stats.queries)
+    if stats.seconds:
+        REQUEST_QUERY_TIME.labels(route).inc(stats.seconds)
+
+
+def record_cache_lookups(hits, misses):
+    if hits:
+        TRACKING_CACHE_HITS.inc(hits)
+    if misses:
+        TRACKING_CACHE_MISSES.inc(misses)
+
+
+def record_import(created, updated, skipped, elapsed):
+    IMPORTED_ORDERS.labels('created').inc(created)
+    IMPORTED_ORDERS.labels('updated').inc(updated)
+    IMPORTED_ORDERS.labels('skipped').inc(skipped)
+    IMPORT_DURATION.observe(elapsed)
+
+
+def export_metrics():
+    """Métricas en formato texto de Prometheus (de todos los workers si los hay)"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_is_delayed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True, verbose_name='Clave')),
+                ('data', models.JSONField(default=dict, verbose_name='Datos')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+            ],
+            options={
+                'verbose_name': 'Punto de Control',
+                'verbose_name_plural': 'Puntos de Control',
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Hash del contenido del CSV con el que se importó el pedido', max_length=64, verbose_name='Hash de Importación'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_import_delta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='tracking_snapshot',
+            field=models.JSONField(blank=True, editable=False, help_text='Respuesta pública de seguimiento precalculada (estado, progreso e historial)', null=True, verbose_name='Snapshot de Seguimiento'),
+        ),
+    ]
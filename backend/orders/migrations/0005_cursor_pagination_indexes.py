@@ -0,0 +1,22 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('orders', '0004_order_tracking_snapshot'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['created_at', 'id'], name='orders_order_created_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='orderhistory',
+            index=models.Index(fields=['order', 'timestamp', 'id'], name='orders_history_order_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('orders', '0005_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='orders_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['delivery_city', 'created_at'], name='orders_city_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', ['DELIVERED', 'CANCELLED']), _negated=True), fields=['created_at'], name='orders_open_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_delayed', True)), fields=['created_at'], name='orders_delayed_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='orderhistory',
+            index=models.Index(fields=['timestamp', 'id'], name='orders_history_ts_idx'),
+        ),
+        # El índice simple de la FK queda cubierto por (order, timestamp, id)
+        migrations.AlterField(
+            model_name='orderhistory',
+            name='order',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='history', to='orders.order', verbose_name='Pedido'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, transaction
+import django.db.models.functions.text
+
+
+# Mantiene Order.search_vector en cualquier escritura (save, bulk_create,
+# bulk_update, COPY del importador...). Debe coincidir con search.SEARCH_CONFIG.
+SEARCH_VECTOR_TRIGGER = """
+CREATE FUNCTION orders_order_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.order_number, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.customer_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.customer_email, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.customer_phone, '')), 'B') ||
+        setweight(to_tsvector('simple', concat_ws(' ',
+            NEW.delivery_address, NEW.delivery_city, NEW.delivery_postal_code)), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_order_search_vector
+BEFORE INSERT OR UPDATE OF order_number, customer_name, customer_email, customer_phone,
+    delivery_address, delivery_city, delivery_postal_code
+ON orders_order
+FOR EACH ROW EXECUTE FUNCTION orders_order_search_vector_update();
+"""
+
+DROP_SEARCH_VECTOR_TRIGGER = """
+DROP TRIGGER IF EXISTS orders_order_search_vector ON orders_order;
+DROP FUNCTION IF EXISTS orders_order_search_vector_update();
+"""
+
+# Rellena los pedidos existentes (el trigger se dispara al tocar order_number)
+BACKFILL_SEARCH_VECTOR = '''
+UPDATE orders_order SET order_number = order_number
+WHERE id >= %s AND id < %s AND search_vector IS NULL
+'''
+
+# Pedidos por transacción al rellenar: cada lote bloquea solo sus filas
+BATCH_SIZE = 20000
+
+
+def backfill_search_vector(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT min(id), max(id) FROM orders_order')
+        first, last = cursor.fetchone()
+    if first is None:
+        return
+    for start in range(first, last + 1, BATCH_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(BACKFILL_SEARCH_VECTOR, [start, start + BATCH_SIZE])
+
+
+def trigram_index(model_name, field, name):
+    return AddIndexConcurrently(
+        model_name=model_name,
+        index=django.contrib.postgres.indexes.GinIndex(
+            django.contrib.postgres.indexes.OpClass(
+                django.db.models.functions.text.Upper(field), name='gin_trgm_ops'
+            ),
+            name=name,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('orders', '0006_admin_filter_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='order',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Vector de Búsqueda'),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_TRIGGER, DROP_SEARCH_VECTOR_TRIGGER),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='order',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='orders_search_vector_idx'),
+        ),
+        trigram_index('order', 'order_number', 'orders_order_number_trgm_idx'),
+        trigram_index('order', 'customer_name', 'orders_customer_name_trgm_idx'),
+        trigram_index('order', 'customer_email', 'orders_customer_email_trgm_idx'),
+        trigram_index('order', 'customer_phone', 'orders_customer_phone_trgm_idx'),
+        trigram_index('order', 'delivery_address', 'orders_address_trgm_idx'),
+        trigram_index('orderhistory', 'location', 'orders_history_loc_trgm_idx'),
+        trigram_index('orderhistory', 'description', 'orders_history_desc_trgm_idx'),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('order_number', models.CharField(max_length=50, unique=True, verbose_name='Número de Pedido')),
+                ('customer_name', models.CharField(max_length=200, verbose_name='Nombre del Cliente')),
+                ('customer_email', models.EmailField(blank=True, max_length=254, null=True, verbose_name='Email del Cliente')),
+                ('customer_phone', models.CharField(blank=True, max_length=20, null=True, verbose_name='Teléfono del Cliente')),
+                ('delivery_address', models.TextField(verbose_name='Dirección de Entrega')),
+                ('delivery_city', models.CharField(max_length=100, verbose_name='Ciudad')),
+                ('delivery_postal_code', models.CharField(max_length=10, verbose_name='Código Postal')),
+                ('status', models.CharField(choices=[('PENDING', 'Order Received'), ('PROCESSING', 'Processing'), ('SHIPPED', 'Shipped'), ('IN_TRANSIT', 'In Transit'), ('OUT_FOR_DELIVERY', 'Out for Delivery'), ('DELIVERED', 'Delivered'), ('CANCELLED', 'Cancelled')], max_length=20, verbose_name='Estado')),
+                ('current_location', models.CharField(blank=True, max_length=200, null=True, verbose_name='Ubicación Actual')),
+                ('created_at', models.DateTimeField(verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(verbose_name='Última Actualización')),
+                ('estimated_delivery', models.DateTimeField(blank=True, null=True, verbose_name='Fecha Estimada de Entrega')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Entrega')),
+                ('notes', models.TextField(blank=True, null=True, verbose_name='Notas')),
+                ('is_delayed', models.BooleanField(default=False, verbose_name='Pedido con Retraso')),
+                ('tracking_snapshot', models.JSONField(verbose_name='Snapshot de Seguimiento')),
+                ('content_hash', models.CharField(blank=True, default='', max_length=64, verbose_name='Hash de Importación')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de Archivado')),
+            ],
+            options={
+                'verbose_name': 'Pedido Archivado',
+                'verbose_name_plural': 'Pedidos Archivados',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('PENDING', 'Order Received'), ('PROCESSING', 'Processing'), ('SHIPPED', 'Shipped'), ('IN_TRANSIT', 'In Transit'), ('OUT_FOR_DELIVERY', 'Out for Delivery'), ('DELIVERED', 'Delivered'), ('CANCELLED', 'Cancelled')], max_length=20, verbose_name='Estado')),
+                ('location', models.CharField(blank=True, max_length=200, null=True, verbose_name='Ubicación')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='Descripción')),
+                ('timestamp', models.DateTimeField(verbose_name='Fecha y Hora')),
+                ('order', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='history', to='orders.archivedorder', verbose_name='Pedido')),
+            ],
+            options={
+                'verbose_name': 'Historial de Pedido Archivado',
+                'verbose_name_plural': 'Historial de Pedidos Archivados',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['order', 'timestamp', 'id'], name='orders_archive_hist_order_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:50
+
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+
+# Copia de history.HISTORY_TEMPLATES en el momento de la migración
+STATUS_LABELS = [
+    ('PENDING', 'Order Received'),
+    ('PROCESSING', 'Processing'),
+    ('SHIPPED', 'Shipped'),
+    ('IN_TRANSIT', 'In Transit'),
+    ('OUT_FOR_DELIVERY', 'Out for Delivery'),
+    ('DELIVERED', 'Delivered'),
+    ('CANCELLED', 'Cancelled'),
+]
+HISTORY_TEMPLATES = [
+    ('PENDING', 'Order placed', 'Your order has been received and is being processed.'),
+    ('PROCESSING', 'Warehouse', 'Your order is being prepared for shipment.'),
+    ('SHIPPED', 'Origin facility', 'Your package has been shipped.'),
+    ('IN_TRANSIT', 'In transit', 'Your package is on its way.'),
+    ('OUT_FOR_DELIVERY', None, 'Out for delivery in your area.'),
+    ('DELIVERED', None, 'Package delivered successfully.'),
+    *[(status, None, f'Estado actualizado a {label}') for status, label in STATUS_LABELS],
+]
+
+# Filas por transacción al compactar: cada lote bloquea solo sus filas
+BATCH_SIZE = 20000
+
+# Sustituye los textos por la plantilla (la ubicación solo si es la fija)
+COMPACT_SQL = """
+UPDATE {table} AS h
+SET template_id = t.id,
+    location = CASE WHEN t.location IS NULL THEN h.location END,
+    description = NULL
+FROM orders_historytemplate AS t
+WHERE h.id >= %s AND h.id < %s
+  AND h.template_id IS NULL
+  AND h.status = t.status
+  AND h.description = t.description
+  AND (t.location IS NULL OR h.location = t.location)
+"""
+
+EXPAND_SQL = """
+UPDATE {table} AS h
+SET location = COALESCE(t.location, h.location),
+    description = t.description,
+    template_id = NULL
+FROM orders_historytemplate AS t
+WHERE h.id >= %s AND h.id < %s
+  AND h.template_id = t.id
+"""
+
+
+def create_templates(apps, schema_editor):
+    HistoryTemplate = apps.get_model('orders', 'HistoryTemplate')
+    HistoryTemplate.objects.bulk_create(
+        [
+            HistoryTemplate(status=status, location=location, description=description)
+            for status, location, description in HISTORY_TEMPLATES
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def update_in_batches(schema_editor, sql):
+    connection = schema_editor.connection
+    for table in ('orders_orderhistory', 'orders_archivedorderhistory'):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT min(id), max(id) FROM {table}')
+            first, last = cursor.fetchone()
+        if first is None:
+            continue
+        for start in range(first, last + 1, BATCH_SIZE):
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(sql.format(table=table), [start, start + BATCH_SIZE])
+
+
+def compact_history(apps, schema_editor):
+    update_in_batches(schema_editor, COMPACT_SQL)
+
+
+def expand_history(apps, schema_editor):
+    update_in_batches(schema_editor, EXPAND_SQL)
+
+
+class Migration(migrations.Migration):
+    # Compacta el historial en lotes, cada uno en su propia transacción
+    atomic = False
+
+    dependencies = [
+        ('orders', '0009_order_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryTemplate',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('PENDING', 'Order Received'), ('PROCESSING', 'Processing'), ('SHIPPED', 'Shipped'), ('IN_TRANSIT', 'In Transit'), ('OUT_FOR_DELIVERY', 'Out for Delivery'), ('DELIVERED', 'Delivered'), ('CANCELLED', 'Cancelled')], max_length=20, verbose_name='Estado')),
+                ('location', models.CharField(blank=True, max_length=200, null=True, verbose_name='Ubicación Fija')),
+                ('description', models.TextField(verbose_name='Descripción')),
+            ],
+            options={
+                'verbose_name': 'Plantilla de Historial',
+                'verbose_name_plural': 'Plantillas de Historial',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='historytemplate',
+            constraint=models.UniqueConstraint(fields=('status', 'description'), name='orders_history_template_uniq'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderhistory',
+            name='template',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='orders.historytemplate', verbose_name='Plantilla'),
+        ),
+        migrations.AddField(
+            model_name='orderhistory',
+            name='template',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='orders.historytemplate', verbose_name='Plantilla'),
+        ),
+        migrations.RunPython(create_templates, migrations.RunPython.noop),
+        migrations.RunPython(compact_history, expand_history),
+    ]
@@ -1,7 +1,25 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 
 
+class OrderQuerySet(models.QuerySet):
+    """Consultas habituales sobre pedidos"""
+    
+    def with_history(self):
+        """Carga el historial (del más reciente al más antiguo) con una única consulta extra"""
+        return self.prefetch_related(
+            models.Prefetch(
+                'history',
+                queryset=OrderHistory.objects.only(
+                    'id', 'order_id', 'status', 'template_id', 'location', 'description', 'timestamp'
+                ).order_by('-timestamp', '-id')
+            )
+        )
+
+
 class Order(models.Model):
     """Modelo para gestionar pedidos y su seguimiento"""
     
@@ -15,6 +33,19 @@ class Order(models.Model):
         ('CANCELLED', 'Cancelled'),
     ]
     
+    PROGRESS_PERCENTAGES = {
+        'PENDING': 0,
+        'PROCESSING': 20,
+        'SHIPPED': 40,
+        'IN_TRANSIT': 60,
+        'OUT_FOR_DELIVERY': 80,
+        'DELIVERED': 100,
+        'CANCELLED': 0,
+    }
+    
+    # Estados finales: el pedido ya no cambia
+    CLOSED_STATUSES = ['DELIVERED', 'CANCELLED']
+    
     # Información del pedido
     order_number = models.CharField(
         max_length=50,
@@ -101,26 +132,112 @@ class Order(models.Model):
         help_text='Marcar si el pedido va con retraso en la entrega'
     )
     
+    # Seguimiento precalculado
+    tracking_snapshot = models.JSONField(
+        verbose_name='Snapshot de Seguimiento',
+        blank=True,
+        null=True,
+        editable=False,
+        help_text='Respuesta pública de seguimiento precalculada (estado, progreso e historial)'
+    )
+    
+    # Importación
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Hash de Importación',
+        help_text='Hash del contenido del CSV con el que se importó el pedido'
+    )
+    
+    # Búsqueda del admin (la mantiene un trigger de PostgreSQL, ver search.py)
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Vector de Búsqueda'
+    )
+    
+    objects = OrderQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Pedido'
         verbose_name_plural = 'Pedidos'
         ordering = ['-created_at']
+        indexes = [
+            # Paginación por cursor del listado (ORDER BY -created_at, -id)
+            models.Index(fields=['created_at', 'id'], name='orders_order_created_id_idx'),
+            # Filtros del admin, cada uno con el orden por defecto del listado
+            models.Index(fields=['status', 'created_at'], name='orders_status_created_idx'),
+            models.Index(fields=['delivery_city', 'created_at'], name='orders_city_created_idx'),
+            # Parciales: solo las filas que interesan (pocas frente al total)
+            models.Index(
+                fields=['created_at'],
+                condition=~models.Q(status__in=['DELIVERED', 'CANCELLED']),  # CLOSED_STATUSES
+                name='orders_open_created_idx',
+            ),
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(is_delayed=True),
+                name='orders_delayed_created_idx',
+            ),
+            # Pasada incremental de retrasos (orders/delays.py)
+            models.Index(fields=['updated_at'], name='orders_updated_at_idx'),
+            models.Index(
+                fields=['estimated_delivery'],
+                condition=~models.Q(status__in=['DELIVERED', 'CANCELLED']),  # CLOSED_STATUSES
+                name='orders_open_estimated_idx',
+            ),
+            # Búsqueda del admin: texto completo y trigramas para icontains
+            GinIndex(fields=['search_vector'], name='orders_search_vector_idx'),
+            *[
+                GinIndex(OpClass(Upper(field), name='gin_trgm_ops'), name=f'orders_{field}_trgm_idx')
+                for field in ['order_number', 'customer_name', 'customer_email', 'customer_phone']
+            ],
+            GinIndex(OpClass(Upper('delivery_address'), name='gin_trgm_ops'), name='orders_address_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"Pedido {self.order_number} - {self.get_status_display()}"
     
     def get_progress_percentage(self):
         """Calcula el porcentaje de progreso basado en el estado"""
-        progress_map = {
-            'PENDING': 0,
-            'PROCESSING': 20,
-            'SHIPPED': 40,
-            'IN_TRANSIT': 60,
-            'OUT_FOR_DELIVERY': 80,
-            'DELIVERED': 100,
-            'CANCELLED': 0,
-        }
-        return progress_map.get(self.status, 0)
+        return self.PROGRESS_PERCENTAGES.get(self.status, 0)
+
+
+class HistoryTemplate(models.Model):
+    """
+    Texto compartido por muchos eventos del historial (ver history.py).
+
+    Si ``location`` es nulo, cada evento guarda su propia ubicación.
+    """
+    
+    # Clave de 2 bytes: se repite en cada fila del historial
+    id = models.SmallAutoField(primary_key=True)
+    status = models.CharField(
+        max_length=20,
+        choices=Order.STATUS_CHOICES,
+        verbose_name='Estado'
+    )
+    location = models.CharField(
+        max_length=200,
+        verbose_name='Ubicación Fija',
+        blank=True,
+        null=True
+    )
+    description = models.TextField(
+        verbose_name='Descripción'
+    )
+    
+    class Meta:
+        verbose_name = 'Plantilla de Historial'
+        verbose_name_plural = 'Plantillas de Historial'
+        constraints = [
+            models.UniqueConstraint(fields=['status', 'description'], name='orders_history_template_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.description} ({self.location or 'ubicación del evento'})"
 
 
 class OrderHistory(models.Model):
@@ -130,13 +247,26 @@ class OrderHistory(models.Model):
         Order,
         on_delete=models.CASCADE,
         related_name='history',
-        verbose_name='Pedido'
+        verbose_name='Pedido',
+        # Cubierto por el índice (order, timestamp, id)
+        db_index=False
     )
     status = models.CharField(
         max_length=20,
         choices=Order.STATUS_CHOICES,
         verbose_name='Estado'
     )
+    # Con plantilla, description (y location si la plantilla la fija) van a NULL
+    template = models.ForeignKey(
+        HistoryTemplate,
+        on_delete=models.PROTECT,
+        related_name='+',
+        verbose_name='Plantilla',
+        blank=True,
+        null=True,
+        # Pocas plantillas y nunca se borran: un índice no aporta nada
+        db_index=False
+    )
     location = models.CharField(
         max_length=200,
         verbose_name='Ubicación',
@@ -157,6 +287,278 @@ class OrderHistory(models.Model):
         verbose_name = 'Historial de Pedido'
         verbose_name_plural = 'Historial de Pedidos'
         ordering = ['-timestamp']
+        indexes = [
+            # Historial de un pedido en orden (prefetch y paginación por cursor)
+            models.Index(fields=['order', 'timestamp', 'id'], name='orders_history_order_ts_idx'),
+            # Listado del admin (ORDER BY -timestamp) y su date_hierarchy
+            models.Index(fields=['timestamp', 'id'], name='orders_history_ts_idx'),
+            # Búsqueda del admin (icontains)
+            GinIndex(OpClass(Upper('location'), name='gin_trgm_ops'), name='orders_history_loc_trgm_idx'),
+            GinIndex(OpClass(Upper('description'), name='gin_trgm_ops'), name='orders_history_desc_trgm_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.order.order_number} - {self.get_status_display()} - {self.timestamp}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Pedido cerrado hace tiempo, movido fuera de ``Order`` (ver archive.py).
+
+    Conserva el id, los datos y el snapshot de seguimiento del pedido
+    original: el seguimiento público de un pedido archivado se responde con
+    ese snapshot.
+    """
+    
+    id = models.BigIntegerField(primary_key=True)
+    order_number = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name='Número de Pedido'
+    )
+    customer_name = models.CharField(
+        max_length=200,
+        verbose_name='Nombre del Cliente'
+    )
+    customer_email = models.EmailField(
+        verbose_name='Email del Cliente',
+        blank=True,
+        null=True
+    )
+    customer_phone = models.CharField(
+        max_length=20,
+        verbose_name='Teléfono del Cliente',
+        blank=True,
+        null=True
+    )
+    delivery_address = models.TextField(
+        verbose_name='Dirección de Entrega'
+    )
+    delivery_city = models.CharField(
+        max_length=100,
+        verbose_name='Ciudad'
+    )
+    delivery_postal_code = models.CharField(
+        max_length=10,
+        verbose_name='Código Postal'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Order.STATUS_CHOICES,
+        verbose_name='Estado'
+    )
+    current_location = models.CharField(
+        max_length=200,
+        verbose_name='Ubicación Actual',
+        blank=True,
+        null=True
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Fecha de Creación'
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Última Actualización'
+    )
+    estimated_delivery = models.DateTimeField(
+        verbose_name='Fecha Estimada de Entrega',
+        blank=True,
+        null=True
+    )
+    delivered_at = models.DateTimeField(
+        verbose_name='Fecha de Entrega',
+        blank=True,
+        null=True
+    )
+    notes = models.TextField(
+        verbose_name='Notas',
+        blank=True,
+        null=True
+    )
+    is_delayed = models.BooleanField(
+        default=False,
+        verbose_name='Pedido con Retraso'
+    )
+    tracking_snapshot = models.JSONField(
+        verbose_name='Snapshot de Seguimiento'
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name='Hash de Importación'
+    )
+    archived_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Fecha de Archivado'
+    )
+    
+    class Meta:
+        verbose_name = 'Pedido Archivado'
+        verbose_name_plural = 'Pedidos Archivados'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Pedido {self.order_number} - {self.get_status_display()} (archivado)"
+
+
+class ArchivedOrderHistory(models.Model):
+    """Historial de un pedido archivado (mismos ids que en ``OrderHistory``)"""
+    
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(
+        ArchivedOrder,
+        on_delete=models.CASCADE,
+        related_name='history',
+        verbose_name='Pedido',
+        # Cubierto por el índice (order, timestamp, id)
+        db_index=False
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Order.STATUS_CHOICES,
+        verbose_name='Estado'
+    )
+    # Con plantilla, description (y location si la plantilla la fija) van a NULL
+    template = models.ForeignKey(
+        HistoryTemplate,
+        on_delete=models.PROTECT,
+        related_name='+',
+        verbose_name='Plantilla',
+        blank=True,
+        null=True,
+        # Pocas plantillas y nunca se borran: un índice no aporta nada
+        db_index=False
+    )
+    location = models.CharField(
+        max_length=200,
+        verbose_name='Ubicación',
+        blank=True,
+        null=True
+    )
+    description = models.TextField(
+        verbose_name='Descripción',
+        blank=True,
+        null=True
+    )
+    timestamp = models.DateTimeField(
+        verbose_name='Fecha y Hora'
+    )
+    
+    class Meta:
+        verbose_name = 'Historial de Pedido Archivado'
+        verbose_name_plural = 'Historial de Pedidos Archivados'
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['order', 'timestamp', 'id'], name='orders_archive_hist_order_idx'),
+        ]
     
     def __str__(self):
         return f"{self.order.order_number} - {self.get_status_display()} - {self.timestamp}"
+
+
+class Checkpoint(models.Model):
+    """Punto de control para retomar procesos largos (p. ej. importaciones)"""
+    
+    key = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Clave'
+    )
+    data = models.JSONField(
+        default=dict,
+        verbose_name='Datos'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Última Actualización'
+    )
+    
+    class Meta:
+        verbose_name = 'Punto de Control'
+        verbose_name_plural = 'Puntos de Control'
+    
+    def __str__(self):
+        return self.key
+
+
+class Job(models.Model):
+    """Trabajo en segundo plano (ver jobs.py y el comando run_jobs)"""
+    
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (PENDING, 'Pendiente'),
+        (RUNNING, 'En ejecución'),
+        (FAILED, 'Fallido'),
+    ]
+    
+    name = models.CharField(
+        max_length=100,
+        verbose_name='Trabajo'
+    )
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Parámetros'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name='Estado'
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Intentos'
+    )
+    max_attempts = models.PositiveIntegerField(
+        default=5,
+        verbose_name='Intentos Máximos'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Ejecutar a partir de'
+    )
+    locked_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Bloqueado en'
+    )
+    locked_by = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        verbose_name='Bloqueado por'
+    )
+    last_error = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Último Error'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de Creación'
+    )
+    
+    class Meta:
+        verbose_name = 'Trabajo'
+        verbose_name_plural = 'Trabajos'
+        ordering = ['run_at', 'id']
+        indexes = [
+            # Cola de trabajos pendientes (los terminados se borran)
+            models.Index(
+                fields=['run_at', 'id'],
+                condition=models.Q(status='PENDING'),
+                name='orders_job_pending_idx',
+            ),
+            # Trabajos bloqueados por workers que ya no responden
+            models.Index(
+                fields=['locked_at'],
+                condition=models.Q(status='RUNNING'),
+                name='orders_job_running_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} #{self.pk} - {self.get_status_display()}"
@@ -0,0 +1,190 @@
+"""
+Paginación por cursor (keyset) de los listados.
+
+A diferencia de ``PageNumberPagination`` no hace ``COUNT(*)`` ni ``OFFSET``:
+cada página es un ``WHERE (created_at, id) < cursor ORDER BY ... LIMIT``
+resuelto con los índices ``(created_at, id)`` y ``(order, timestamp, id)``,
+así que cuesta lo mismo la primera página que la número diez mil.
+
+``EstimatedCountPaginator`` es para los listados del admin: usa la estimación
+del planificador de PostgreSQL en lugar de un ``COUNT(*)`` exacto.
+"""
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+POSITION_SEPARATOR = '|'
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    ``CursorPagination`` sobre una clave única de varios campos.
+
+    La de DRF solo filtra por el primer campo del orden y resuelve los
+    empates con ``OFFSET``; como las importaciones crean miles de pedidos con
+    la misma fecha, aquí la posición del cursor lleva todos los campos del
+    orden (el último debe ser único) y el ``OFFSET`` es siempre 0. Todos los
+    campos del orden deben ir en el mismo sentido.
+    """
+
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    page_size_query_param = 'page_size'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, current_position = False, None
+        else:
+            _, reverse, current_position = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            descending = self.ordering[0].startswith('-')
+            queryset = queryset.filter(
+                self._position_filter(queryset.model, current_position, before=reverse != descending)
+            )
+
+        # Un elemento de más para saber si hay página siguiente
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            following_position = None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self.next_position
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self.previous_position
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _reversed_ordering(self):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering)
+
+    def _get_position_from_instance(self, instance, ordering):
+        return POSITION_SEPARATOR.join(
+            str(getattr(instance, field.lstrip('-'))) for field in ordering
+        )
+
+    def _position_filter(self, model, position, before):
+        """
+        Filas antes (``before``) o después de ``position`` en orden lexicográfico.
+
+        Se añade la cota sobre el primer campo (``<=``/``>=``) para que
+        PostgreSQL la use como condición del índice y solo filtre los empates.
+        """
+        names = [field.lstrip('-') for field in self.ordering]
+        raw_values = position.split(POSITION_SEPARATOR)
+        if len(raw_values) != len(names):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            values = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(names, raw_values)
+            ]
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+        strict = 'lt' if before else 'gt'
+        condition = Q()
+        for index in reversed(range(len(names))):
+            step = Q(**{f'{names[index]}__{strict}': values[index]})
+            if condition:
+                step |= Q(**{names[index]: values[index]}) & condition
+            condition = step
+        bound = Q(**{f'{names[0]}__{strict}e': values[0]})
+        return bound & condition
+
+
+class OrderCursorPagination(KeysetCursorPagination):
+    """Listado de pedidos, de los más recientes a los más antiguos"""
+
+    ordering = ('-created_at', '-id')
+
+
+class OrderHistoryCursorPagination(KeysetCursorPagination):
+    """Historial de un pedido, de la entrada más reciente a la más antigua"""
+
+    ordering = ('-timestamp', '-id')
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    ``Paginator`` que no cuenta las filas cuando son muchas.
+
+    Sin filtros usa ``reltuples`` de ``pg_class`` (lo actualizan VACUUM y
+    ANALYZE); con filtros, las filas estimadas por ``EXPLAIN``. Si la
+    estimación queda por debajo de ``ADMIN_EXACT_COUNT_LIMIT`` se hace el
+    ``COUNT(*)`` exacto, que con pocas filas es barato.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return super().count
+
+        if not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            estimate = row[0] if row else -1
+        else:
+            plan = json.loads(queryset.order_by().explain(format='json'))
+            estimate = plan[0]['Plan']['Plan Rows']
+
+        # reltuples es -1 en tablas que nunca se han analizado
+        if estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
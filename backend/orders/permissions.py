@@ -0,0 +1,21 @@
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class HasCarrierToken(BasePermission):
+    """
+    Acceso con el token compartido de los transportistas.
+
+    Se envía como ``Authorization: Bearer <CARRIER_EVENTS_TOKEN>``. Si el
+    token no está configurado se rechazan todas las peticiones.
+    """
+    message = 'Invalid or missing carrier token.'
+    
+    def has_permission(self, request, view):
+        token = settings.CARRIER_EVENTS_TOKEN
+        scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        return bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(
+            credentials.strip().encode(), token.encode()
+        )
@@ -0,0 +1,71 @@
+"""
+Búsqueda del admin con PostgreSQL.
+
+``Order.search_vector`` lo mantiene un trigger (migración 0007) con el número
+de pedido, el cliente y la dirección; los ``icontains`` de ``search_fields``
+se resuelven con índices GIN de trigramas sobre ``UPPER(campo)``, que es la
+expresión que genera Django. Así ninguna búsqueda recorre la tabla entera.
+
+Los resultados se ordenan por relevancia: ``SearchRank`` si el modelo tiene
+vector de búsqueda y la similitud de trigramas si no.
+"""
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+
+# Sin stemming: nombres, emails, teléfonos y direcciones no son lenguaje natural
+SEARCH_CONFIG = 'simple'
+
+
+class PostgresSearchMixin:
+    """
+    Búsqueda indexada y ordenada por relevancia para un ``ModelAdmin``.
+
+    Cada palabra buscada debe aparecer (``icontains``) en alguno de los
+    ``search_fields``; si el modelo define ``search_vector_field`` también se
+    aceptan las coincidencias de texto completo.
+    """
+    search_vector_field = None
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term or connection.vendor != 'postgresql':
+            return super().get_search_results(request, queryset, search_term)
+
+        matches = Q()
+        for term in search_term.split():
+            matches &= self.get_term_matches(request, term)
+
+        if self.search_vector_field:
+            query = SearchQuery(search_term, search_type='websearch', config=SEARCH_CONFIG)
+            matches |= Q(**{self.search_vector_field: query})
+            rank = SearchRank(F(self.search_vector_field), query)
+        else:
+            similarities = [TrigramSimilarity(field, search_term) for field in self.get_search_fields(request)]
+            rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+
+        # Un FK en search_fields (order__order_number) no duplica filas: no hace falta distinct()
+        return queryset.filter(matches).annotate(search_rank=rank), False
+
+    def get_term_matches(self, request, term):
+        """Condición para una palabra buscada: ``icontains`` en algún campo"""
+        term_matches = Q()
+        for field in self.get_search_fields(request):
+            term_matches |= Q(**{f'{field}__icontains': term})
+        return term_matches
+
+    def get_changelist(self, request, **kwargs):
+        return SearchChangeList
+
+
+class SearchChangeList(ChangeList):
+    """Al buscar, primero los resultados más relevantes (salvo que se ordene por columna)"""
+
+    def get_ordering(self, request, queryset):
+        ordering = super().get_ordering(request, queryset)
+        if 'search_rank' in queryset.query.annotations and ORDER_VAR not in self.params:
+            return ['-search_rank', *ordering]
+        return ordering
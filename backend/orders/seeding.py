@@ -0,0 +1,207 @@
+"""
+Pedidos sintéticos para reproducir en local el volumen de producción.
+
+Cada pedido recorre el flujo normal (recibido, en preparación, enviado,
+varias escalas en tránsito, en reparto y entregado) con tiempos aleatorios
+desde su fecha de creación; su estado es el del último evento ya ocurrido,
+así que los pedidos antiguos están casi todos entregados y los recientes
+se reparten por el resto de estados. Una parte se cancela al principio y
+otra se entrega más tarde de lo previsto (``is_delayed``).
+
+Los datos se escriben con ``COPY`` directamente en las tablas: los ids se
+reservan de la secuencia de ``Order`` para poder copiar el historial en la
+misma pasada, sin tablas de staging. Con ``Random(seed)`` la generación es
+reproducible.
+"""
+import random
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .history import compact_history_entry
+from .importer import copy_rows
+from .models import Order, OrderHistory
+from .tracking import refresh_tracking
+
+
+FIRST_NAMES = [
+    'María', 'Lucía', 'Paula', 'Laura', 'Marta', 'Ana', 'Carmen', 'Elena', 'Sara', 'Julia',
+    'Antonio', 'Manuel', 'José', 'Javier', 'David', 'Daniel', 'Carlos', 'Pablo', 'Jorge', 'Luis',
+]
+LAST_NAMES = [
+    'García', 'Rodríguez', 'González', 'Fernández', 'López', 'Martínez', 'Sánchez', 'Pérez',
+    'Gómez', 'Martín', 'Jiménez', 'Ruiz', 'Hernández', 'Díaz', 'Moreno', 'Álvarez', 'Romero',
+]
+STREETS = ['Calle Mayor', 'Avenida de la Constitución', 'Calle Real', 'Gran Vía', 'Paseo del Prado',
+           'Calle del Sol', 'Avenida de Andalucía', 'Calle Nueva', 'Plaza de España', 'Calle Alcalá']
+# Ciudad, prefijo de código postal y peso (más pedidos en las grandes)
+CITIES = [
+    ('Madrid', '28', 30), ('Barcelona', '08', 22), ('Valencia', '46', 10), ('Sevilla', '41', 8),
+    ('Zaragoza', '50', 5), ('Málaga', '29', 5), ('Murcia', '30', 4), ('Palma', '07', 3),
+    ('Bilbao', '48', 4), ('Alicante', '03', 3), ('Córdoba', '14', 2), ('Valladolid', '47', 2),
+    ('Vigo', '36', 2),
+]
+HUBS = ['Centro de Distribución Madrid', 'Centro de Distribución Barcelona',
+        'Hub Zaragoza', 'Hub Valencia', 'Hub Sevilla', 'Hub Norte']
+
+STATUS_LABELS = dict(Order.STATUS_CHOICES)
+
+
+class OrderSeeder:
+    """
+    Genera y guarda pedidos sintéticos por lotes.
+
+    ``days`` es la antigüedad máxima de los pedidos, ``cancel_ratio`` y
+    ``delay_ratio`` las proporciones de pedidos cancelados y retrasados.
+    """
+
+    def __init__(self, prefix='SEED', days=90, cancel_ratio=0.03, delay_ratio=0.06,
+                 batch_size=5000, snapshots=True, seed=None):
+        self.prefix = prefix
+        self.days = days
+        self.cancel_ratio = cancel_ratio
+        self.delay_ratio = delay_ratio
+        self.batch_size = batch_size
+        self.snapshots = snapshots
+        self.random = random.Random(seed)
+        self.cities = [(city, zip_prefix) for city, zip_prefix, _ in CITIES]
+        self.city_weights = [weight for _, _, weight in CITIES]
+        self.order_fields = [field for field in Order._meta.concrete_fields]
+        self.history_fields = [
+            OrderHistory._meta.get_field(name)
+            for name in ('order', 'status', 'template', 'location', 'description', 'timestamp')
+        ]
+        self.created = 0
+        self.history_created = 0
+
+    def next_number(self):
+        """Siguiente número libre con el prefijo (los números llevan 9 cifras)"""
+        last = (
+            Order.objects.filter(order_number__regex=rf'^{self.prefix}[0-9]{{9}}$')
+            .order_by('-order_number')
+            .values_list('order_number', flat=True)
+            .first()
+        )
+        return int(last[len(self.prefix):]) + 1 if last else 1
+
+    def seed(self, count, progress=None):
+        """Crea ``count`` pedidos; llama a ``progress(creados)`` tras cada lote"""
+        number = self.next_number()
+        remaining = count
+        while remaining > 0:
+            size = min(self.batch_size, remaining)
+            self.write_batch(range(number, number + size))
+            number += size
+            remaining -= size
+            if progress is not None:
+                progress(self.created)
+
+    def write_batch(self, numbers):
+        quote = connection.ops.quote_name
+        now = timezone.now()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                [Order._meta.db_table, len(numbers)],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+
+            orders = []
+            history = []
+            for pk, number in zip(ids, numbers):
+                order, events = self.build_order(pk, number, now)
+                orders.append([order[field.attname] for field in self.order_fields])
+                for status, location, description, timestamp in events:
+                    entry = compact_history_entry({
+                        'order_id': pk, 'status': status, 'location': location,
+                        'description': description, 'timestamp': timestamp,
+                    })
+                    history.append([entry[field.attname] for field in self.history_fields])
+
+            copy_rows(cursor, quote(Order._meta.db_table),
+                      ', '.join(quote(field.column) for field in self.order_fields), orders)
+            copy_rows(cursor, quote(OrderHistory._meta.db_table),
+                      ', '.join(quote(field.column) for field in self.history_fields), history)
+
+            if self.snapshots:
+                refresh_tracking(ids)
+
+        self.created += len(ids)
+        self.history_created += len(history)
+
+    def build_order(self, pk, number, now):
+        """Devuelve los campos del pedido (por ``attname``) y su historial ya ocurrido"""
+        rand = self.random
+        city, zip_prefix = rand.choices(self.cities, self.city_weights)[0]
+        first_name, last_name = rand.choice(FIRST_NAMES), rand.choice(LAST_NAMES)
+        created_at = now - timedelta(seconds=rand.uniform(0, self.days * 86400))
+
+        planned = timedelta(days=rand.uniform(2, 6))
+        events = self.timeline(created_at, planned, city)
+        estimated_delivery = created_at + planned
+        events = [event for event in events if event[3] <= now]
+        status, location = events[-1][0], events[-1][1]
+        delivered_at = events[-1][3] if status == 'DELIVERED' else None
+
+        order = {
+            'id': pk,
+            'order_number': f'{self.prefix}{number:09d}',
+            'customer_name': f'{first_name} {last_name}',
+            'customer_email': f'{first_name}.{last_name}.{number}@example.com'.lower(),
+            'customer_phone': f'6{rand.randrange(10 ** 8):08d}',
+            'delivery_address': f'{rand.choice(STREETS)}, {rand.randint(1, 200)}',
+            'delivery_city': city,
+            'delivery_postal_code': f'{zip_prefix}{rand.randrange(1000):03d}',
+            'status': status,
+            'current_location': location,
+            'created_at': created_at,
+            'updated_at': now,
+            'estimated_delivery': estimated_delivery,
+            'delivered_at': delivered_at,
+            'notes': None,
+            'is_delayed': status not in Order.CLOSED_STATUSES and now > estimated_delivery,
+            'tracking_snapshot': None,
+            'content_hash': '',
+            'search_vector': None,
+        }
+        return order, events
+
+    def timeline(self, created_at, planned, city):
+        """Eventos ``(estado, ubicación, descripción, fecha)`` del pedido completo"""
+        rand = self.random
+        hours = self.hours
+
+        timestamp = created_at
+        events = [('PENDING', 'Order placed', 'Your order has been received and is being processed.', timestamp)]
+        if rand.random() < self.cancel_ratio:
+            if rand.random() < 0.5:
+                timestamp += hours(1, 12)
+                events.append(('PROCESSING', 'Warehouse', 'Your order is being prepared for shipment.', timestamp))
+            timestamp += hours(1, 24)
+            events.append(('CANCELLED', 'Warehouse', 'Estado actualizado a Cancelled', timestamp))
+            return events
+
+        timestamp += hours(1, 12)
+        events.append(('PROCESSING', 'Warehouse', 'Your order is being prepared for shipment.', timestamp))
+        timestamp += hours(4, 24)
+        events.append(('SHIPPED', 'Origin facility', 'Your package has been shipped.', timestamp))
+
+        # Retrasados: la entrega real llega después de la estimada
+        delivery = created_at + planned
+        if rand.random() < self.delay_ratio:
+            delivery += timedelta(days=rand.uniform(1, 5))
+        out_for_delivery = delivery - hours(2, 8)
+
+        hops = rand.randint(1, 4)
+        span = (out_for_delivery - timestamp) / (hops + 1)
+        for hub in rand.sample(HUBS, hops):
+            timestamp += span
+            events.append(('IN_TRANSIT', hub, f'{STATUS_LABELS["IN_TRANSIT"]}: {hub}', timestamp))
+
+        events.append(('OUT_FOR_DELIVERY', city, 'Out for delivery in your area.', out_for_delivery))
+        events.append(('DELIVERED', city, 'Package delivered successfully.', delivery))
+        return events
+
+    def hours(self, low, high):
+        return timedelta(hours=self.random.uniform(low, high))
@@ -1,4 +1,10 @@
-from rest_framework import serializers
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .history import expand_history
 from .models import Order, OrderHistory
 
 
@@ -6,6 +12,9 @@ class OrderHistorySerializer(serializers.ModelSerializer):
     """Serializer para el historial de pedidos"""
     
     status_display = serializers.CharField(source='get_status_display', read_only=True)
+    # Textos de la plantilla del evento, si la tiene (ver history.py)
+    location = serializers.SerializerMethodField()
+    description = serializers.SerializerMethodField()
     
     class Meta:
         model = OrderHistory
@@ -17,6 +26,12 @@ class OrderHistorySerializer(serializers.ModelSerializer):
             'description',
             'timestamp'
         ]
+    
+    def get_location(self, obj):
+        return expand_history(obj.template_id, obj.location, obj.description)[0]
+    
+    def get_description(self, obj):
+        return expand_history(obj.template_id, obj.location, obj.description)[1]
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -71,3 +86,113 @@ class OrderTrackingSerializer(serializers.ModelSerializer):
             'is_delayed',
             'history'
         ]
+
+
+class StatusEventSerializer(serializers.Serializer):
+    """Evento de estado enviado por un transportista"""
+    
+    order_number = serializers.CharField(max_length=50)
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+    location = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    description = serializers.CharField(required=False, allow_blank=True)
+    timestamp = serializers.DateTimeField()
+
+
+def serialized_model_fields(serializer_class):
+    """Campos del modelo que lee el serializer (para limitar el SELECT con only())"""
+    model = serializer_class.Meta.model
+    concrete = {field.name for field in model._meta.concrete_fields}
+    return ['id'] + [name for name in serializer_class.Meta.fields if name in concrete and name != 'id']
+
+
+# ---------------------------------------------------------------------------
+# Serialización rápida del seguimiento público
+#
+# Genera exactamente la misma salida que OrderTrackingSerializer pero a partir
+# de filas de values(), sin instanciar modelos ni introspección de campos de
+# DRF por cada fila. Se usa para construir los snapshots de seguimiento.
+# ---------------------------------------------------------------------------
+
+# Etiqueta y porcentaje de progreso precalculados para cada estado
+STATUS_TABLE = {
+    code: (label, Order.PROGRESS_PERCENTAGES.get(code, 0))
+    for code, label in Order.STATUS_CHOICES
+}
+
+TRACKING_ORDER_COLUMNS = (
+    'id', 'order_number', 'status', 'current_location',
+    'estimated_delivery', 'delivered_at', 'is_delayed',
+)
+TRACKING_HISTORY_COLUMNS = ('id', 'order_id', 'status', 'template_id', 'location', 'description', 'timestamp')
+
+def _datetime_formatter():
+    """
+    Formateador de fechas equivalente a ``serializers.DateTimeField``.
+
+    Con la configuración del proyecto (USE_TZ e ISO 8601) se resuelve la zona
+    horaria una sola vez por llamada en lugar de una vez por campo.
+    """
+    if not settings.USE_TZ or api_settings.DATETIME_FORMAT.lower() != ISO_8601:
+        return serializers.DateTimeField().to_representation
+
+    current_timezone = timezone.get_current_timezone()
+
+    def to_representation(value):
+        if not value:
+            return None
+        value = value.astimezone(current_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return to_representation
+
+
+def _status_display(status):
+    return STATUS_TABLE[status][0] if status in STATUS_TABLE else status
+
+
+def _history_entry(row, format_datetime):
+    location, description = expand_history(row['template_id'], row['location'], row['description'])
+    return {
+        'id': row['id'],
+        'status': row['status'],
+        'status_display': _status_display(row['status']),
+        'location': location,
+        'description': description,
+        'timestamp': format_datetime(row['timestamp']),
+    }
+
+
+def tracking_payloads(queryset):
+    """
+    Payloads de seguimiento (``{id: payload}``) de los pedidos del queryset.
+
+    Hace dos consultas: una para los pedidos y otra para todo su historial.
+    """
+    format_datetime = _datetime_formatter()
+    orders = list(queryset.order_by().values(*TRACKING_ORDER_COLUMNS))
+
+    history = defaultdict(list)
+    for row in (
+        OrderHistory.objects.filter(order_id__in=[order['id'] for order in orders])
+        .order_by('-timestamp', '-id')
+        .values(*TRACKING_HISTORY_COLUMNS)
+    ):
+        history[row['order_id']].append(_history_entry(row, format_datetime))
+
+    payloads = {}
+    for order in orders:
+        status_display, progress = STATUS_TABLE.get(order['status'], (order['status'], 0))
+        payloads[order['id']] = {
+            'order_number': order['order_number'],
+            'status': order['status'],
+            'status_display': status_display,
+            'current_location': order['current_location'],
+            'progress_percentage': progress,
+            'estimated_delivery': format_datetime(order['estimated_delivery']),
+            'delivered_at': format_datetime(order['delivered_at']),
+            'is_delayed': order['is_delayed'],
+            'history': history.get(order['id'], []),
+        }
+    return payloads
@@ -0,0 +1,36 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .metrics import record_query
+from .models import Order, OrderHistory
+from .tracking import invalidate_tracking, refresh_tracking_on_commit
+
+
+@receiver(post_save, sender=Order)
+def refresh_order_tracking(sender, instance, **kwargs):
+    """Regenera el snapshot de seguimiento al guardar un pedido"""
+    refresh_tracking_on_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Order)
+def invalidate_order_tracking(sender, instance, **kwargs):
+    """Invalida el seguimiento cacheado al borrar un pedido"""
+    invalidate_tracking([instance.order_number])
+
+
+@receiver([post_save, post_delete], sender=OrderHistory)
+def refresh_history_tracking(sender, instance, **kwargs):
+    """
+    Regenera el snapshot del pedido al guardar o borrar una entrada del historial.
+
+    Si el pedido ya no existe (borrado en cascada) no hay nada que regenerar.
+    """
+    refresh_tracking_on_commit([instance.order_id])
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Cuenta las consultas de cada petición para las métricas"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,26 @@
+"""Pedidos mínimos y configuración común de los tests"""
+from itertools import count
+
+from orders.models import Order
+
+
+_numbers = count(1)
+
+# Caché propia de los tests (la de settings puede ser la de ficheros, compartida)
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+}
+
+
+def create_order(**fields):
+    """Crea un pedido con datos de cliente de relleno; ``fields`` sobrescribe cualquiera"""
+    number = next(_numbers)
+    defaults = {
+        'order_number': f'TST{number:08d}',
+        'customer_name': 'Cliente de Prueba',
+        'customer_email': f'cliente{number}@example.com',
+        'delivery_address': 'Calle Mayor 1',
+        'delivery_city': 'Madrid',
+        'delivery_postal_code': '28001',
+    }
+    return Order.objects.create(**{**defaults, **fields})
@@ -0,0 +1,72 @@
+"""Formularios del admin del historial"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from orders.history import find_template
+from orders.models import OrderHistory
+
+from .factories import create_order
+
+
+class OrderHistoryAdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.order = create_order(status='PROCESSING')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_add_view_includes_order(self):
+        response = self.client.get('/admin/orders/orderhistory/add/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'name="order"')
+
+    def test_add_templated_entry(self):
+        response = self.client.post('/admin/orders/orderhistory/add/', {
+            'order': self.order.pk,
+            'status': 'SHIPPED',
+            'location': 'Origin facility',
+            'description': 'Your package has been shipped.',
+        })
+        self.assertEqual(response.status_code, 302)
+        entry = OrderHistory.objects.get(order=self.order)
+        self.assertEqual(entry.template_id, find_template('SHIPPED', 'Your package has been shipped.').pk)
+        self.assertIsNone(entry.location)
+        self.assertIsNone(entry.description)
+
+    def test_edit_detaches_template(self):
+        entry = OrderHistory.objects.create(
+            order=self.order, status='SHIPPED', location=None, description=None,
+            template=find_template('SHIPPED', 'Your package has been shipped.'),
+        )
+        url = f'/admin/orders/orderhistory/{entry.pk}/change/'
+        response = self.client.get(url)
+        self.assertContains(response, 'Your package has been shipped.')
+
+        response = self.client.post(url, {
+            'order': self.order.pk,
+            'status': 'SHIPPED',
+            'location': 'Origin facility',
+            'description': 'Salida retrasada por inventario',
+        })
+        self.assertEqual(response.status_code, 302)
+        entry.refresh_from_db()
+        self.assertIsNone(entry.template_id)
+        self.assertEqual(entry.location, 'Origin facility')
+        self.assertEqual(entry.description, 'Salida retrasada por inventario')
+
+
+class OrderAdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.order = create_order(status='IN_TRANSIT')
+
+    def test_is_delayed_is_read_only(self):
+        self.client.force_login(self.user)
+        response = self.client.get(f'/admin/orders/order/{self.order.pk}/change/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'name="is_delayed"')
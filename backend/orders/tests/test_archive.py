@@ -0,0 +1,77 @@
+"""Archivado de pedidos cerrados (orders/archive.py)"""
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from orders.archive import OrderArchiver, archivable_orders, archive_cutoff
+from orders.importer import BulkOrderWriter
+from orders.models import ArchivedOrder, ArchivedOrderHistory, Order, OrderHistory
+from orders.tracking import get_tracking_entry, refresh_tracking
+
+from .factories import TEST_CACHES, create_order
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OrderArchiverTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.now = timezone.now()
+        self.cutoff = archive_cutoff(365)
+
+    def closed_order(self, status, closed_days_ago, **fields):
+        """Pedido cerrado hace ``closed_days_ago`` días con su último evento en esa fecha"""
+        closed = self.now - timedelta(days=closed_days_ago)
+        order = create_order(status=status, **fields)
+        OrderHistory.objects.create(order=order, status='PENDING', location='Almacén',
+                                    description='Recibido', timestamp=closed - timedelta(days=3))
+        OrderHistory.objects.create(order=order, status=status, location='Almacén',
+                                    description='Cerrado', timestamp=closed)
+        refresh_tracking([order.pk])
+        # Un snapshot regenerado hoy no cambia la fecha de cierre
+        Order.objects.filter(pk=order.pk).update(created_at=self.now - timedelta(days=500), updated_at=self.now)
+        return Order.objects.get(pk=order.pk)
+
+    def test_closure_date_ignores_updated_at(self):
+        cancelled = self.closed_order('CANCELLED', 400)
+        delivered = self.closed_order('DELIVERED', 400)
+        # Cerrados hace poco (por su último evento o por delivered_at)
+        self.closed_order('CANCELLED', 30)
+        self.closed_order('DELIVERED', 400, delivered_at=self.now - timedelta(days=10))
+        open_order = create_order(status='IN_TRANSIT')
+        Order.objects.filter(pk=open_order.pk).update(created_at=self.now - timedelta(days=500))
+
+        self.assertEqual(
+            set(archivable_orders(self.cutoff).values_list('pk', flat=True)),
+            {cancelled.pk, delivered.pk},
+        )
+
+    def test_archive_moves_orders_and_history(self):
+        order = self.closed_order('DELIVERED', 400)
+        archiver = OrderArchiver(self.cutoff, batch_size=1)
+        archiver.run()
+
+        self.assertEqual((archiver.orders_archived, archiver.history_archived), (1, 2))
+        self.assertFalse(Order.objects.filter(pk=order.pk).exists())
+        self.assertFalse(OrderHistory.objects.filter(order_id=order.pk).exists())
+        archived = ArchivedOrder.objects.get(pk=order.pk)
+        self.assertEqual(archived.order_number, order.order_number)
+        self.assertEqual(ArchivedOrderHistory.objects.filter(order=archived).count(), 2)
+
+    def test_tracking_resolves_archived_orders(self):
+        order = self.closed_order('DELIVERED', 400)
+        before = get_tracking_entry(order.order_number)
+        caches['default'].clear()
+
+        OrderArchiver(self.cutoff).run()
+        after = get_tracking_entry(order.order_number)
+        self.assertEqual(after.payload, before.payload)
+        self.assertEqual(after.etag, before.etag)
+        self.assertEqual(get_tracking_entry(order.order_number, validators_only=True).etag, before.etag)
+
+    def test_import_does_not_recreate_archived_orders(self):
+        order = self.closed_order('DELIVERED', 400)
+        OrderArchiver(self.cutoff).run()
+        self.assertEqual(BulkOrderWriter().existing_order_numbers([order.order_number]), {order.order_number})
@@ -0,0 +1,117 @@
+"""Pasada de detección de retrasos (orders/delays.py)"""
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from orders.delays import CHECKPOINT_KEY, DelaySweeper
+from orders.models import Checkpoint, Order, OrderHistory
+
+from .factories import create_order
+
+
+def age(order, **fields):
+    """Cambia columnas sin pasar por save() (no toca updated_at salvo que se indique)"""
+    Order.objects.filter(pk=order.pk).update(**fields)
+
+
+def flagged(order):
+    return Order.objects.values_list('is_delayed', flat=True).get(pk=order.pk)
+
+
+class DelaySweepTests(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.long_ago = self.now - timedelta(days=10)
+
+    def sweep(self, **kwargs):
+        sweeper = DelaySweeper(stale_hours=48, **kwargs)
+        sweeper.run()
+        return sweeper
+
+    def event(self, order, hours_ago):
+        OrderHistory.objects.create(
+            order=order, status=order.status, location='Madrid',
+            description='Escaneo', timestamp=self.now - timedelta(hours=hours_ago),
+        )
+
+    def test_first_sweep_flags_and_unflags(self):
+        overdue = create_order(status='IN_TRANSIT', estimated_delivery=self.now - timedelta(hours=1))
+        self.event(overdue, hours_ago=2)
+        on_time = create_order(status='IN_TRANSIT', estimated_delivery=self.now + timedelta(days=2))
+        self.event(on_time, hours_ago=2)
+        stale = create_order(status='SHIPPED', estimated_delivery=self.now + timedelta(days=2))
+        self.event(stale, hours_ago=72)
+        delivered = create_order(status='DELIVERED', estimated_delivery=self.now - timedelta(days=1))
+        age(delivered, is_delayed=True)
+
+        sweeper = self.sweep()
+
+        self.assertEqual((sweeper.flagged, sweeper.unflagged), (2, 1))
+        self.assertTrue(flagged(overdue))
+        self.assertTrue(flagged(stale))
+        self.assertFalse(flagged(on_time))
+        self.assertFalse(flagged(delivered))
+        # El seguimiento público refleja la marca
+        overdue.refresh_from_db()
+        self.assertTrue(overdue.tracking_snapshot['is_delayed'])
+
+    def test_second_sweep_is_a_no_op(self):
+        order = create_order(status='IN_TRANSIT', estimated_delivery=self.now - timedelta(hours=1))
+        self.sweep()
+        sweeper = self.sweep()
+        self.assertIsNotNone(sweeper.since)
+        self.assertEqual((sweeper.flagged, sweeper.unflagged), (0, 0))
+        self.assertTrue(flagged(order))
+
+    def test_incremental_sweep_only_sees_changed_orders(self):
+        order = create_order(status='IN_TRANSIT', estimated_delivery=self.now + timedelta(days=2))
+        self.event(order, hours_ago=1)
+        self.sweep()
+
+        # Marca puesta sin tocar updated_at: la pasada incremental no lo revisa
+        age(order, is_delayed=True, updated_at=self.long_ago)
+        self.sweep()
+        self.assertTrue(flagged(order))
+
+        # En cuanto se modifica, se recalcula
+        age(order, updated_at=timezone.now())
+        self.sweep()
+        self.assertFalse(flagged(order))
+
+    def test_incremental_sweep_catches_passed_estimated_delivery(self):
+        order = create_order(status='IN_TRANSIT', estimated_delivery=self.now + timedelta(days=2))
+        self.event(order, hours_ago=1)
+        self.sweep()
+
+        # Sin tocar el pedido, la entrega estimada vence después de la última pasada
+        Checkpoint.objects.filter(key=CHECKPOINT_KEY).update(
+            data={'high_water_mark': (self.now - timedelta(hours=1)).isoformat()}
+        )
+        age(order, estimated_delivery=self.now - timedelta(minutes=30), updated_at=self.long_ago)
+        self.sweep()
+        self.assertTrue(flagged(order))
+
+    def test_incremental_sweep_catches_orders_without_history(self):
+        order = create_order(status='PROCESSING', estimated_delivery=self.now + timedelta(days=5))
+        self.sweep()
+        self.assertFalse(flagged(order))
+
+        # Creado hace justo 48 h, sin eventos ni cambios desde la última pasada
+        Checkpoint.objects.filter(key=CHECKPOINT_KEY).update(
+            data={'high_water_mark': (self.now - timedelta(hours=1)).isoformat()}
+        )
+        age(order, created_at=self.now - timedelta(hours=48, minutes=30), updated_at=self.long_ago)
+        self.sweep()
+        self.assertTrue(flagged(order))
+
+    def test_full_sweep_ignores_the_checkpoint(self):
+        order = create_order(status='IN_TRANSIT', estimated_delivery=self.now + timedelta(days=2))
+        self.event(order, hours_ago=1)
+        self.sweep()
+        age(order, is_delayed=True, updated_at=self.long_ago)
+
+        sweeper = self.sweep(full=True)
+        self.assertIsNone(sweeper.since)
+        self.assertFalse(flagged(order))
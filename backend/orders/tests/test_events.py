@@ -0,0 +1,130 @@
+"""Ingesta de eventos de los transportistas (orders/events.py y /api/events/)"""
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.events import StatusEventApplier
+from orders.models import Job, Order, OrderHistory
+
+from .factories import TEST_CACHES, create_order
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StatusEventApplierTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.now = timezone.now().replace(microsecond=0)
+        self.order = create_order(status='PENDING')
+        OrderHistory.objects.create(order=self.order, status='PENDING', location='Almacén',
+                                    description='Recibido', timestamp=self.now)
+
+    def event(self, status, seconds=0, **fields):
+        return {
+            'order_number': self.order.order_number, 'status': status,
+            'timestamp': self.now + timedelta(seconds=seconds), **fields,
+        }
+
+    def apply(self, events):
+        applier = StatusEventApplier()
+        applier.apply(events)
+        return applier
+
+    def statuses(self):
+        return list(self.order.history.order_by('timestamp', 'pk').values_list('status', flat=True))
+
+    def test_applies_newer_events_in_order(self):
+        applier = self.apply([
+            self.event('IN_TRANSIT', 120, location='Zaragoza'),
+            self.event('PROCESSING', 60, location='Madrid'),
+        ])
+        self.assertEqual(applier.applied, 2)
+        self.assertEqual(self.statuses(), ['PENDING', 'PROCESSING', 'IN_TRANSIT'])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'IN_TRANSIT')
+        self.assertEqual(self.order.current_location, 'Zaragoza')
+        self.assertEqual(self.order.tracking_snapshot['status'], 'IN_TRANSIT')
+
+    def test_same_timestamp_with_new_status_is_applied(self):
+        applier = self.apply([self.event('PROCESSING')])
+        self.assertEqual((applier.applied, applier.duplicates), (1, 0))
+        self.assertEqual(sorted(self.statuses()), ['PENDING', 'PROCESSING'])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'PROCESSING')
+
+    def test_replayed_batch_is_a_no_op(self):
+        batch = [self.event('PROCESSING'), self.event('IN_TRANSIT', 60)]
+        self.apply(batch)
+        applier = self.apply(batch)
+        # Solo el último evento registrado se compara por estado; los anteriores son desordenados
+        self.assertEqual((applier.applied, applier.duplicates, applier.stale), (0, 1, 1))
+        self.assertEqual(self.order.history.count(), 3)
+
+    def test_duplicates_inside_a_batch_are_applied_once(self):
+        applier = self.apply([self.event('PROCESSING', 60), self.event('PROCESSING', 60)])
+        self.assertEqual((applier.applied, applier.duplicates), (1, 1))
+
+    def test_out_of_order_events_are_dropped(self):
+        self.apply([self.event('IN_TRANSIT', 120)])
+        applier = self.apply([self.event('PROCESSING', 60)])
+        self.assertEqual((applier.applied, applier.stale), (0, 1))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'IN_TRANSIT')
+
+    def test_location_comes_from_the_newest_event_that_has_one(self):
+        self.apply([
+            self.event('IN_TRANSIT', 60, location='Zaragoza'),
+            self.event('OUT_FOR_DELIVERY', 120),
+        ])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.current_location, 'Zaragoza')
+
+    def test_delivery_sets_delivered_at(self):
+        self.apply([self.event('DELIVERED', 60)])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.delivered_at, self.now + timedelta(seconds=60))
+
+    def test_unknown_orders_are_reported(self):
+        applier = self.apply([{'order_number': 'NOEXISTE', 'status': 'PROCESSING', 'timestamp': self.now}])
+        self.assertEqual(applier.unknown, {'NOEXISTE'})
+        self.assertEqual(applier.applied, 0)
+
+
+@override_settings(CACHES=TEST_CACHES, CARRIER_EVENTS_TOKEN='secreto', CARRIER_EVENTS_MAX_BATCH_SIZE=2)
+class StatusEventViewTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = APIClient()
+        self.order = create_order(status='PENDING')
+        self.payload = {'events': [{
+            'order_number': self.order.order_number, 'status': 'IN_TRANSIT',
+            'location': 'Madrid', 'timestamp': timezone.now().isoformat(),
+        }]}
+
+    def post(self, payload, token='secreto'):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        return self.client.post('/api/events/', payload, format='json', **headers)
+
+    def test_requires_the_carrier_token(self):
+        self.assertEqual(self.post(self.payload, token=None).status_code, 403)
+        self.assertEqual(self.post(self.payload, token='otro').status_code, 403)
+
+    def test_applies_events_and_defers_the_refresh(self):
+        response = self.post(self.payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['applied'], 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'IN_TRANSIT')
+        self.assertIsNone(self.order.tracking_snapshot)
+        job = Job.objects.get(name='refresh_tracking')
+        self.assertEqual(job.payload, {'order_ids': [self.order.pk]})
+
+    def test_rejects_invalid_batches(self):
+        self.assertEqual(self.post({'events': []}).status_code, 400)
+        self.assertEqual(self.post({'events': self.payload['events'] * 3}).status_code, 400)
+        bad = {'events': [dict(self.payload['events'][0], status='PERDIDO')]}
+        self.assertEqual(self.post(bad).status_code, 400)
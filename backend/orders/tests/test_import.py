@@ -0,0 +1,129 @@
+"""Importación de pedidos desde CSV de Shopify (manage.py import_orders)"""
+import csv
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from orders.importer import ImportCheckpoint
+from orders.models import Order, OrderHistory
+
+from .factories import TEST_CACHES
+
+
+COLUMNS = [
+    'Name', 'Id', 'Email', 'Created at', 'Fulfilled at', 'Lineitem name',
+    'Shipping Name', 'Shipping Phone', 'Shipping Address1', 'Shipping Address2',
+    'Shipping City', 'Shipping Zip', 'Shipping Province', 'Shipping Country',
+    'Billing Name', 'Billing Phone', 'Billing Address1', 'Billing Address2',
+    'Billing City', 'Billing Zip', 'Billing Province', 'Billing Country',
+]
+
+
+def shopify_rows(number, lines=2, **fields):
+    """Filas de un pedido de Shopify (una por línea, solo la primera con datos)"""
+    first = dict.fromkeys(COLUMNS, '')
+    first.update({
+        'Name': f'#{number}', 'Id': str(number), 'Email': f'cliente{number}@example.com',
+        'Created at': '2025-03-01 10:00:00 +0100', 'Fulfilled at': '2025-03-04 12:30:00 +0100',
+        'Lineitem name': 'Producto 1', 'Shipping Name': f'Cliente {number}',
+        'Shipping Address1': 'Calle Mayor 1', 'Shipping City': 'Madrid',
+        'Shipping Zip': '28013', 'Shipping Country': 'ES',
+    })
+    first.update(fields)
+    rest = [
+        dict(dict.fromkeys(COLUMNS, ''), Name=f'#{number}', **{'Lineitem name': f'Producto {line}'})
+        for line in range(2, lines + 1)
+    ]
+    return [first] + rest
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ImportOrdersTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_csv(self, orders, name='orders.csv'):
+        path = os.path.join(self.directory, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=COLUMNS)
+            writer.writeheader()
+            for rows in orders:
+                writer.writerows(rows)
+        return path
+
+    def run_import(self, path, *args):
+        call_command('import_orders', path, *args, stdout=StringIO())
+
+    def test_bulk_creates_orders_with_history(self):
+        path = self.write_csv([shopify_rows(1001), shopify_rows(1002, lines=3)], name='orders.csv.gz')
+        self.run_import(path, '--bulk')
+        order = Order.objects.get(order_number='1001')
+        self.assertEqual(order.status, 'DELIVERED')
+        self.assertEqual(order.delivery_city, 'Madrid')
+        self.assertEqual(order.created_at.isoformat(), '2025-03-01T09:00:00+00:00')
+        self.assertEqual(OrderHistory.objects.filter(order=order).count(), 6)
+        self.assertEqual(order.tracking_snapshot['status'], 'DELIVERED')
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_delta_updates_only_changed_orders(self):
+        self.run_import(self.write_csv([shopify_rows(1001), shopify_rows(1002)]), '--delta')
+        unchanged = Order.objects.get(order_number='1001')
+
+        path = self.write_csv([
+            shopify_rows(1001),
+            shopify_rows(1002, **{'Shipping City': 'Sevilla', 'Fulfilled at': '2025-03-06 09:00:00 +0100'}),
+            shopify_rows(1003),
+        ])
+        call_command('import_orders', path, '--delta', stdout=(output := StringIO()))
+        self.assertIn('Pedidos actualizados: 1', output.getvalue())
+        self.assertIn('Pedidos creados: 1', output.getvalue())
+
+        self.assertEqual(Order.objects.get(order_number='1001').updated_at, unchanged.updated_at)
+        changed = Order.objects.get(order_number='1002')
+        self.assertEqual(changed.delivery_city, 'Sevilla')
+        delivered = changed.history.get(status='DELIVERED')
+        self.assertEqual(delivered.timestamp.isoformat(), '2025-03-06T08:00:00+00:00')
+        self.assertIn('Sevilla', delivered.location)
+        self.assertEqual(changed.history.count(), 6)
+        self.assertEqual(changed.tracking_snapshot['current_location'], 'Delivered to Sevilla')
+
+    def test_resume_skips_orders_already_processed(self):
+        path = self.write_csv([shopify_rows(number) for number in (1001, 1002, 1003)])
+        # Importación interrumpida tras el primer lote
+        ImportCheckpoint(path).save(2)
+        self.run_import(path, '--delta', '--batch-size', '2', '--resume')
+        self.assertEqual(list(Order.objects.values_list('order_number', flat=True)), ['1003'])
+        # Al terminar se borra el punto de control
+        self.assertEqual(ImportCheckpoint(path).load(), 0)
+
+    def test_checkpoint_is_ignored_when_the_file_changes(self):
+        path = self.write_csv([shopify_rows(1001)])
+        ImportCheckpoint(path).save(1)
+        path = self.write_csv([shopify_rows(1001), shopify_rows(1002)])
+        os.utime(path, (0, 0))
+        self.assertEqual(ImportCheckpoint(path).load(), 0)
+        self.run_import(path, '--bulk', '--resume')
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_copy_skips_existing_orders(self):
+        self.run_import(self.write_csv([shopify_rows(1001)]), '--bulk')
+        path = self.write_csv([shopify_rows(1001), shopify_rows(1002)])
+        call_command('import_orders', path, '--copy', stdout=(output := StringIO()))
+        self.assertIn('Pedidos creados: 1', output.getvalue())
+        self.assertIn('Pedidos omitidos: 1', output.getvalue())
+        order = Order.objects.get(order_number='1002')
+        self.assertEqual(
+            list(order.history.order_by('pk').values_list('status', flat=True)),
+            ['PENDING', 'PROCESSING', 'SHIPPED', 'IN_TRANSIT', 'OUT_FOR_DELIVERY', 'DELIVERED'],
+        )
+        self.assertEqual(order.tracking_snapshot['order_number'], '1002')
@@ -0,0 +1,110 @@
+"""Cola de trabajos en segundo plano (orders/jobs.py)"""
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from orders.jobs import (
+    JOB_HANDLERS, claim_jobs, enqueue, heartbeat, release_jobs, requeue_stale_jobs, run_job,
+)
+from orders.models import Job
+
+from .factories import TEST_CACHES, create_order
+
+
+def failing_job():
+    raise RuntimeError('falla siempre')
+
+
+@override_settings(
+    CACHES=TEST_CACHES,
+    JOB_MAX_ATTEMPTS=3, JOB_RETRY_BACKOFF=10, JOB_RETRY_BACKOFF_MAX=25, JOB_LOCK_TIMEOUT=300,
+)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        patcher = mock.patch.dict(JOB_HANDLERS, {'failing': failing_job, 'noop': lambda: None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reload(self, job):
+        return Job.objects.get(pk=job.pk)
+
+    def age_lock(self, job, seconds):
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_enqueue_rejects_unknown_jobs(self):
+        with self.assertRaises(ValueError):
+            enqueue('desconocido')
+
+    def test_claim_takes_due_jobs_in_order(self):
+        later = enqueue('noop', run_at=timezone.now() + timedelta(minutes=5))
+        first = enqueue('noop', run_at=timezone.now() - timedelta(minutes=2))
+        second = enqueue('noop', run_at=timezone.now() - timedelta(minutes=1))
+        third = enqueue('noop')
+
+        claimed = claim_jobs('worker-1', limit=2)
+        self.assertEqual([job.pk for job in claimed], [first.pk, second.pk])
+        stored = self.reload(first)
+        self.assertEqual((stored.status, stored.locked_by, stored.attempts), (Job.RUNNING, 'worker-1', 1))
+
+        # Los reclamados ya no se reparten; los futuros esperan
+        self.assertEqual([job.pk for job in claim_jobs('worker-2', limit=10)], [third.pk])
+        self.assertEqual(self.reload(later).status, Job.PENDING)
+
+    def test_release_returns_jobs_without_spending_an_attempt(self):
+        job = enqueue('noop')
+        release_jobs(claim_jobs('worker-1', limit=1))
+        stored = self.reload(job)
+        self.assertEqual((stored.status, stored.locked_by, stored.attempts), (Job.PENDING, '', 0))
+
+    def test_successful_jobs_are_deleted(self):
+        order = create_order()
+        enqueue('refresh_tracking', {'order_ids': [order.pk]})
+        [job] = claim_jobs('worker-1', limit=1)
+        self.assertTrue(run_job(job))
+        self.assertFalse(Job.objects.exists())
+        order.refresh_from_db()
+        self.assertEqual(order.tracking_snapshot['order_number'], order.order_number)
+
+    def test_failures_retry_with_backoff_until_failed(self):
+        job = enqueue('failing')
+        delays = []
+        for _ in range(3):
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            [claimed] = claim_jobs('worker-1', limit=1)
+            started = timezone.now()
+            self.assertFalse(run_job(claimed))
+            stored = self.reload(job)
+            delays.append(round((stored.run_at - started).total_seconds()))
+        self.assertEqual(delays[:2], [10, 20])
+        self.assertEqual(stored.status, Job.FAILED)
+        self.assertIn('falla siempre', stored.last_error)
+
+    def test_heartbeat_keeps_long_jobs_alive(self):
+        job = enqueue('noop')
+        claim_jobs('worker-1:thread-1', limit=1)
+        other = enqueue('noop')
+        claim_jobs('worker-2:thread-1', limit=1)
+        self.age_lock(job, 600)
+        self.age_lock(other, 600)
+
+        self.assertEqual(heartbeat('worker-1'), 1)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(self.reload(job).status, Job.RUNNING)
+        self.assertEqual(self.reload(other).status, Job.PENDING)
+
+    def test_lost_runs_count_as_failed_attempts(self):
+        job = enqueue('noop', max_attempts=2)
+        for expected in (Job.PENDING, Job.FAILED):
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            claim_jobs('worker-1', limit=1)
+            self.age_lock(job, 600)
+            self.assertEqual(requeue_stale_jobs(), 1)
+            stored = self.reload(job)
+            self.assertEqual(stored.status, expected)
+        self.assertEqual(stored.attempts, 2)
+        self.assertIn('worker-1', stored.last_error)
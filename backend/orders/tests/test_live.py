@@ -0,0 +1,126 @@
+"""Seguimiento en directo: broadcaster en memoria y stream SSE (orders/live.py)"""
+import asyncio
+import threading
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from orders import live
+from orders.async_views import tracking_events
+from orders.live import (
+    NOTIFY_PAYLOAD_SIZE, Broadcaster, PostgresBroadcaster, get_broadcaster, notify_payloads,
+    publish_tracking_update,
+)
+from orders.models import OrderHistory
+from orders.tracking import invalidate_tracking
+
+from .factories import TEST_CACHES, create_order
+
+
+class BroadcasterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.broadcaster = Broadcaster()
+
+    async def test_publish_reaches_only_the_order_subscribers(self):
+        first = self.broadcaster.subscribe('A1')
+        other = self.broadcaster.subscribe('B2')
+        self.broadcaster.publish(['A1', 'A1', 'C3'])
+        self.assertTrue(await first.wait(1))
+        self.assertFalse(await other.wait(0.01))
+        # El aviso se consume: la siguiente espera vuelve a bloquear
+        self.assertFalse(await first.wait(0.01))
+
+    async def test_notify_from_another_thread(self):
+        subscription = self.broadcaster.subscribe('A1')
+        thread = threading.Thread(target=self.broadcaster.publish, args=(['A1'],))
+        thread.start()
+        self.assertTrue(await subscription.wait(1))
+        thread.join()
+
+    async def test_unsubscribe_forgets_the_order(self):
+        first = self.broadcaster.subscribe('A1')
+        second = self.broadcaster.subscribe('A1')
+        self.broadcaster.unsubscribe(first)
+        self.broadcaster.publish(['A1'])
+        self.assertFalse(await first.wait(0.01))
+        self.assertTrue(await second.wait(1))
+        self.broadcaster.unsubscribe(second)
+        self.assertEqual(self.broadcaster.subscriptions, {})
+
+    async def test_deliver_all_wakes_every_subscription(self):
+        subscriptions = [self.broadcaster.subscribe(number) for number in ('A1', 'B2')]
+        self.broadcaster.deliver_all()
+        self.assertEqual(await asyncio.gather(*(s.wait(1) for s in subscriptions)), [True, True])
+
+    def test_notify_payloads_fit_in_a_notify(self):
+        numbers = [f'{n:020d}' for n in range(1000)]
+        payloads = list(notify_payloads(numbers + numbers[:10]))
+        self.assertGreater(len(payloads), 1)
+        self.assertTrue(all(len(payload.encode()) <= NOTIFY_PAYLOAD_SIZE for payload in payloads))
+        self.assertEqual([n for payload in payloads for n in payload.split('\n')], numbers)
+
+    def test_backend_setting(self):
+        for backend, expected in (('memory', Broadcaster), ('postgres', PostgresBroadcaster)):
+            with self.subTest(backend=backend), override_settings(LIVE_TRACKING_BACKEND=backend), \
+                    mock.patch.object(live, '_broadcaster', None):
+                self.assertIs(type(get_broadcaster()), expected)
+
+
+@override_settings(
+    CACHES=TEST_CACHES, LIVE_TRACKING=True, LIVE_TRACKING_BACKEND='memory',
+    LIVE_TRACKING_HEARTBEAT=1, LIVE_TRACKING_STREAM_TIMEOUT=30,
+)
+class LiveTrackingTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.broadcaster = Broadcaster()
+        patcher = mock.patch.object(live, '_broadcaster', self.broadcaster)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order = create_order(status='PENDING')
+
+    def add_event(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderHistory.objects.create(order=self.order, status='PROCESSING',
+                                        location='Madrid', description='Preparando')
+
+    def test_publishing_depends_on_the_setting(self):
+        with mock.patch.object(self.broadcaster, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                invalidate_tracking([self.order.order_number])
+            publish.assert_called_once_with([self.order.order_number])
+            with override_settings(LIVE_TRACKING=False):
+                publish_tracking_update([self.order.order_number])
+            publish.assert_called_once()
+
+    async def test_stream_sends_each_change(self):
+        events = tracking_events(self.order.order_number)
+        self.assertTrue((await anext(events)).startswith('retry: '))
+        first = await anext(events)
+        self.assertIn('"status":"PENDING"', first)
+
+        await sync_to_async(self.add_event)()
+        second = await anext(events)
+        self.assertIn('"status":"PROCESSING"', second)
+        self.assertNotEqual(first.split('\n')[1], second.split('\n')[1])
+
+        # Sin cambios solo llegan pings
+        self.assertEqual(await anext(events), ': ping\n\n')
+        await events.aclose()
+        self.assertEqual(self.broadcaster.subscriptions, {})
+
+    async def test_last_event_id_skips_the_current_version(self):
+        events = tracking_events(self.order.order_number)
+        await anext(events)
+        etag = (await anext(events)).split('\n')[1].removeprefix('id: ')
+        await events.aclose()
+
+        events = tracking_events(self.order.order_number, last_event_id=etag)
+        await anext(events)
+        self.assertEqual(await anext(events), ': ping\n\n')
+        await events.aclose()
@@ -0,0 +1,25 @@
+"""Métricas de Prometheus (GET /metrics)"""
+from django.test import TestCase, override_settings
+
+
+class MetricsViewTests(TestCase):
+
+    def get(self, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        return self.client.get('/metrics', **headers)
+
+    @override_settings(METRICS_TOKEN='secreto', DEBUG=False)
+    def test_requires_the_token(self):
+        self.assertEqual(self.get().status_code, 403)
+        self.assertEqual(self.get('otro').status_code, 403)
+        response = self.get('secreto')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'django_request_duration_seconds', response.content)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=False)
+    def test_closed_without_token_in_production(self):
+        self.assertEqual(self.get().status_code, 403)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=True)
+    def test_open_without_token_in_debug(self):
+        self.assertEqual(self.get().status_code, 200)
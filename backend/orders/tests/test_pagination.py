@@ -0,0 +1,79 @@
+"""Paginación por cursor de los listados (orders/pagination.py)"""
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.models import Order, OrderHistory
+from orders.pagination import OrderCursorPagination
+
+from .factories import TEST_CACHES, create_order
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CursorPaginationTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = APIClient()
+        now = timezone.now()
+        # Como en las importaciones: muchos pedidos con la misma fecha
+        self.orders = [create_order() for _ in range(7)]
+        Order.objects.filter(pk__in=[order.pk for order in self.orders[:5]]).update(created_at=now)
+        Order.objects.filter(pk__in=[order.pk for order in self.orders[5:]]).update(
+            created_at=now - timedelta(days=1)
+        )
+        self.expected = [order.order_number for order in self.orders[4::-1] + self.orders[:4:-1]]
+
+    def pages(self, url, **params):
+        """Recorre todas las páginas siguiendo ``next``"""
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json())
+            if not pages[-1]['next']:
+                return pages
+            response = self.client.get(pages[-1]['next'])
+
+    def numbers(self, page):
+        return [order['order_number'] for order in page['results']]
+
+    def test_walks_every_order_once_across_ties(self):
+        pages = self.pages('/api/orders/', page_size=2)
+        self.assertEqual([len(page['results']) for page in pages], [2, 2, 2, 1])
+        self.assertEqual([number for page in pages for number in self.numbers(page)], self.expected)
+        self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_link_returns_the_same_page(self):
+        first, second = self.pages('/api/orders/', page_size=3)[:2]
+        previous = self.client.get(second['previous']).json()
+        self.assertEqual(self.numbers(previous), self.numbers(first))
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(OrderCursorPagination, 'max_page_size', 4):
+            response = self.client.get('/api/orders/', {'page_size': 1000})
+        self.assertEqual(len(response.json()['results']), 4)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get('/api/orders/', {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_history_is_paginated_newest_first(self):
+        order = self.orders[0]
+        now = timezone.now()
+        entries = [
+            OrderHistory.objects.create(order=order, status='IN_TRANSIT', location='Madrid',
+                                        description=f'Escaneo {n}', timestamp=now - timedelta(hours=n // 2))
+            for n in range(5)
+        ]
+        pages = self.pages(f'/api/orders/{order.order_number}/history/', page_size=2)
+        descriptions = [entry['description'] for page in pages for entry in page['results']]
+        expected = sorted(entries, key=lambda entry: (entry.timestamp, entry.pk), reverse=True)
+        self.assertEqual(descriptions, [entry.description for entry in expected])
+
+    def test_history_of_unknown_order_is_404(self):
+        self.assertEqual(self.client.get('/api/orders/NOEXISTE/history/').status_code, 404)
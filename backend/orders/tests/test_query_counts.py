@@ -0,0 +1,60 @@
+"""
+Número de consultas de cada endpoint público.
+
+El listado y el detalle cargan el historial con un único ``Prefetch``: el
+número de consultas no depende del tamaño de la página ni del historial.
+El seguimiento se responde desde el snapshot (o desde la caché).
+"""
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from orders.seeding import OrderSeeder
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}},
+)
+class EndpointQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        OrderSeeder(prefix='TEST', days=30, seed=1, batch_size=50).seed(30)
+        cls.order_number = 'TEST000000001'
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = APIClient()
+
+    def test_list_is_constant_regardless_of_page_size(self):
+        # Pedidos de la página y su historial
+        for page_size in (5, 25):
+            with self.subTest(page_size=page_size), self.assertNumQueries(2):
+                response = self.client.get('/api/orders/', {'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_retrieve(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/orders/{self.order_number}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['history'])
+
+    def test_track_cold_and_warm_cache(self):
+        url = f'/api/orders/track/{self.order_number}/'
+        # En frío se lee el snapshot del pedido
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # Con la caché caliente no se consulta la base de datos
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_search(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                '/api/orders/search/', {'order_number': self.order_number}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['order_number'], self.order_number)
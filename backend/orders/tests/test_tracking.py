@@ -0,0 +1,223 @@
+"""Seguimiento público: caché de las entradas (orders/tracking.py) y endpoints"""
+from unittest import mock
+
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from orders import tracking
+from orders.models import Order, OrderHistory
+from orders.tracking import (
+    INVALIDATED, NOT_FOUND, cache_key, get_tracking_entries, get_tracking_entry,
+    invalidate_tracking, refresh_tracking, refresh_tracking_on_commit, save_snapshots,
+)
+
+from .factories import TEST_CACHES, create_order
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TrackingCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache = caches['default']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order = create_order(status='PENDING')
+        # Sin las marcas de invalidación que deja la creación
+        self.cache.clear()
+
+    def cached(self, order_number):
+        return self.cache.get(cache_key(order_number))
+
+    def test_entries_are_cached_after_the_first_read(self):
+        entry = get_tracking_entry(self.order.order_number)
+        self.assertEqual(entry.payload['status'], 'PENDING')
+        self.assertEqual(self.cached(self.order.order_number), entry)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_tracking_entry(self.order.order_number), entry)
+
+    def test_unknown_numbers_are_cached_as_not_found(self):
+        self.assertIsNone(get_tracking_entry('NOEXISTE'))
+        self.assertEqual(self.cached('NOEXISTE'), NOT_FOUND)
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_tracking_entry('NOEXISTE'))
+
+    def test_creating_the_order_replaces_the_negative_entry(self):
+        self.assertIsNone(get_tracking_entry('NUEVO001'))
+        with self.captureOnCommitCallbacks(execute=True):
+            create_order(order_number='NUEVO001')
+        self.assertEqual(get_tracking_entry('NUEVO001').payload['order_number'], 'NUEVO001')
+
+    def test_invalidation_leaves_a_tombstone(self):
+        get_tracking_entry(self.order.order_number)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_tracking([self.order.order_number])
+        self.assertEqual(self.cached(self.order.order_number), INVALIDATED)
+        # La marca cuenta como fallo, en lecturas sueltas y en lote
+        self.assertEqual(get_tracking_entry(self.order.order_number).payload['status'], 'PENDING')
+        entries = get_tracking_entries([self.order.order_number])
+        self.assertEqual(entries[self.order.order_number].payload['status'], 'PENDING')
+
+    def test_read_started_before_the_commit_does_not_cache_stale_data(self):
+        number = self.order.order_number
+        snapshot_to_payload = tracking.snapshot_to_payload
+
+        def commit_a_change_meanwhile(snapshot):
+            # La lectura ya tiene el snapshot antiguo cuando otro proceso confirma un cambio
+            with self.captureOnCommitCallbacks(execute=True):
+                OrderHistory.objects.create(order=self.order, status='PROCESSING',
+                                            location='Madrid', description='Preparando')
+                Order.objects.filter(pk=self.order.pk).update(status='PROCESSING')
+            return snapshot_to_payload(snapshot)
+
+        with mock.patch('orders.tracking.snapshot_to_payload', side_effect=commit_a_change_meanwhile):
+            stale = get_tracking_entry(number)
+        self.assertEqual(stale.payload['status'], 'PENDING')
+        self.assertEqual(self.cached(number), INVALIDATED)
+        self.assertEqual(get_tracking_entry(number).payload['status'], 'PROCESSING')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RefreshOnCommitTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def add_history(self, order, count):
+        for n in range(count):
+            OrderHistory.objects.create(order=order, status='PENDING', location='Almacén',
+                                        description=f'Escaneo {n}')
+
+    def test_one_refresh_per_transaction(self):
+        with mock.patch('orders.tracking.refresh_tracking', wraps=refresh_tracking) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = create_order()
+                second = create_order()
+                self.add_history(first, 3)
+                self.add_history(second, 2)
+        refresh.assert_called_once_with(sorted([first.pk, second.pk]))
+        first.refresh_from_db()
+        self.assertEqual(len(first.tracking_snapshot['history']), 3)
+
+    def test_rolled_back_savepoint_does_not_lose_later_refreshes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = create_order()
+        with mock.patch('orders.tracking.refresh_tracking') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        refresh_tracking_on_commit([order.pk])
+                        raise ValueError
+                except ValueError:
+                    pass
+                refresh_tracking_on_commit([order.pk])
+        refresh.assert_called_once_with([order.pk])
+
+
+class SaveSnapshotsTests(TestCase):
+
+    def test_update_goes_through_the_execute_wrappers(self):
+        order = create_order()
+        statements = []
+
+        def spy(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(spy):
+            save_snapshots({order.pk: {'order_number': order.order_number}})
+        self.assertEqual(len(statements), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.tracking_snapshot, {'order_number': order.order_number})
+
+
+@override_settings(CACHES=TEST_CACHES, TRACKING_HTTP_MAX_AGE=30)
+class ConditionalTrackTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order = create_order(status='PENDING')
+        caches['default'].clear()
+        self.client = APIClient()
+        self.url = f'/api/orders/track/{self.order.order_number}/'
+
+    def test_response_carries_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['order_number'], self.order.order_number)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=30')
+
+    def test_matching_etag_returns_304_without_the_payload(self):
+        etag = self.client.get(self.url)['ETag']
+        caches['default'].clear()
+        # Sin caché solo se consulta updated_at
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date(0))
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_invalidate_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderHistory.objects.create(order=self.order, status='PROCESSING',
+                                        location='Madrid', description='Preparando')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['history']), 1)
+
+    def test_unknown_order_is_404_even_when_conditional(self):
+        response = self.client.get('/api/orders/track/NOEXISTE/', HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES=TEST_CACHES, TRACKING_BATCH_MAX_SIZE=3)
+class TrackBatchTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first = create_order(status='PENDING')
+            self.second = create_order(status='IN_TRANSIT')
+        caches['default'].clear()
+        self.client = APIClient()
+
+    def post(self, order_numbers):
+        return self.client.post('/api/orders/track-batch/', {'order_numbers': order_numbers}, format='json')
+
+    def test_unknown_orders_map_to_null(self):
+        response = self.post([self.first.order_number, 'NOEXISTE', self.second.order_number])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(list(results), [self.first.order_number, 'NOEXISTE', self.second.order_number])
+        self.assertIsNone(results['NOEXISTE'])
+        self.assertEqual(results[self.second.order_number]['status'], 'IN_TRANSIT')
+        self.assertEqual(results[self.first.order_number], get_tracking_entry(self.first.order_number).payload)
+
+    def test_one_query_for_all_cache_misses(self):
+        with self.assertNumQueries(2):
+            # Pedidos y, para el que no existe, el archivo
+            self.post([self.first.order_number, self.second.order_number, 'NOEXISTE'])
+        with self.assertNumQueries(0):
+            self.post([self.first.order_number, self.second.order_number, 'NOEXISTE'])
+
+    def test_repeated_numbers_count_once(self):
+        numbers = [self.first.order_number, f' {self.first.order_number} '] * 2 + [self.second.order_number]
+        response = self.post(numbers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_rejects_invalid_requests(self):
+        for order_numbers in (None, [], 'ABC', [1, 2], ['A', 'B', 'C', 'D']):
+            with self.subTest(order_numbers=order_numbers):
+                self.assertEqual(self.post(order_numbers).status_code, 400)
@@ -0,0 +1,103 @@
+import math
+import threading
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.throttling import SimpleRateThrottle
+
+
+# Lee, recarga y gasta un token en una sola operación de Redis
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'last')
+local tokens = tonumber(state[1]) or capacity
+local last = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * refill_rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'last', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {allowed, tostring(tokens)}
+"""
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Throttle por cliente basado en un token bucket.
+
+    Con una tasa ``N/periodo`` cada cliente puede hacer ráfagas de hasta N
+    peticiones y recupera N tokens por periodo. El estado (tokens restantes y
+    momento de la última petición) se guarda en la caché, así que se comparte
+    entre todos los workers.
+
+    Con Redis (producción) el bucket se lee y actualiza con un script Lua,
+    que es atómico: peticiones simultáneas de un cliente nunca gastan el
+    mismo token. Con las demás cachés se serializa con un lock del proceso;
+    con la caché ``file`` varios procesos pueden gastar a la vez el mismo
+    token, así que el límite es aproximado (solo desarrollo).
+    """
+
+    cache_format = 'throttle:bucket:%(scope)s:%(ident)s'
+    lock = threading.Lock()
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        refill_rate = self.num_requests / self.duration
+        backend = caches[DEFAULT_CACHE_ALIAS]
+        if isinstance(backend, RedisCache):
+            allowed, tokens = self.take_token_redis(backend, now, refill_rate)
+        else:
+            allowed, tokens = self.take_token(now, refill_rate)
+
+        if not allowed:
+            self.wait_seconds = (1 - tokens) / refill_rate
+        return allowed
+
+    def take_token_redis(self, backend, now, refill_rate):
+        key = backend.make_and_validate_key(self.key)
+        client = backend._cache.get_client(key, write=True)
+        allowed, tokens = client.eval(
+            TOKEN_BUCKET_SCRIPT, 1, key,
+            self.num_requests, refill_rate, now, math.ceil(self.duration),
+        )
+        return bool(allowed), float(tokens)
+
+    def take_token(self, now, refill_rate):
+        with self.lock:
+            tokens, last = self.cache.get(self.key, (self.num_requests, now))
+            tokens = min(self.num_requests, tokens + max(0, now - last) * refill_rate)
+            if tokens < 1:
+                return False, tokens
+            self.cache.set(self.key, (tokens - 1, now), self.duration)
+            return True, tokens - 1
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class TrackingThrottle(TokenBucketThrottle):
+    """Límite para las búsquedas públicas de pedidos (track y search)"""
+    scope = 'tracking'
+
+
+class TrackingBatchThrottle(TokenBucketThrottle):
+    """Límite para las consultas de seguimiento en lote (integraciones)"""
+    scope = 'tracking_batch'
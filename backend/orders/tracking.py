@@ -0,0 +1,399 @@
+"""
+Respuestas públicas de seguimiento de pedidos.
+
+El payload de ``OrderTrackingSerializer`` se guarda en la caché de Django
+(``TRACKING_CACHE_ALIAS``) indexado por ``order_number``, así las consultas
+repetidas no tocan la base de datos. Cualquier escritura sobre un pedido o su
+historial debe llamar a ``invalidate_tracking`` (las señales de ``signals.py``
+lo hacen para ``save``/``delete``; las escrituras en bloque lo hacen a mano).
+
+Una lectura que no encuentra la entrada consulta la base de datos y la
+guarda después, así que puede guardar datos leídos justo antes de que se
+confirme una escritura. Para que esa entrada antigua no sobreviva a la
+invalidación, ``invalidate_tracking`` no borra la clave: deja en ella la
+marca ``INVALIDATED`` durante ``TRACKING_INVALIDATION_GRACE`` segundos, y las
+lecturas guardan con ``cache.add``, que no sobrescribe una clave existente.
+Mientras dure la marca las lecturas van a la base de datos; una lectura más
+lenta que ese margen aún podría guardar datos antiguos (hasta que caduquen).
+
+Además, cada pedido guarda su payload ya calculado en ``tracking_snapshot``,
+que se regenera con ``refresh_tracking`` cada vez que cambia el pedido o su
+historial. Si no está en caché, basta con leer esa columna por
+``order_number``.
+
+Los números que no existen también se cachean (con ``NOT_FOUND`` y un TTL
+corto) para que los errores de tecleo o los bots que prueban números
+consecutivos no lleguen a PostgreSQL. Como comparten clave con el pedido,
+crear el pedido invalida también la entrada negativa.
+
+Los pedidos archivados (``archive.py``) ya no están en ``Order``: si un
+número no aparece allí se busca su snapshot en ``ArchivedOrder`` con una
+consulta más. Solo pagan esa consulta los números que no son pedidos
+activos, y el resultado se cachea igual que el de cualquier pedido.
+
+Para los GET condicionales cada entrada lleva también su ``ETag`` y su
+``Last-Modified``, calculados a partir de ``Order.updated_at``. Regenerar el
+snapshot actualiza ``updated_at``, así que los cambios en el historial
+también cambian los validadores.
+"""
+import hashlib
+import json
+from itertools import islice
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, quote_etag
+from psycopg2.extras import execute_values
+
+from .live import publish_tracking_update
+from .metrics import record_cache_lookups
+from .models import ArchivedOrder, Order
+from .serializers import OrderTrackingSerializer, serialized_model_fields, tracking_payloads
+
+
+CACHE_KEY_PREFIX = 'tracking:v2:'
+
+# Marca de "pedido inexistente" en la caché
+NOT_FOUND = 'not-found'
+
+# Marca de "entrada invalidada": cuenta como fallo y bloquea los cache.add
+INVALIDATED = 'invalidated'
+
+# Un número más largo que el campo no puede existir: no se cachea
+ORDER_NUMBER_MAX_LENGTH = Order._meta.get_field('order_number').max_length
+
+
+def tracking_cache():
+    return caches[settings.TRACKING_CACHE_ALIAS]
+
+
+def cache_key(order_number):
+    return f'{CACHE_KEY_PREFIX}{order_number}'
+
+
+def is_cacheable(order_number):
+    return 0 < len(order_number) <= ORDER_NUMBER_MAX_LENGTH and order_number.isprintable()
+
+
+def is_cached(entry):
+    """Si el valor leído de la caché es una entrada válida (o ``NOT_FOUND``)"""
+    return entry is not None and entry != INVALIDATED
+
+
+def tracking_queryset():
+    """Pedidos con solo las columnas del seguimiento y su historial precargado"""
+    return Order.objects.only(*serialized_model_fields(OrderTrackingSerializer)).with_history()
+
+
+def build_tracking_payload(order):
+    """Serializa el pedido para el seguimiento público"""
+    return OrderTrackingSerializer(order).data
+
+
+TRACKING_FIELDS = OrderTrackingSerializer.Meta.fields
+HISTORY_FIELDS = OrderTrackingSerializer().fields['history'].child.Meta.fields
+
+
+def snapshot_to_payload(snapshot):
+    """
+    Devuelve el snapshot con las claves en el orden del serializer.
+
+    ``jsonb`` no conserva el orden de las claves y así la respuesta es
+    idéntica a la del serializer.
+    """
+    payload = {field: snapshot[field] for field in TRACKING_FIELDS}
+    payload['history'] = [
+        {field: entry[field] for field in HISTORY_FIELDS}
+        for entry in snapshot['history']
+    ]
+    return payload
+
+
+class TrackingEntry(NamedTuple):
+    """Payload de seguimiento y sus validadores HTTP"""
+    payload: dict
+    etag: str
+    last_modified: int
+
+
+def tracking_validators(pk, updated_at):
+    """``ETag`` (sin comillas) y ``Last-Modified`` (timestamp) de un pedido"""
+    version = f'{CACHE_KEY_PREFIX}{pk}:{updated_at.isoformat()}'
+    etag = hashlib.md5(version.encode()).hexdigest()
+    return etag, int(updated_at.timestamp())
+
+
+def get_tracking_entry(order_number, validators_only=False):
+    """
+    Devuelve la ``TrackingEntry`` de un pedido o ``None`` si no existe.
+
+    Primero se busca en la caché; si no está, se lee de la base de datos y
+    se guarda para las siguientes consultas. Con ``validators_only`` y sin
+    caché solo se consulta ``updated_at`` (la entrada no lleva payload): basta
+    para responder un GET condicional con 304.
+    """
+    if not is_cacheable(order_number):
+        return None
+
+    entry = tracking_cache().get(cache_key(order_number))
+    record_cache_lookups(is_cached(entry), not is_cached(entry))
+    if entry == NOT_FOUND:
+        return None
+    if is_cached(entry):
+        return entry
+
+    if validators_only:
+        row = (
+            Order.objects.filter(order_number=order_number)
+            .values_list('pk', 'updated_at')
+            .first()
+        ) or (
+            ArchivedOrder.objects.filter(order_number=order_number)
+            .values_list('pk', 'updated_at')
+            .first()
+        )
+        if row is None:
+            return None
+        return TrackingEntry(None, *tracking_validators(*row))
+
+    return load_tracking_entries([order_number]).get(order_number)
+
+
+def get_tracking_entries(order_numbers):
+    """
+    Devuelve ``{order_number: TrackingEntry o None}`` para varios pedidos.
+
+    Una lectura múltiple de la caché y, para los que no están, una sola
+    consulta ``IN`` sobre los snapshots.
+    """
+    entries = dict.fromkeys(order_numbers)
+    keys = {cache_key(number): number for number in entries if is_cacheable(number)}
+    missing = []
+    cached = tracking_cache().get_many(keys)
+    for key, number in keys.items():
+        entry = cached.get(key)
+        if not is_cached(entry):
+            missing.append(number)
+        elif entry != NOT_FOUND:
+            entries[number] = entry
+
+    record_cache_lookups(len(keys) - len(missing), len(missing))
+    if missing:
+        entries.update(load_tracking_entries(missing))
+    return entries
+
+
+def load_tracking_entries(order_numbers):
+    """
+    Lee de la base de datos las entradas de los pedidos y las cachea.
+
+    Los números que no están en ``Order`` se buscan en el archivo y los que
+    tampoco están ahí se cachean como ``NOT_FOUND``. Se guardan con
+    ``cache.add``: no pisan una invalidación posterior a la lectura. Devuelve
+    ``{order_number: TrackingEntry}`` solo de los pedidos encontrados.
+    """
+    def fetch(numbers):
+        # Una sola consulta por el índice único de order_number
+        return list(
+            Order.objects.filter(order_number__in=numbers)
+            .values_list('order_number', 'pk', 'updated_at', 'tracking_snapshot')
+        )
+
+    rows = fetch(order_numbers)
+    pending = {number: pk for number, pk, _, snapshot in rows if snapshot is None}
+    if pending:
+        # Pedidos aún sin snapshot: se calculan ahora, se guardan y se releen
+        # (regenerarlos cambia updated_at)
+        refresh_tracking(pending.values())
+        rows = [row for row in rows if row[0] not in pending] + fetch(pending)
+
+    found = {row[0] for row in rows}
+    archived = [number for number in order_numbers if number not in found]
+    if archived:
+        # Camino lento: pedidos archivados (siempre tienen snapshot)
+        rows += list(
+            ArchivedOrder.objects.filter(order_number__in=archived)
+            .values_list('order_number', 'pk', 'updated_at', 'tracking_snapshot')
+        )
+
+    entries = {
+        number: TrackingEntry(snapshot_to_payload(snapshot), *tracking_validators(pk, updated_at))
+        for number, pk, updated_at, snapshot in rows
+        if snapshot is not None
+    }
+    cache = tracking_cache()
+    for number in order_numbers:
+        if not is_cacheable(number):
+            continue
+        if number in entries:
+            cache.add(cache_key(number), entries[number], settings.TRACKING_CACHE_TIMEOUT)
+        else:
+            cache.add(cache_key(number), NOT_FOUND, settings.TRACKING_NEGATIVE_CACHE_TIMEOUT)
+    return entries
+
+
+def get_tracking_payload(order_number):
+    """Devuelve el payload de seguimiento de un pedido o ``None`` si no existe"""
+    entry = get_tracking_entry(order_number)
+    return entry.payload if entry is not None else None
+
+
+async def aget_tracking_entry(order_number, validators_only=False):
+    """Versión asíncrona de ``get_tracking_entry`` (vistas de ``async_views.py``)"""
+    if not is_cacheable(order_number):
+        return None
+
+    cache = tracking_cache()
+    key = cache_key(order_number)
+    entry = await cache.aget(key)
+    record_cache_lookups(is_cached(entry), not is_cached(entry))
+    if entry == NOT_FOUND:
+        return None
+    if is_cached(entry):
+        return entry
+
+    orders = Order.objects.filter(order_number=order_number)
+    if validators_only:
+        row = await orders.values_list('pk', 'updated_at').afirst()
+        if row is None:
+            row = await (
+                ArchivedOrder.objects.filter(order_number=order_number)
+                .values_list('pk', 'updated_at')
+                .afirst()
+            )
+        if row is None:
+            return None
+        return TrackingEntry(None, *tracking_validators(*row))
+
+    row = await orders.values_list('pk', 'updated_at', 'tracking_snapshot').afirst()
+    if row is None or row[2] is None:
+        # Pedido archivado, inexistente o aún sin snapshot (poco habitual): lo
+        # resuelve la versión síncrona
+        entries = await sync_to_async(load_tracking_entries)([order_number])
+        return entries.get(order_number)
+
+    pk, updated_at, snapshot = row
+
+    entry = TrackingEntry(snapshot_to_payload(snapshot), *tracking_validators(pk, updated_at))
+    await cache.aadd(key, entry, settings.TRACKING_CACHE_TIMEOUT)
+    return entry
+
+
+def add_tracking_headers(response, entry):
+    """``ETag``, ``Last-Modified`` y ``Cache-Control`` de una respuesta de seguimiento"""
+    response['ETag'] = quote_etag(entry.etag)
+    response['Last-Modified'] = http_date(entry.last_modified)
+    patch_cache_control(response, public=True, max_age=settings.TRACKING_HTTP_MAX_AGE)
+    return response
+
+
+def refresh_tracking(order_ids, batch_size=500):
+    """
+    Regenera el snapshot de seguimiento de los pedidos e invalida su caché.
+
+    Devuelve un diccionario ``{id: snapshot}`` de los pedidos que existen.
+    """
+    snapshots = {}
+    order_ids = iter(order_ids)
+    while chunk := list(islice(order_ids, batch_size)):
+        payloads = tracking_payloads(Order.objects.filter(pk__in=chunk))
+        save_snapshots(payloads)
+        invalidate_tracking([payload['order_number'] for payload in payloads.values()])
+        snapshots.update(payloads)
+    return snapshots
+
+
+def save_snapshots(payloads):
+    """
+    Guarda los snapshots ``{id: payload}`` con un único UPDATE.
+
+    También actualiza ``updated_at``: es la base del ``ETag`` y del
+    ``Last-Modified`` de las respuestas de seguimiento.
+    """
+    if not payloads:
+        return
+    now = timezone.now()
+    if connection.vendor != 'postgresql':
+        Order.objects.bulk_update(
+            [
+                Order(pk=pk, tracking_snapshot=payload, updated_at=now)
+                for pk, payload in payloads.items()
+            ],
+            ['tracking_snapshot', 'updated_at'],
+            batch_size=100,
+        )
+        return
+
+    table = connection.ops.quote_name(Order._meta.db_table)
+    # El cursor de Django (no el de psycopg2): pasa por los execute_wrappers
+    # y el UPDATE cuenta en las métricas de consultas
+    with connection.cursor() as cursor:
+        execute_values(
+            cursor,
+            f'UPDATE {table} AS o '
+            f'SET tracking_snapshot = v.snapshot::jsonb, updated_at = v.updated_at '
+            f'FROM (VALUES %s) AS v (id, snapshot, updated_at) WHERE o.id = v.id',
+            [(pk, json.dumps(payload), now) for pk, payload in payloads.items()],
+            page_size=len(payloads),
+        )
+
+
+def refresh_tracking_on_commit(order_ids):
+    """
+    Programa ``refresh_tracking`` para cuando se confirme la transacción.
+
+    Los pedidos de todas las llamadas de una misma transacción se acumulan
+    en la conexión y se regeneran juntos con un único ``on_commit`` (guardar
+    un pedido con 30 entradas de historial en el admin es un solo refresco,
+    no 31). Si el ``on_commit`` pendiente se descarta (rollback de un
+    savepoint) la siguiente llamada programa otro.
+    """
+    order_ids = [pk for pk in order_ids if pk is not None]
+    if not order_ids:
+        return
+
+    pending = getattr(connection, 'tracking_refresh_pending', None)
+    if pending is not None and any(
+        callback is pending[0] for _, callback, *_ in connection.run_on_commit
+    ):
+        pending[1].update(order_ids)
+        return
+
+    ids = set(order_ids)
+
+    def refresh():
+        if connection.tracking_refresh_pending is pending:
+            connection.tracking_refresh_pending = None
+        refresh_tracking(sorted(ids))
+
+    pending = connection.tracking_refresh_pending = (refresh, ids)
+    transaction.on_commit(refresh)
+
+
+def invalidate_tracking(order_numbers):
+    """
+    Invalida en la caché el seguimiento de los pedidos indicados.
+
+    Tras el commit de la transacción en curso (antes las lecturas aún verían
+    los datos antiguos) se sustituye cada entrada por la marca
+    ``INVALIDATED``, que impide que una lectura empezada antes del commit
+    guarde su resultado (ver el docstring del módulo). Después se avisa a los
+    streams en directo de esos pedidos (``live.py``).
+    """
+    order_numbers = [order_number for order_number in order_numbers if order_number]
+    if not order_numbers:
+        return
+
+    def invalidate():
+        tracking_cache().set_many(
+            {cache_key(order_number): INVALIDATED for order_number in order_numbers},
+            settings.TRACKING_INVALIDATION_GRACE,
+        )
+        publish_tracking_update(order_numbers)
+
+    transaction.on_commit(invalidate)
@@ -1,10 +1,28 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet
+from . import async_views
+from .views import OrderViewSet, StatusEventView
 
 router = DefaultRouter()
 router.register(r'orders', OrderViewSet, basename='order')
 
 urlpatterns = [
+    re_path(
+        r'^orders/track/(?P<order_number>[^/.]+)/stream/$',
+        async_views.track_stream,
+        name='order-track-stream',
+    ),
+]
+
+if settings.ASYNC_TRACKING:
+    # Delante del router: sustituyen a las acciones track y search del ViewSet
+    urlpatterns += [
+        re_path(r'^orders/track/(?P<order_number>[^/.]+)/$', async_views.track, name='order-track-async'),
+        path('orders/search/', async_views.search, name='order-search-async'),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
+    path('events/', StatusEventView.as_view(), name='status-events'),
 ]
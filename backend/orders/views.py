@@ -1,12 +1,35 @@
+import hmac
+from prometheus_client import CONTENT_TYPE_LATEST
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
 from django.views.decorators.csrf import csrf_exempt
+from .events import StatusEventApplier
+from .metrics import export_metrics
 from .models import Order, OrderHistory
-from .serializers import OrderSerializer, OrderTrackingSerializer
+from .pagination import OrderCursorPagination, OrderHistoryCursorPagination
+from .permissions import HasCarrierToken
+from .serializers import (
+    OrderHistorySerializer,
+    OrderSerializer,
+    StatusEventSerializer,
+    serialized_model_fields,
+)
+from .throttling import TrackingBatchThrottle, TrackingThrottle
+from .tracking import (
+    add_tracking_headers,
+    get_tracking_entries,
+    get_tracking_entry,
+    get_tracking_payload,
+)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -19,24 +42,64 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = OrderSerializer
     lookup_field = 'order_number'
     permission_classes = [AllowAny]
+    pagination_class = OrderCursorPagination
     
-    @action(detail=False, methods=['get'], url_path='track/(?P<order_number>[^/.]+)')
+    def get_queryset(self):
+        # Solo las columnas serializadas y todo el historial de la página en una consulta
+        return (
+            super().get_queryset()
+            .only(*serialized_model_fields(self.get_serializer_class()))
+            .with_history()
+        )
+    
+    @action(detail=True, methods=['get'])
+    def history(self, request, order_number=None):
+        """
+        Paginated status history of an order, newest first.
+        GET /api/orders/{order_number}/history/?page_size=50
+        """
+        order = get_object_or_404(Order.objects.only('id'), order_number=order_number)
+        queryset = OrderHistory.objects.filter(order=order).only(
+            *serialized_model_fields(OrderHistorySerializer), 'template'
+        )
+        paginator = OrderHistoryCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = OrderHistorySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='track/(?P<order_number>[^/.]+)',
+        throttle_classes=[TrackingThrottle]
+    )
     def track(self, request, order_number=None):
         """
         Endpoint to track an order by its number.
         GET /api/orders/track/{order_number}/
+
+        Supports conditional GET: If-None-Match / If-Modified-Since are
+        answered with 304 without loading the tracking payload.
         """
-        try:
-            order = get_object_or_404(Order, order_number=order_number)
-            serializer = OrderTrackingSerializer(order)
-            return Response(serializer.data)
-        except Order.DoesNotExist:
-            return Response(
-                {'error': 'Order not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        conditional = (
+            'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+        )
+        entry = get_tracking_entry(order_number, validators_only=conditional)
+        if entry is None:
+            raise Http404
+
+        response = get_conditional_response(
+            request, etag=quote_etag(entry.etag), last_modified=entry.last_modified
+        )
+        if response is None:
+            if entry.payload is None:
+                entry = get_tracking_entry(order_number)
+                if entry is None:
+                    raise Http404
+            response = Response(entry.payload)
+        return add_tracking_headers(response, entry)
     
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['post'], throttle_classes=[TrackingThrottle])
     def search(self, request):
         """
         Endpoint to search for an order.
@@ -51,12 +114,114 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            order = Order.objects.get(order_number=order_number)
-            serializer = OrderTrackingSerializer(order)
-            return Response(serializer.data)
-        except Order.DoesNotExist:
+        payload = get_tracking_payload(order_number)
+        if payload is None:
             return Response(
                 {'error': 'Order not found. Please verify your order number.'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response(payload)
+    
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='track-batch',
+        throttle_classes=[TrackingBatchThrottle]
+    )
+    def track_batch(self, request):
+        """
+        Endpoint to track many orders at once.
+        POST /api/orders/track-batch/
+        Body: {"order_numbers": ["ABC123", "ABC124"]}
+        
+        Returns {"results": {order_number: payload}} where orders that do
+        not exist map to null.
+        """
+        order_numbers = request.data.get('order_numbers')
+        if (
+            not isinstance(order_numbers, list)
+            or not order_numbers
+            or not all(isinstance(number, str) for number in order_numbers)
+        ):
+            return Response(
+                {'error': 'order_numbers must be a non-empty list of order numbers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        order_numbers = list(dict.fromkeys(number.strip() for number in order_numbers))
+        if len(order_numbers) > settings.TRACKING_BATCH_MAX_SIZE:
+            return Response(
+                {'error': f'At most {settings.TRACKING_BATCH_MAX_SIZE} order numbers per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        entries = get_tracking_entries(order_numbers)
+        return Response({
+            'results': {
+                number: entry.payload if entry is not None else None
+                for number, entry in entries.items()
+            }
+        })
+
+
+class StatusEventView(APIView):
+    """
+    Bulk ingestion of carrier status events.
+    POST /api/events/
+    Authorization: Bearer <CARRIER_EVENTS_TOKEN>
+    Body: {"events": [{"order_number": "ABC123", "status": "IN_TRANSIT",
+                       "location": "Madrid", "timestamp": "2025-10-25T10:30:00Z"}]}
+    
+    Replaying a batch is safe: duplicate and out-of-order events are dropped.
+    """
+    authentication_classes = []
+    permission_classes = [HasCarrierToken]
+    
+    def post(self, request):
+        events = request.data.get('events') if isinstance(request.data, dict) else None
+        if not isinstance(events, list) or not events:
+            return Response(
+                {'error': 'events must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(events) > settings.CARRIER_EVENTS_MAX_BATCH_SIZE:
+            return Response(
+                {'error': f'At most {settings.CARRIER_EVENTS_MAX_BATCH_SIZE} events per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = StatusEventSerializer(data=events, many=True)
+        serializer.is_valid(raise_exception=True)
+        
+        # Los snapshots de seguimiento se regeneran en segundo plano (run_jobs)
+        applier = StatusEventApplier(defer_refresh=True)
+        applier.apply(serializer.validated_data)
+        return Response({
+            'received': applier.received,
+            'applied': applier.applied,
+            'duplicates': applier.duplicates,
+            'stale': applier.stale,
+            'unknown_orders': sorted(applier.unknown),
+        })
+
+
+def metrics(request):
+    """
+    Prometheus metrics for every worker.
+    GET /metrics
+    Header: Authorization: Bearer <METRICS_TOKEN>
+
+    Without METRICS_TOKEN the endpoint is only open with DEBUG (local
+    development); otherwise every request is rejected.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        allowed = scheme.lower() == 'bearer' and hmac.compare_digest(
+            credentials.strip().encode(), token.encode()
+        )
+    else:
+        allowed = settings.DEBUG
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(export_metrics(), content_type=CONTENT_TYPE_LATEST)
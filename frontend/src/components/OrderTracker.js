@@ -1,7 +1,7 @@
 'use client';
 
-import { useState } from 'react';
-import { trackOrder } from '../lib/api';
+import { useEffect, useState } from 'react';
+import { subscribeToOrder, trackOrder } from '../lib/api';
 
 export default function OrderTracker() {
   const [orderNumber, setOrderNumber] = useState('');
@@ -9,6 +9,13 @@ export default function OrderTracker() {
   const [error, setError] = useState('');
   const [loading, setLoading] = useState(false);
 
+  // Mientras se muestra un pedido, recibir sus cambios en directo
+  const trackedNumber = order?.order_number;
+  useEffect(() => {
+    if (!trackedNumber) return undefined;
+    return subscribeToOrder(trackedNumber, setOrder);
+  }, [trackedNumber]);
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     
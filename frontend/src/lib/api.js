@@ -1,6 +1,9 @@
 import axios from 'axios';
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api';
+// Solo con el backend en modo ASGI (docker-compose.asgi.yml): con WSGI el
+// stream responde una vez y cierra, y el navegador reconectaría sin parar
+const LIVE_TRACKING = process.env.NEXT_PUBLIC_LIVE_TRACKING === 'true';
 
 // Configurar axios para enviar credenciales
 axios.defaults.withCredentials = true;
@@ -24,3 +27,18 @@ export const trackOrder = async (orderNumber) => {
     };
   }
 };
+
+// Actualizaciones en directo del pedido (server-sent events).
+// Devuelve una función para cerrar la conexión.
+export const subscribeToOrder = (orderNumber, onUpdate) => {
+  if (!LIVE_TRACKING || typeof EventSource === 'undefined') {
+    return () => {};
+  }
+  const source = new EventSource(
+    `${API_URL}/orders/track/${encodeURIComponent(orderNumber)}/stream/`
+  );
+  source.addEventListener('tracking', (event) => {
+    onUpdate(JSON.parse(event.data));
+  });
+  return () => source.close();
+};